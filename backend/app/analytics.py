@@ -0,0 +1,235 @@
+import time
+import weakref
+from typing import List, Tuple
+
+import numpy as np
+
+from .graph_store import EDGE_TYPES, GraphState
+from .models import EdgeType, GraphAnalytics
+from .relevance import EDGE_WEIGHTS
+from .telemetry import span
+
+DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-9
+PAGERANK_MAX_ITERATIONS = 100
+# Label propagation stops once fewer than this share of nodes change label in a round.
+COMMUNITY_MAX_ITERATIONS = 20
+COMMUNITY_SETTLED = 0.001
+# Betweenness is estimated from shortest paths out of a sample of source nodes (pivots).
+# Each pivot costs a pass over every edge, so the pivot count shrinks as the graph grows to
+# keep the work near BETWEENNESS_EDGE_VISITS, within the sample bounds. Pivots are processed
+# a batch at a time; small batches keep the (pivots x nodes) working arrays in cache.
+BETWEENNESS_SAMPLES = 32
+BETWEENNESS_MIN_SAMPLES = 8
+BETWEENNESS_EDGE_VISITS = 640_000
+BETWEENNESS_CHUNK = 8
+KEY_PAPERS = 10
+SEED = 0
+
+EDGE_TYPE_WEIGHTS = np.array([EDGE_WEIGHTS[edge_type] for edge_type in EDGE_TYPES])
+CITATION_CODE = EDGE_TYPES.index(EdgeType.citation)
+
+# Analytics of the graph sessions keep alive, recomputed only once the graph has grown.
+_cache: "weakref.WeakKeyDictionary[GraphState, Tuple[Tuple[int, int], GraphAnalytics]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def undirected(n: int, sources: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Each linked pair once in each direction, whatever the edge types and directions, sorted
+    # by first node: the CSR order the kernels below expect.
+    low, high = np.minimum(sources, targets), np.maximum(sources, targets)
+    keys = np.sort(low.astype(np.int64) * n + high)
+    keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    low, high = keys // n, keys % n
+    keys = np.sort(np.concatenate([keys, high * n + low]))
+    return keys // n, keys % n
+
+
+def pagerank(
+    n: int, sources: np.ndarray, targets: np.ndarray, weights: np.ndarray
+) -> np.ndarray:
+    # Power iteration with the sparse product as a bincount over edges. Rank from nodes
+    # without out-edges is spread evenly, so the scores always sum to one.
+    out_weight = np.bincount(sources, weights=weights, minlength=n)
+    share = weights / out_weight[sources]
+    dangling = out_weight == 0
+    rank = np.full(n, 1.0 / n)
+    for _ in range(PAGERANK_MAX_ITERATIONS):
+        spread = np.bincount(targets, weights=rank[sources] * share, minlength=n)
+        updated = DAMPING * (spread + rank[dangling].sum() / n) + (1 - DAMPING) / n
+        converged = np.abs(updated - rank).sum() < PAGERANK_TOLERANCE
+        rank = updated
+        if converged:
+            break
+    return rank
+
+
+def components(n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    # Connected components by hooking and pointer jumping: every edge points the larger root
+    # at the smaller one, then paths are halved until each node points at its root.
+    parent = np.arange(n)
+    while True:
+        pu, pv = parent[u], parent[v]
+        hook = pu != pv
+        if not hook.any():
+            return parent
+        np.minimum.at(parent, np.maximum(pu[hook], pv[hook]), np.minimum(pu[hook], pv[hook]))
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+
+
+def communities(n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    # Label propagation: each node takes the label most common among its neighbours and
+    # itself, ties going to the smallest label. Only a random half of the nodes moves per
+    # round, which keeps synchronous updates from oscillating on bipartite structures.
+    rng = np.random.default_rng(SEED)
+    # (row, label) pairs are packed into one sortable key; int32 keys sort twice as fast.
+    dtype = np.int32 if n * n < 2**31 else np.int64
+    nodes = np.arange(n, dtype=dtype)
+    labels = nodes.copy()
+    # Neighbour lists with each node in its own, in row order.
+    pairs = np.sort(np.concatenate([u * n + v, nodes.astype(np.int64) * (n + 1)]))
+    rows = (pairs // n).astype(dtype)
+    row_keys = rows * dtype(n)
+    neighbours = (pairs % n).astype(dtype)
+    moved = n
+    for _ in range(COMMUNITY_MAX_ITERATIONS):
+        keys = np.sort(row_keys + labels[neighbours])
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        counts = np.diff(starts, append=len(keys))
+        # Sorting by key keeps rows in order, so a run's row is that of its first entry.
+        run_rows = rows[starts]
+        run_labels = keys[starts] - run_rows * dtype(n)
+        # Highest count wins, then smallest label: both in one score, maximized per row.
+        # Every row has a run, as each node counts its own label.
+        score = counts * np.int64(n) + (n - 1 - run_labels)
+        row_starts = np.flatnonzero(np.concatenate(([True], run_rows[1:] != run_rows[:-1])))
+        proposed = (n - 1 - np.maximum.reduceat(score, row_starts) % n).astype(dtype)
+        moving = (rng.random(n) < 0.5) & (proposed != labels)
+        labels = np.where(moving, proposed, labels)
+        # Stop once labels settle, or once they stop settling: on graphs without clear
+        # structure, later rounds only let one label swallow its neighbours.
+        previous, moved = moved, int(moving.sum())
+        if moved <= COMMUNITY_SETTLED * n or moved >= previous:
+            break
+    return labels.astype(np.int64)
+
+
+def betweenness(n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    # Brandes' algorithm from sampled pivots, batched over pivots and level-synchronous:
+    # each BFS level expands only the edges leaving its frontier, so a pivot costs one pass
+    # over its component forward and one back. State is flat, indexed pivot * n + node.
+    # Normalized like networkx (undirected), so values fall between 0 and 1.
+    if n < 3 or not len(u):
+        return np.zeros(n)
+    columns = v.astype(np.int32)
+    indptr = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(u, minlength=n), out=indptr[1:])
+    budget = max(BETWEENNESS_MIN_SAMPLES, BETWEENNESS_EDGE_VISITS // len(u))
+    samples = min(n, BETWEENNESS_SAMPLES, budget)
+    chosen = np.random.default_rng(SEED).choice(n, size=samples, replace=False)
+    total = np.zeros(n)
+    for start in range(0, samples, BETWEENNESS_CHUNK):
+        sources = chosen[start : start + BETWEENNESS_CHUNK]
+        k = len(sources)
+        size = k * n
+        reached = np.zeros(size, dtype=bool)
+        sigma = np.zeros(size)
+        frontier = (np.arange(k) * n + sources).astype(np.int32)
+        reached[frontier] = True
+        sigma[frontier] = 1.0
+        # Edges into newly reached nodes are exactly the shortest-path DAG edges of the level;
+        # they are kept so the backward pass needs no second expansion.
+        dag: List[Tuple[np.ndarray, np.ndarray]] = []
+        while len(frontier):
+            nodes = frontier % n
+            starts = indptr[nodes]
+            counts = indptr[nodes + 1] - starts
+            # Positions of every edge leaving the frontier in `columns`, frontier entry by
+            # entry, and the pivot's row offset repeated alongside.
+            offsets = np.cumsum(counts) - counts
+            positions = np.arange(offsets[-1] + counts[-1], dtype=np.int32)
+            positions += np.repeat(starts - offsets, counts)
+            tails = np.repeat(frontier, counts)
+            heads = np.repeat(frontier - nodes, counts) + columns[positions]
+            fresh = ~reached[heads]
+            tails, heads = tails[fresh], heads[fresh]
+            paths = np.bincount(heads, weights=sigma[tails], minlength=size)
+            # Every newly reached node has a path count above zero; flatnonzero also sorts.
+            frontier = np.flatnonzero(paths).astype(np.int32)
+            reached[frontier] = True
+            sigma[frontier] = paths[frontier]
+            dag.append((tails, heads))
+        delta = np.zeros(size)
+        for tails, heads in reversed(dag):
+            delta += np.bincount(
+                tails, weights=sigma[tails] / sigma[heads] * (1.0 + delta[heads]), minlength=size
+            )
+        delta[np.arange(k) * n + sources] = 0.0
+        total += delta.reshape(k, n).sum(axis=0)
+    # Each undirected path is counted from both ends; scale the sample up to all sources.
+    estimate = total * (n / samples) / 2.0
+    return estimate / ((n - 1) * (n - 2) / 2.0)
+
+
+def _ranked_labels(labels: np.ndarray) -> Tuple[np.ndarray, List[int]]:
+    # Dense labels numbered by size, largest first (ties by first member).
+    _, first, inverse, sizes = np.unique(
+        labels, return_index=True, return_inverse=True, return_counts=True
+    )
+    order = np.lexsort((first, -sizes))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[inverse], sizes[order].tolist()
+
+
+def compute(state: GraphState) -> GraphAnalytics:
+    started = time.perf_counter()
+    n = len(state)
+    sources = np.asarray(state.sources, dtype=np.int64)
+    targets = np.asarray(state.targets, dtype=np.int64)
+    types = np.asarray(state.types, dtype=np.int64)
+    # Citations pass rank from the citing paper to the cited one; the other edge types carry
+    # no direction and pass it both ways, discounted by the weights used for expansion.
+    both_ways = types != CITATION_CODE
+    rank_sources = np.concatenate([sources, targets[both_ways]])
+    rank_targets = np.concatenate([targets, sources[both_ways]])
+    rank_weights = EDGE_TYPE_WEIGHTS[np.concatenate([types, types[both_ways]])]
+    u, v = undirected(n, sources, targets)
+    with span("analytics", nodes=n, edges=len(sources)):
+        scores = pagerank(n, rank_sources, rank_targets, rank_weights)
+        component, component_sizes = _ranked_labels(components(n, u, v))
+        community, community_sizes = _ranked_labels(communities(n, u, v))
+        between = betweenness(n, u, v)
+    order = np.lexsort((np.arange(n), -scores))
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    return GraphAnalytics(
+        node_ids=list(state.ids),
+        pagerank=np.round(scores, 6).tolist(),
+        rank=rank.tolist(),
+        in_degree=np.bincount(targets, minlength=n).tolist(),
+        out_degree=np.bincount(sources, minlength=n).tolist(),
+        betweenness=np.round(between, 6).tolist(),
+        component=component.tolist(),
+        community=community.tolist(),
+        component_sizes=component_sizes,
+        community_sizes=community_sizes,
+        key_papers=[state.ids[i] for i in order[:KEY_PAPERS]],
+        compute_seconds=round(time.perf_counter() - started, 4),
+    )
+
+
+def graph_analytics(state: GraphState) -> GraphAnalytics:
+    # Nodes and edges are only ever added, so their counts identify the graph's version.
+    version = (len(state), state.edge_count)
+    cached = _cache.get(state)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    analytics = compute(state)
+    _cache[state] = (version, analytics)
+    return analytics
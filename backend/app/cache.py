@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+# Entry kinds: a normal payload, an empty (negative) result, or a recorded upstream failure.
+OK = "ok"
+EMPTY = "empty"
+ERROR = "error"
+
+CacheEntry = Tuple[str, Any]
+
+
+class LRUCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, CacheEntry]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, entry = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, entry: CacheEntry, ttl: float) -> None:
+        self._data[key] = (time.monotonic() + ttl, entry)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SqliteCache:
+    # Wall-clock expiry so entries written by one uvicorn worker are valid for the others.
+    PURGE_EVERY = 500
+    # Keys per IN (...) query; SQLite builds before 3.32 allow at most 999 bound parameters.
+    LOOKUP_CHUNK = 500
+
+    def __init__(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Tuple[CacheEntry, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT kind, payload, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        kind, payload, expires_at = row
+        return (kind, json.loads(payload)), expires_at - time.time()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Tuple[CacheEntry, float]]:
+        rows = []
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), self.LOOKUP_CHUNK):
+                chunk = keys[start : start + self.LOOKUP_CHUNK]
+                rows.extend(
+                    self._conn.execute(
+                        "SELECT key, kind, payload, expires_at FROM responses "
+                        f"WHERE key IN ({','.join('?' * len(chunk))}) AND expires_at > ?",
+                        (*chunk, now),
+                    ).fetchall()
+                )
+        self.hits += len(rows)
+        self.misses += len(keys) - len(rows)
+        return {
+            key: ((kind, json.loads(payload)), expires_at - now)
+            for key, kind, payload, expires_at in rows
+        }
+
+    def set(self, key: str, entry: CacheEntry, ttl: float) -> None:
+        kind, payload = entry
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, kind, payload, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, kind, json.dumps(payload), time.time() + ttl),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    def __init__(self, settings: Optional[Settings] = None) -> None:
+        settings = settings or get_settings()
+        self.memory = LRUCache(settings.cache_max_entries)
+        self.disk: Optional[SqliteCache] = None
+        if settings.cache_sqlite_path:
+            try:
+                self.disk = SqliteCache(settings.cache_sqlite_path)
+            except Exception as exc:  # pragma: no cover - defensive
+                logger.warning("Disk cache unavailable, using memory only: %s", exc)
+        self.ttls: Dict[str, float] = {
+            "semantic_scholar": settings.cache_ttl_semantic_scholar,
+            "openalex": settings.cache_ttl_openalex,
+            "arxiv": settings.cache_ttl_arxiv,
+        }
+        self.default_ttl = settings.cache_ttl_default
+        self.negative_ttl = settings.cache_negative_ttl
+        self.failure_ttl = settings.cache_failure_ttl
+
+    def ttl_for(self, source: str, kind: str) -> float:
+        if kind == ERROR:
+            return self.failure_ttl
+        if kind == EMPTY:
+            return self.negative_ttl
+        return self.ttls.get(source, self.default_ttl)
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self.memory.get(key)
+        if entry is not None or self.disk is None:
+            return entry
+        try:
+            found = await asyncio.to_thread(self.disk.get, key)
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Disk cache read failed: %s", exc)
+            return None
+        if found is None:
+            return None
+        entry, remaining = found
+        self.memory.set(key, entry, remaining)
+        return entry
+
+    async def get_many(self, keys: List[str]) -> Dict[str, CacheEntry]:
+        # get() for many keys, with one disk round trip for everything memory misses.
+        found: Dict[str, CacheEntry] = {}
+        missing: List[str] = []
+        for key in keys:
+            entry = self.memory.get(key)
+            if entry is not None:
+                found[key] = entry
+            else:
+                missing.append(key)
+        if not missing or self.disk is None:
+            return found
+        try:
+            rows = await asyncio.to_thread(self.disk.get_many, missing)
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Disk cache read failed: %s", exc)
+            return found
+        for key, (entry, remaining) in rows.items():
+            self.memory.set(key, entry, remaining)
+            found[key] = entry
+        return found
+
+    async def set(self, key: str, source: str, kind: str, payload: Any) -> None:
+        ttl = self.ttl_for(source, kind)
+        if ttl <= 0:
+            return
+        entry = (kind, payload)
+        self.memory.set(key, entry, ttl)
+        # Failures are per-process back-off only; they should not outlive a worker restart.
+        if self.disk is not None and kind != ERROR:
+            try:
+                await asyncio.to_thread(self.disk.set, key, entry, ttl)
+            except Exception as exc:  # pragma: no cover - defensive
+                logger.warning("Disk cache write failed: %s", exc)
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "memory": {
+                "entries": len(self.memory),
+                "max_entries": self.memory.max_entries,
+                "hits": self.memory.hits,
+                "misses": self.memory.misses,
+                "evictions": self.memory.evictions,
+                "expirations": self.memory.expirations,
+            }
+        }
+        if self.disk is not None:
+            stats["disk"] = {"hits": self.disk.hits, "misses": self.disk.misses}
+        return stats
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
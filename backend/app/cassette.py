@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+import httpx
+
+from .config import Settings
+
+logger = logging.getLogger(__name__)
+
+# As in upstream.IDENTITY_PARAMS: the caller's identity, not part of the query.
+IDENTITY_PARAMS = {"mailto"}
+# Response headers worth keeping; the body is stored decoded, so encodings and lengths are not.
+KEPT_HEADERS = ("content-type", "retry-after")
+
+Interaction = Tuple[int, Dict[str, str], bytes, float]
+
+
+def fingerprint(request: httpx.Request) -> str:
+    params = sorted(
+        (k, v) for k, v in request.url.params.multi_items() if k not in IDENTITY_PARAMS
+    )
+    url = f"{request.url.scheme}://{request.url.host}{request.url.path}"
+    if params:
+        url += "?" + urlencode(params)
+    body = hashlib.sha1(request.content).hexdigest()[:16] if request.content else "-"
+    return f"{request.method} {url} {body}"
+
+
+class Cassette:
+    # One SQLite file of responses keyed by request fingerprint. Repeats of a request are
+    # numbered in the order sent, so a 429 then a retry replays the same way.
+    def __init__(self, path: str, readonly: bool = False) -> None:
+        if readonly:
+            self._conn = sqlite3.connect(
+                f"file:{path}?mode=ro", uri=True, check_same_thread=False
+            )
+        else:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS interactions ("
+                "key TEXT NOT NULL, occurrence INTEGER NOT NULL, host TEXT NOT NULL, "
+                "status INTEGER NOT NULL, headers TEXT NOT NULL, body BLOB NOT NULL, "
+                "elapsed REAL NOT NULL, PRIMARY KEY (key, occurrence)) WITHOUT ROWID"
+            )
+            self._conn.commit()
+        self._lock = threading.Lock()
+
+    def write(
+        self, key: str, occurrence: int, host: str, interaction: Interaction
+    ) -> None:
+        status, headers, body, elapsed = interaction
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO interactions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, occurrence, host, status, json.dumps(headers), zlib.compress(body), elapsed),
+            )
+            self._conn.commit()
+
+    def read(self, key: str, occurrence: int) -> Optional[Interaction]:
+        # Past the last recorded occurrence, the last one is served again.
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, body, elapsed FROM interactions "
+                "WHERE key = ? AND occurrence <= ? ORDER BY occurrence DESC LIMIT 1",
+                (key, occurrence),
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, body, elapsed = row
+        return status, json.loads(headers), zlib.decompress(body), elapsed
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT host, status, COUNT(*), SUM(LENGTH(body)) FROM interactions "
+                "GROUP BY host, status ORDER BY host, status"
+            ).fetchall()
+        return {
+            "interactions": sum(r[2] for r in rows),
+            "compressed_bytes": sum(r[3] for r in rows),
+            "by_host": {f"{host} {status}": count for host, status, count, _ in rows},
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    # "record" sends through `inner` and writes each response; "replay" never uses the network.
+    def __init__(
+        self,
+        cassette: Cassette,
+        mode: str,
+        inner: Optional[httpx.AsyncBaseTransport] = None,
+        latency_scale: float = 0.0,
+    ) -> None:
+        if mode == "record" and inner is None:
+            raise ValueError("recording needs a transport to send requests with")
+        self.cassette = cassette
+        self.mode = mode
+        self.inner = inner
+        self.latency_scale = latency_scale
+        self._occurrences: Counter = Counter()
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(
+        cls, settings: Settings, limits: httpx.Limits, http2: bool
+    ) -> "CassetteTransport":
+        if not settings.cassette_path:
+            raise ValueError("CASSETTE_PATH is required when CASSETTE_MODE is set")
+        if settings.cassette_mode == "replay":
+            return cls(
+                Cassette(settings.cassette_path, readonly=True),
+                "replay",
+                latency_scale=settings.cassette_latency_scale,
+            )
+        return cls(
+            Cassette(settings.cassette_path),
+            "record",
+            inner=httpx.AsyncHTTPTransport(limits=limits, http2=http2),
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = fingerprint(request)
+        occurrence = self._occurrences[key]
+        self._occurrences[key] += 1
+        if self.mode == "replay":
+            return await self._replay(request, key, occurrence)
+        started = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        try:
+            body = await response.aread()
+        finally:
+            await response.aclose()
+        elapsed = time.perf_counter() - started
+        headers = {
+            name: response.headers[name] for name in KEPT_HEADERS if name in response.headers
+        }
+        interaction = (response.status_code, headers, body, elapsed)
+        await asyncio.to_thread(
+            self.cassette.write, key, occurrence, request.url.host, interaction
+        )
+        self.recorded += 1
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def _replay(self, request: httpx.Request, key: str, occurrence: int) -> httpx.Response:
+        found = await asyncio.to_thread(self.cassette.read, key, occurrence)
+        if found is None:
+            self.misses += 1
+            logger.warning("No cassette entry for %s", key)
+            raise httpx.ConnectError(f"not in cassette: {key}", request=request)
+        status, headers, body, elapsed = found
+        if self.latency_scale:
+            await asyncio.sleep(elapsed * self.latency_scale)
+        self.replayed += 1
+        return httpx.Response(status, headers=headers, content=body, request=request)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "misses": self.misses,
+        }
+
+    async def shutdown(self) -> None:
+        # Not aclose(): every per-host AsyncClient closes its transport, and this one is shared.
+        if self.inner is not None:
+            await self.inner.aclose()
+        self.cassette.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect an upstream cassette")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info", help="count recorded interactions by host and status")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+    cassette = Cassette(args.path, readonly=True)
+    try:
+        print(json.dumps(cassette.summary(), indent=2))
+    finally:
+        cassette.close()
+
+
+if __name__ == "__main__":
+    main()
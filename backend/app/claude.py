@@ -1,57 +1,273 @@
+import asyncio
+import hashlib
+import json
 import logging
-from typing import List, Optional
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import httpx
 
-from .config import get_settings
+from .cache import LRUCache
+from .coalesce import SingleFlight
+from .config import Settings, get_settings
 from .models import PaperMetadata
+from .relevance import RelevanceScorer
+from .telemetry import span
+from .transport import HttpPool, session
 
 logger = logging.getLogger(__name__)
 
 CLAUDE_URL = "https://api.anthropic.com/v1/messages"
+MODEL = "claude-3-sonnet-20240229"
+MISSING_KEY_ANSWER = (
+    "Claude API key missing. Provide ANTHROPIC_API_KEY to enable AI reasoning. "
+    "For now, this is a stubbed response."
+)
+UNAVAILABLE_ANSWER = "Claude is unavailable at the moment. Please try again later."
+EMPTY_ANSWER = "Claude returned an empty response."
+
+
+def _payload(prompt: str, system: Optional[str], max_tokens: int) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {
+        "model": MODEL,
+        "max_tokens": max_tokens,
+        "messages": [{"role": "user", "content": prompt}],
+    }
+    if system:
+        payload["system"] = system
+    return payload
+
+
+def _headers(api_key: str) -> Dict[str, str]:
+    return {
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01",
+        "content-type": "application/json",
+    }
+
+
+def prompt_key(payload: Dict[str, Any]) -> str:
+    # (model, system, prompt, max_tokens): everything that determines the completion.
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class _SharedStream:
+    # One upstream completion streamed to every caller that asked for the same prompt while
+    # it was running; late joiners first get the chunks produced so far.
+    def __init__(self) -> None:
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.task: Optional["asyncio.Task[None]"] = None
+
+    async def publish(self, chunk: str) -> None:
+        async with self.changed:
+            self.chunks.append(chunk)
+            self.changed.notify_all()
+
+    async def finish(self, error: Optional[BaseException] = None) -> None:
+        async with self.changed:
+            self.done = True
+            self.error = error
+            self.changed.notify_all()
+
+    async def follow(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: self.done or len(self.chunks) > position)
+                chunks, done, error = self.chunks[position:], self.done, self.error
+            for chunk in chunks:
+                yield chunk
+            position += len(chunks)
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+
+class ClaudeCache:
+    # Completed answers keyed on prompt_key, with a TTL and LRU eviction. Identical prompts
+    # in flight at the same time share one upstream call (or one upstream stream).
+    # Failures are never cached.
+    def __init__(self, settings: Optional[Settings] = None) -> None:
+        settings = settings or get_settings()
+        self.ttl = settings.claude_cache_ttl
+        self.answers = LRUCache(settings.claude_cache_max_entries)
+        self.flight = SingleFlight()
+        self.streams: Dict[str, _SharedStream] = {}
+        self.stream_joins = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.answers.get(key)
+        return entry[1] if entry is not None else None
+
+    def set(self, key: str, answer: str) -> None:
+        self.answers.set(key, ("ok", answer), self.ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.answers),
+            "hits": self.answers.hits,
+            "misses": self.answers.misses,
+            "evictions": self.answers.evictions,
+            "coalesced": self.flight.coalesced + self.stream_joins,
+            "streams_in_flight": len(self.streams),
+        }
+
+
+async def _complete(payload: Dict[str, Any], api_key: str, pool: Optional[HttpPool]) -> str:
+    settings = get_settings()
+    async with session(pool, CLAUDE_URL, settings.request_timeout) as client:
+        response = await client.post(
+            CLAUDE_URL, headers=_headers(api_key), json=payload, timeout=settings.request_timeout
+        )
+        response.raise_for_status()
+        data = response.json()
+    content = data.get("content", [])
+    if isinstance(content, list) and content:
+        text_blocks = [block.get("text", "") for block in content if block.get("type") == "text"]
+        return "\n".join([t for t in text_blocks if t])
+    return data.get("content", "") or ""
 
 
 async def call_claude(
     prompt: str,
     system: Optional[str] = None,
     max_tokens: int = 400,
+    pool: Optional[HttpPool] = None,
+    cache: Optional[ClaudeCache] = None,
 ) -> str:
     settings = get_settings()
     if not settings.anthropic_api_key:
-        return (
-            "Claude API key missing. Provide ANTHROPIC_API_KEY to enable AI reasoning. "
-            "For now, this is a stubbed response."
-        )
-
-    headers = {
-        "x-api-key": settings.anthropic_api_key,
-        "anthropic-version": "2023-06-01",
-        "content-type": "application/json",
-    }
-    payload = {
-        "model": "claude-3-sonnet-20240229",
-        "max_tokens": max_tokens,
-        "messages": [{"role": "user", "content": prompt}],
-    }
-    if system:
-        payload["system"] = system
+        return MISSING_KEY_ANSWER
 
-    async with httpx.AsyncClient(timeout=settings.request_timeout) as client:
+    payload = _payload(prompt, system, max_tokens)
+    with span("claude", max_tokens=max_tokens) as current:
         try:
-            response = await client.post(CLAUDE_URL, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            content = data.get("content", [])
-            if isinstance(content, list) and content:
-                text_blocks = [block.get("text", "") for block in content if block.get("type") == "text"]
-                return "\n".join([t for t in text_blocks if t])
-            return data.get("content", "") or "Claude returned an empty response."
+            if cache is None:
+                return await _complete(payload, settings.anthropic_api_key, pool) or EMPTY_ANSWER
+            key = prompt_key(payload)
+            answer = cache.get(key)
+            if answer is not None:
+                current.set(cache="hit")
+                return answer
+
+            async def fetch() -> str:
+                result = await _complete(payload, settings.anthropic_api_key, pool)
+                # An empty completion is answered with the fallback text but never cached.
+                if result:
+                    cache.set(key, result)
+                return result
+
+            return await cache.flight.run(key, fetch) or EMPTY_ANSWER
         except Exception as exc:  # pragma: no cover - defensive
             logger.warning("Claude API call failed: %s", exc)
-            return "Claude is unavailable at the moment. Please try again later."
+            return UNAVAILABLE_ANSWER
+
+
+async def _stream_upstream(
+    payload: Dict[str, Any], api_key: str, pool: Optional[HttpPool]
+) -> AsyncIterator[str]:
+    # Text deltas from the Messages API event stream.
+    settings = get_settings()
+    async with session(pool, CLAUDE_URL, settings.request_timeout) as client:
+        async with client.stream(
+            "POST",
+            CLAUDE_URL,
+            headers=_headers(api_key),
+            json={**payload, "stream": True},
+            timeout=settings.request_timeout,
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                if event.get("type") == "content_block_delta":
+                    delta = event.get("delta") or {}
+                    if delta.get("type") == "text_delta" and delta.get("text"):
+                        yield delta["text"]
+                elif event.get("type") == "error":
+                    raise httpx.HTTPError(str(event.get("error")))
+
+
+async def stream_claude(
+    prompt: str,
+    system: Optional[str] = None,
+    max_tokens: int = 400,
+    pool: Optional[HttpPool] = None,
+    cache: Optional[ClaudeCache] = None,
+) -> AsyncIterator[str]:
+    # Yields the answer as it is generated. Cached answers arrive as a single chunk. Errors
+    # are logged and surface as the usual fallback text, as with call_claude.
+    settings = get_settings()
+    if not settings.anthropic_api_key:
+        yield MISSING_KEY_ANSWER
+        return
+    payload = _payload(prompt, system, max_tokens)
+    if cache is None:
+        cache = ClaudeCache(settings)
+    key = prompt_key(payload)
+    answer = cache.get(key)
+    if answer is not None:
+        yield answer
+        return
+
+    shared = cache.streams.get(key)
+    if shared is None:
+        shared = cache.streams[key] = _SharedStream()
+
+        async def produce() -> None:
+            parts: List[str] = []
+            try:
+                async for chunk in _stream_upstream(payload, settings.anthropic_api_key, pool):
+                    parts.append(chunk)
+                    await shared.publish(chunk)
+            except asyncio.CancelledError:
+                await shared.finish(asyncio.CancelledError())
+                raise
+            except Exception as exc:
+                await shared.finish(exc)
+            else:
+                if parts:
+                    cache.set(key, "".join(parts))
+                await shared.finish()
+            finally:
+                if cache.streams.get(key) is shared:
+                    del cache.streams[key]
+
+        shared.task = asyncio.create_task(produce())
+    else:
+        cache.stream_joins += 1
+
+    shared.subscribers += 1
+    produced = False
+    try:
+        async for chunk in shared.follow():
+            produced = True
+            yield chunk
+    except Exception as exc:
+        logger.warning("Claude streaming call failed: %s", exc)
+        if not produced:
+            yield UNAVAILABLE_ANSWER
+    else:
+        if not produced:
+            yield EMPTY_ANSWER
+    finally:
+        shared.subscribers -= 1
+        if shared.subscribers == 0 and shared.task is not None and not shared.task.done():
+            # Every listener went away; stop paying for the rest of the completion.
+            shared.task.cancel()
+            if cache.streams.get(key) is shared:
+                del cache.streams[key]
 
 
-async def build_plan_summary(plan_text: str) -> PaperMetadata:
+async def build_plan_summary(
+    plan_text: str, pool: Optional[HttpPool] = None, cache: Optional[ClaudeCache] = None
+) -> PaperMetadata:
     system_prompt = (
         "You are a research assistant that rewrites a user's research plan into "
         "concise pseudo-paper metadata. Extract keywords, key topics, goals, and a short abstract."
@@ -61,7 +277,10 @@ async def build_plan_summary(plan_text: str) -> PaperMetadata:
         f"{plan_text}\n\n"
         "Return a summary with title, abstract, keywords, and main authors or stakeholders."
     )
-    response = await call_claude(prompt, system=system_prompt, max_tokens=300)
+    # Identical plan text hits the answer cache and returns without an upstream call.
+    response = await call_claude(
+        prompt, system=system_prompt, max_tokens=300, pool=pool, cache=cache
+    )
     # Minimal parsing to avoid relying on Claude formatting; this can be replaced by a structured call.
     lines = [line.strip() for line in response.splitlines() if line.strip()]
     keywords: List[str] = []
@@ -92,13 +311,61 @@ async def build_plan_summary(plan_text: str) -> PaperMetadata:
     )
 
 
-async def answer_about_paper(
-    paper: PaperMetadata, related: List[PaperMetadata], message: str
-) -> str:
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English prose; only used for budgeting.
+    return len(text) // 4 + 1
+
+
+def _related_line(paper: PaperMetadata) -> str:
+    return f"- {paper.title} ({paper.year or 'n/a'}) by {', '.join(paper.authors[:3])}"
+
+
+def select_context(
+    paper: PaperMetadata,
+    related: List[PaperMetadata],
+    message: str,
+    token_budget: int,
+    max_papers: int,
+) -> List[Tuple[PaperMetadata, bool]]:
+    # Ranks related papers against the question and the selected paper, keeps the top ones
+    # whose summary lines fit the budget, then spends what is left on abstracts in rank order.
+    # Returns (paper, include_abstract) pairs, best first.
+    candidates = [p for p in related if p.id != paper.id and p.title]
+    if not candidates or max_papers <= 0:
+        return []
+    similarity = RelevanceScorer(paper, question=message).similarity(candidates)
+    # Stable sort: ties keep the order the client sent (usually its own ranking).
+    order = sorted(range(len(candidates)), key=lambda i: -similarity[i])
+    chosen: List[PaperMetadata] = []
+    remaining = token_budget
+    for index in order:
+        if len(chosen) == max_papers:
+            break
+        cost = estimate_tokens(_related_line(candidates[index]))
+        if cost > remaining:
+            continue
+        chosen.append(candidates[index])
+        remaining -= cost
+    selected = []
+    for candidate in chosen:
+        cost = estimate_tokens(candidate.abstract) if candidate.abstract else 0
+        with_abstract = 0 < cost <= remaining
+        if with_abstract:
+            remaining -= cost
+        selected.append((candidate, with_abstract))
+    return selected
+
+
+def paper_prompt(paper: PaperMetadata, related: List[PaperMetadata], message: str) -> str:
+    settings = get_settings()
+    context = select_context(
+        paper, related, message, settings.claude_context_tokens, settings.claude_context_papers
+    )
     related_summaries = "\n".join(
-        [f"- {p.title} ({p.year or 'n/a'}) by {', '.join(p.authors[:3])}" for p in related]
+        _related_line(p) + (f"\n  Abstract: {p.abstract}" if with_abstract else "")
+        for p, with_abstract in context
     )
-    prompt = (
+    return (
         f"Paper: {paper.title}\n"
         f"Authors: {', '.join(paper.authors)}\n"
         f"Abstract: {paper.abstract or 'N/A'}\n"
@@ -107,4 +374,29 @@ async def answer_about_paper(
         f"User question: {message}\n"
         "Provide a concise, helpful answer focused on the research details and connections."
     )
-    return await call_claude(prompt, max_tokens=400)
+
+
+async def answer_about_paper(
+    paper: PaperMetadata,
+    related: List[PaperMetadata],
+    message: str,
+    pool: Optional[HttpPool] = None,
+    cache: Optional[ClaudeCache] = None,
+) -> str:
+    # Ranking hundreds of related papers takes tens of milliseconds; keep it off the loop.
+    prompt = await asyncio.to_thread(paper_prompt, paper, related, message)
+    return await call_claude(prompt, max_tokens=400, pool=pool, cache=cache)
+
+
+async def stream_answer_about_paper(
+    paper: PaperMetadata,
+    related: List[PaperMetadata],
+    message: str,
+    pool: Optional[HttpPool] = None,
+    cache: Optional[ClaudeCache] = None,
+) -> AsyncIterator[str]:
+    prompt = await asyncio.to_thread(paper_prompt, paper, related, message)
+    # aclosing: a client disconnect must release the shared stream now, not at finalization.
+    async with aclosing(stream_claude(prompt, max_tokens=400, pool=pool, cache=cache)) as chunks:
+        async for chunk in chunks:
+            yield chunk
@@ -1,61 +1,110 @@
 import logging
-from typing import List
+from typing import Any, Dict, List, Optional
 from xml.etree import ElementTree
 
 import httpx
 
 from ..config import get_settings
 from ..models import PaperMetadata
+from ..queries import EMPTY_ARXIV, canonical_terms
+from ..telemetry import UPSTREAM_REQUESTS
+from ..upstream import Upstream
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = "http://export.arxiv.org/api/query"
+SOURCE = "arxiv"
+ATOM = "{http://www.w3.org/2005/Atom}"
+ARXIV = "{http://arxiv.org/schemas/atom}"
+# Bytes fed to the pull parser at a time.
+FEED_CHUNK = 64 * 1024
+
+
+def _no_entries(entries: list) -> bool:
+    return not entries
+
+
+def _entry(entry: ElementTree.Element) -> Dict[str, Any]:
+    paper_id = entry.findtext(f"{ATOM}id")
+    title = entry.findtext(f"{ATOM}title")
+    abstract = entry.findtext(f"{ATOM}summary")
+    doi = entry.findtext(f"{ARXIV}doi")
+    link = entry.find(f"{ATOM}link[@type='application/pdf']")
+    external_ids = {}
+    if paper_id:
+        external_ids["arxiv"] = paper_id.rsplit("/abs/", 1)[-1]
+    if doi and doi.strip():
+        external_ids["doi"] = doi.strip()
+    return {
+        "id": paper_id or "",
+        "title": title.strip() if title is not None else "Untitled",
+        "abstract": abstract.strip() if abstract is not None else None,
+        "authors": [
+            name for name in (a.findtext(f"{ATOM}name") for a in entry.findall(f"{ATOM}author"))
+            if name
+        ],
+        "pdf_link": link.get("href") if link is not None else None,
+        "external_ids": external_ids,
+    }
+
+
+def parse_entries(content: bytes) -> List[Dict[str, Any]]:
+    # Incremental parse: each entry is reduced to the fields we keep as soon as it closes and
+    # then cleared, so the feed's element tree is never held in full. A malformed feed keeps
+    # the entries read before the error.
+    parser = ElementTree.XMLPullParser(events=("end",))
+    entries: List[Dict[str, Any]] = []
+    try:
+        for start in range(0, len(content), FEED_CHUNK):
+            parser.feed(content[start : start + FEED_CHUNK])
+            for _, element in parser.read_events():
+                if element.tag == f"{ATOM}entry":
+                    entries.append(_entry(element))
+                    element.clear()
+        parser.close()
+    except ElementTree.ParseError as exc:
+        logger.warning("arXiv XML parse failed: %s", exc)
+    return entries
+
+
+def parse_feed(response: httpx.Response) -> List[Dict[str, Any]]:
+    # Runs as the upstream parse step, so large feeds are decoded off the event loop and the
+    # cache keeps the compact entries rather than the Atom text.
+    return parse_entries(response.content)
 
 
 class ArxivClient:
-    def __init__(self, timeout: int = 15) -> None:
+    def __init__(self, timeout: int = 15, upstream: Optional[Upstream] = None) -> None:
         settings = get_settings()
         self.timeout = timeout or settings.request_timeout
+        self.upstream = upstream or Upstream()
 
     async def search(self, keywords: List[str], limit: int = 5) -> List[PaperMetadata]:
-        if not keywords:
+        terms = canonical_terms(keywords)
+        if not terms:
+            return []
+        if EMPTY_ARXIV.predicts_empty(terms):
+            UPSTREAM_REQUESTS.inc(source=SOURCE, endpoint="query", outcome="predicted_empty")
             return []
-        query = "+AND+".join(f"all:{kw}" for kw in keywords)
+        # Spaces, which the query string encodes as "+"; a literal "+AND+" would be escaped.
+        query = " AND ".join(f"all:{term}" for term in terms)
         params = {"search_query": query, "start": 0, "max_results": limit}
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.get(BASE_URL, params=params)
-                response.raise_for_status()
-            except Exception as exc:  # pragma: no cover - defensive
-                logger.warning("arXiv search failed: %s", exc)
-                return []
-        return self._parse_feed(response.text)
-
-    def _parse_feed(self, xml_text: str) -> List[PaperMetadata]:
-        results: List[PaperMetadata] = []
         try:
-            root = ElementTree.fromstring(xml_text)
-        except Exception as exc:  # pragma: no cover - defensive
-            logger.warning("arXiv XML parse failed: %s", exc)
-            return results
-        ns = {"atom": "http://www.w3.org/2005/Atom"}
-        for entry in root.findall("atom:entry", ns):
-            title_el = entry.find("atom:title", ns)
-            abstract_el = entry.find("atom:summary", ns)
-            link_el = entry.find("atom:link[@type='application/pdf']", ns)
-            authors = [a.find("atom:name", ns).text for a in entry.findall("atom:author", ns) if a.find("atom:name", ns) is not None]
-            paper_id = entry.find("atom:id", ns)
-            results.append(
-                PaperMetadata(
-                    id=paper_id.text if paper_id is not None else "",
-                    title=title_el.text.strip() if title_el is not None else "Untitled",
-                    abstract=abstract_el.text.strip() if abstract_el is not None else None,
-                    authors=authors,
-                    year=None,
-                    pdf_link=link_el.get("href") if link_el is not None else None,
-                    keywords=[],
-                    source="arxiv",
-                    references=[],
-                )
+            entries = await self.upstream.get(
+                SOURCE,
+                "query",
+                BASE_URL,
+                params=params,
+                timeout=self.timeout,
+                parse=parse_feed,
+                is_empty=_no_entries,
             )
-        return results
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("arXiv search failed: %s", exc)
+            return []
+        if not entries:
+            EMPTY_ARXIV.record(terms)
+        return [
+            PaperMetadata(**entry, year=None, keywords=[], source="arxiv", references=[])
+            for entry in entries
+        ]
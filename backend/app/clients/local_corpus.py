@@ -0,0 +1,38 @@
+import asyncio
+import logging
+from typing import List, Optional, Sequence
+
+from ..corpus import LocalCorpus
+from ..models import PaperMetadata, RelatedPaper
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCorpusClient:
+    # Async face of the on-disk corpus. SQLite and the memory-mapped arrays block, so every
+    # query runs in a worker thread and the event loop keeps serving upstream lookups.
+    def __init__(self, corpus: LocalCorpus) -> None:
+        self.corpus = corpus
+
+    @classmethod
+    def open(cls, path: str) -> "LocalCorpusClient":
+        return cls(LocalCorpus(path))
+
+    async def fetch_paper(self, identifier: str) -> Optional[PaperMetadata]:
+        try:
+            return await asyncio.to_thread(self.corpus.find, identifier)
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Local corpus lookup failed: %s", exc)
+            return None
+
+    async def related(
+        self, meta: PaperMetadata, keywords: Sequence[str], fanout: int = 10
+    ) -> List[RelatedPaper]:
+        try:
+            return await asyncio.to_thread(self.corpus.related, meta, keywords, fanout)
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Local corpus search failed: %s", exc)
+            return []
+
+    def close(self) -> None:
+        self.corpus.close()
@@ -1,24 +1,44 @@
 import logging
-from typing import List, Optional
-
-import httpx
+from typing import Dict, List, Optional
 
 from ..config import get_settings
+from ..identity import normalize_doi
 from ..models import PaperMetadata
+from ..queries import title_query
+from ..upstream import Upstream
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://api.openalex.org"
+SOURCE = "openalex"
+WORK_PREFIX = "https://openalex.org/"
+# Ids OR-ed into one `openalex_id` filter; OpenAlex accepts up to 100 values per filter.
+WORKS_PER_LOOKUP = 50
+# Root fields _to_metadata reads. Full records also carry concepts, locations, the abstract
+# index and yearly counts, several times the size of what is kept.
+SELECT_FIELDS = "id,doi,ids,display_name,title,publication_year,biblio,authorships,referenced_works"
+
+
+def _no_results(payload: dict) -> bool:
+    return not payload.get("results")
 
 
 class OpenAlexClient:
-    def __init__(self, email: Optional[str] = None, timeout: int = 15) -> None:
+    def __init__(
+        self,
+        email: Optional[str] = None,
+        timeout: int = 15,
+        upstream: Optional[Upstream] = None,
+    ) -> None:
         settings = get_settings()
         self.email = email or settings.openalex_email
         self.timeout = timeout or settings.request_timeout
+        # Requests carrying mailto are served from OpenAlex's polite pool.
+        self.budget = f"{SOURCE}_polite" if self.email else SOURCE
+        self.upstream = upstream or Upstream()
 
     def _params(self) -> dict:
-        params: dict = {}
+        params: dict = {"select": SELECT_FIELDS}
         if self.email:
             params["mailto"] = self.email
         return params
@@ -26,21 +46,28 @@ class OpenAlexClient:
     async def search_by_title(
         self, title: str, limit: int = 5
     ) -> List[PaperMetadata]:
-        if not title:
+        query = title_query(title)
+        if not query:
             return []
         params = {
             **self._params(),
-            "search": title,
+            "search": query,
             "per-page": limit,
         }
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.get(f"{BASE_URL}/works", params=params)
-                response.raise_for_status()
-            except Exception as exc:  # pragma: no cover - defensive
-                logger.warning("OpenAlex title search failed: %s", exc)
-                return []
-        works = response.json().get("results", [])
+        try:
+            data = await self.upstream.get(
+                SOURCE,
+                "title_search",
+                f"{BASE_URL}/works",
+                params=params,
+                timeout=self.timeout,
+                is_empty=_no_results,
+                budget=self.budget,
+            )
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("OpenAlex title search failed: %s", exc)
+            return []
+        works = data.get("results", [])
         return [self._to_metadata(item) for item in works if item]
 
     async def related_by_authors(
@@ -54,14 +81,20 @@ class OpenAlexClient:
             "filter": f"authorships.author.display_name.search:{author}",
             "per-page": limit,
         }
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.get(f"{BASE_URL}/works", params=params)
-                response.raise_for_status()
-            except Exception as exc:  # pragma: no cover - defensive
-                logger.warning("OpenAlex author search failed: %s", exc)
-                return []
-        works = response.json().get("results", [])
+        try:
+            data = await self.upstream.get(
+                SOURCE,
+                "author_search",
+                f"{BASE_URL}/works",
+                params=params,
+                timeout=self.timeout,
+                is_empty=_no_results,
+                budget=self.budget,
+            )
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("OpenAlex author search failed: %s", exc)
+            return []
+        works = data.get("results", [])
         return [self._to_metadata(item) for item in works if item]
 
     async def fetch_by_doi(self, doi: str) -> Optional[PaperMetadata]:
@@ -69,14 +102,82 @@ class OpenAlexClient:
             return None
         url = f"{BASE_URL}/works/https://doi.org/{doi}"
         params = self._params()
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        try:
+            data = await self.upstream.get(
+                SOURCE, "work", url, params=params, timeout=self.timeout, budget=self.budget
+            )
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("OpenAlex DOI fetch failed: %s", exc)
+            return None
+        return self._to_metadata(data)
+
+    async def fetch_by_dois(self, dois: List[str]) -> Dict[str, PaperMetadata]:
+        # Many DOIs with one filtered query per WORKS_PER_LOOKUP, keyed by normalized DOI.
+        keys = list(dict.fromkeys(filter(None, map(normalize_doi, dois))))
+        found: Dict[str, PaperMetadata] = {}
+        for start in range(0, len(keys), WORKS_PER_LOOKUP):
+            chunk = keys[start : start + WORKS_PER_LOOKUP]
+            params = {
+                **self._params(),
+                "filter": f"doi:{'|'.join(chunk)}",
+                "per-page": len(chunk),
+            }
+            try:
+                data = await self.upstream.get(
+                    SOURCE,
+                    "works_by_doi",
+                    f"{BASE_URL}/works",
+                    params=params,
+                    timeout=self.timeout,
+                    is_empty=_no_results,
+                    budget=self.budget,
+                )
+            except Exception as exc:  # pragma: no cover - defensive
+                logger.warning("OpenAlex DOI lookup failed: %s", exc)
+                continue
+            for item in data.get("results", []):
+                meta = self._to_metadata(item)
+                doi = normalize_doi(meta.external_ids.get("doi")) if meta else None
+                if doi:
+                    found[doi] = meta
+        return found
+
+    async def fetch_works(self, work_ids: List[str]) -> List[PaperMetadata]:
+        # Hydrates OpenAlex work ids (such as referenced_works) with one filtered query per
+        # WORKS_PER_LOOKUP ids instead of one request per work.
+        keys = [i.removeprefix(WORK_PREFIX) for i in dict.fromkeys(work_ids)]
+        results: List[PaperMetadata] = []
+        for start in range(0, len(keys), WORKS_PER_LOOKUP):
+            chunk = keys[start : start + WORKS_PER_LOOKUP]
+            params = {
+                **self._params(),
+                "filter": f"openalex_id:{'|'.join(chunk)}",
+                "per-page": len(chunk),
+            }
             try:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
+                data = await self.upstream.get(
+                    SOURCE,
+                    "works_batch",
+                    f"{BASE_URL}/works",
+                    params=params,
+                    timeout=self.timeout,
+                    is_empty=_no_results,
+                    budget=self.budget,
+                )
             except Exception as exc:  # pragma: no cover - defensive
-                logger.warning("OpenAlex DOI fetch failed: %s", exc)
-                return None
-        return self._to_metadata(response.json())
+                logger.warning("OpenAlex works lookup failed: %s", exc)
+                continue
+            results.extend(
+                meta for meta in map(self._to_metadata, data.get("results", [])) if meta
+            )
+        return results
+
+    async def fetch_references(
+        self, meta: PaperMetadata, limit: int = 10
+    ) -> List[PaperMetadata]:
+        # Works cite each other by OpenAlex id; `references` holds them for OpenAlex records.
+        work_ids = [r for r in meta.references if r.startswith(WORK_PREFIX)]
+        return await self.fetch_works(work_ids[:limit])
 
     def _to_metadata(self, payload: dict) -> Optional[PaperMetadata]:
         if not payload:
@@ -91,6 +192,7 @@ class OpenAlexClient:
             name = author.get("display_name")
             if name:
                 authors.append(name)
+        external_ids = {str(k): str(v) for k, v in ids.items() if v}
         biblio = payload.get("biblio") or {}
         year = biblio.get("year_published") or payload.get("publication_year")
         return PaperMetadata(
@@ -102,5 +204,6 @@ class OpenAlexClient:
             pdf_link=None,
             keywords=[],
             source="openalex",
-            references=[],
+            references=[str(work) for work in payload.get("referenced_works") or []],
+            external_ids=external_ids,
         )
@@ -1,21 +1,71 @@
+import asyncio
 import logging
-from typing import List, Optional
-
-import httpx
+from typing import Dict, List, Optional
 
 from ..config import get_settings
+from ..identity import normalize_arxiv, normalize_doi
 from ..models import PaperMetadata
+from ..queries import canonical_terms
+from ..upstream import Upstream
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://api.semanticscholar.org/graph/v1"
+SOURCE = "semantic_scholar"
+
+# Only what _to_metadata reads; paperId is always returned. Link counts are asked for
+# separately, by the edge lookups that need them.
+PAPER_FIELDS = "title,abstract,year,authors.name,externalIds,openAccessPdf"
+# /paper/batch accepts at most 500 ids per request.
+BATCH_SIZE = 500
+# Key of the linked paper in /citations and /references items.
+EDGE_KEYS = {"citations": "citingPaper", "references": "citedPaper"}
+COUNT_FIELDS = {"citations": "citationCount", "references": "referenceCount"}
+# Largest page /citations and /references serve.
+EDGE_PAGE_SIZE = 1000
+
+
+def _no_data(payload: dict) -> bool:
+    return not payload.get("data")
+
+
+def split_fanout(fanout: int, totals: Dict[str, int]) -> Dict[str, int]:
+    # Even split between citations and references; what one direction cannot use goes to the
+    # other.
+    references = min(totals["references"], fanout // 2)
+    citations = min(totals["citations"], fanout - references)
+    references = min(totals["references"], fanout - citations)
+    return {"citations": citations, "references": references}
+
+
+def paper_identifier(meta: PaperMetadata) -> Optional[str]:
+    # Any id form the Graph API accepts, so papers found via other sources can be looked up too.
+    ids = {k.lower(): v for k, v in meta.external_ids.items() if v}
+    if ids.get(SOURCE):
+        return ids[SOURCE]
+    if meta.source == SOURCE and meta.id:
+        return meta.id
+    doi = normalize_doi(ids.get("doi")) or normalize_doi(meta.id)
+    if doi:
+        return f"DOI:{doi}"
+    arxiv_id = normalize_arxiv(ids.get("arxiv"))
+    if arxiv_id:
+        return f"ARXIV:{arxiv_id}"
+    return None
 
 
 class SemanticScholarClient:
-    def __init__(self, api_key: Optional[str] = None, timeout: int = 15) -> None:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        timeout: int = 15,
+        upstream: Optional[Upstream] = None,
+    ) -> None:
         settings = get_settings()
         self.api_key = api_key or settings.semantic_scholar_api_key
         self.timeout = timeout or settings.request_timeout
+        self.budget = f"{SOURCE}_keyed" if self.api_key else SOURCE
+        self.upstream = upstream or Upstream()
 
     def _headers(self) -> dict:
         headers: dict = {}
@@ -25,67 +75,211 @@ class SemanticScholarClient:
 
     async def fetch_paper(self, identifier: str) -> Optional[PaperMetadata]:
         url = f"{BASE_URL}/paper/{identifier}"
-        params = {
-            "fields": "title,abstract,year,authors.name,externalIds,openAccessPdf,url,referenceCount,citationCount"
-        }
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        params = {"fields": PAPER_FIELDS}
+        try:
+            data = await self.upstream.get(
+                SOURCE,
+                "paper",
+                url,
+                params=params,
+                headers=self._headers(),
+                timeout=self.timeout,
+                budget=self.budget,
+            )
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Semantic Scholar fetch failed: %s", exc)
+            return None
+        return self._to_metadata(data)
+
+    async def fetch_papers(self, identifiers: List[str]) -> Dict[str, Optional[PaperMetadata]]:
+        # Hydrates many ids with POST /paper/batch. Each paper is cached under the same key as
+        # fetch_paper, so the two paths warm each other and only misses go upstream.
+        params = {"fields": PAPER_FIELDS}
+        results: Dict[str, Optional[PaperMetadata]] = {}
+        missing: List[str] = []
+        urls = {identifier: f"{BASE_URL}/paper/{identifier}" for identifier in identifiers}
+        cached = await self.upstream.cached_many(SOURCE, "paper", list(urls.values()), params)
+        for identifier, url in urls.items():
+            if url in cached:
+                results[identifier] = self._to_metadata(cached[url])
+            else:
+                missing.append(identifier)
+        for start in range(0, len(missing), BATCH_SIZE):
+            chunk = missing[start : start + BATCH_SIZE]
             try:
-                response = await client.get(url, params=params, headers=self._headers())
-                response.raise_for_status()
+                data = await self.upstream.post(
+                    SOURCE,
+                    "paper_batch",
+                    f"{BASE_URL}/paper/batch",
+                    json_body={"ids": chunk},
+                    params=params,
+                    headers=self._headers(),
+                    timeout=self.timeout,
+                    budget=self.budget,
+                    cache=False,
+                )
             except Exception as exc:  # pragma: no cover - defensive
-                logger.warning("Semantic Scholar fetch failed: %s", exc)
-                return None
-        data = response.json()
-        return self._to_metadata(data)
+                logger.warning("Semantic Scholar batch fetch failed: %s", exc)
+                continue
+            # The response is aligned with the request; unknown ids come back as null.
+            for identifier, item in zip(chunk, data):
+                results[identifier] = self._to_metadata(item)
+                if item:
+                    await self.upstream.store(
+                        SOURCE, "paper", f"{BASE_URL}/paper/{identifier}", params, item
+                    )
+        return results
 
     async def search_by_keywords(
         self, keywords: List[str], limit: int = 5
     ) -> List[PaperMetadata]:
-        if not keywords:
+        terms = canonical_terms(keywords)
+        if not terms:
             return []
-        query = " ".join(keywords)
         params = {
-            "query": query,
+            "query": " ".join(terms),
             "offset": 0,
             "limit": limit,
-            "fields": "title,abstract,year,authors.name,externalIds,openAccessPdf,url",
+            "fields": PAPER_FIELDS,
         }
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.get(
-                    f"{BASE_URL}/paper/search", params=params, headers=self._headers()
-                )
-                response.raise_for_status()
-            except Exception as exc:  # pragma: no cover - defensive
-                logger.warning("Semantic Scholar search failed: %s", exc)
-                return []
-        data = response.json()
+        try:
+            data = await self.upstream.get(
+                SOURCE,
+                "search",
+                f"{BASE_URL}/paper/search",
+                params=params,
+                headers=self._headers(),
+                timeout=self.timeout,
+                budget=self.budget,
+                is_empty=_no_data,
+            )
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Semantic Scholar search failed: %s", exc)
+            return []
         papers = data.get("data", [])
         return [self._to_metadata(item) for item in papers if item]
 
-    async def fetch_citations(
-        self, paper_id: str, limit: int = 5
-    ) -> List[PaperMetadata]:
-        url = f"{BASE_URL}/paper/{paper_id}/citations"
+    async def _edge_request(
+        self, direction: str, paper_id: str, offset: int, limit: int, fields: str
+    ) -> Optional[dict]:
+        url = f"{BASE_URL}/paper/{paper_id}/{direction}"
         params = {
-            "fields": "citingPaper.title,citingPaper.abstract,citingPaper.year,citingPaper.authors.name,citingPaper.externalIds,citingPaper.openAccessPdf,citingPaper.url",
+            "fields": ",".join(f"{EDGE_KEYS[direction]}.{field}" for field in fields.split(",")),
             "limit": limit,
         }
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        if offset:
+            params["offset"] = offset
+        try:
+            return await self.upstream.get(
+                SOURCE,
+                direction,
+                url,
+                params=params,
+                headers=self._headers(),
+                timeout=self.timeout,
+                budget=self.budget,
+                is_empty=_no_data,
+            )
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Semantic Scholar %s failed: %s", direction, exc)
+            return None
+
+    async def _page_ids(
+        self, direction: str, paper_id: str, ids: List[str], total: int, quota: int
+    ) -> List[str]:
+        # Extends the ids listed in a batch response by paging the rest of the list, ids only;
+        # stops at the quota or the end of the list.
+        offset: Optional[int] = len(ids)
+        while offset is not None and offset < total and len(ids) < quota:
+            payload = await self._edge_request(
+                direction, paper_id, offset, min(EDGE_PAGE_SIZE, quota - len(ids)), "paperId"
+            )
+            if payload is None:
+                break
+            page = [
+                (item.get(EDGE_KEYS[direction]) or {}).get("paperId")
+                for item in payload.get("data") or []
+            ]
+            ids.extend(i for i in page if i)
+            offset = payload.get("next") if page else None
+        return list(dict.fromkeys(ids))[:quota]
+
+    async def _linked_ids(self, paper_id: str, item: dict, fanout: int) -> Dict[str, List[str]]:
+        listed = {
+            direction: [e["paperId"] for e in item.get(direction) or [] if e and e.get("paperId")]
+            for direction in EDGE_KEYS
+        }
+        # Nested lists in batch responses can be shorter than the paper's real count.
+        totals = {
+            direction: max(item.get(COUNT_FIELDS[direction]) or 0, len(ids))
+            for direction, ids in listed.items()
+        }
+        quotas = split_fanout(fanout, totals)
+        pages = await asyncio.gather(
+            *(
+                self._page_ids(direction, paper_id, listed[direction], totals[direction], quota)
+                for direction, quota in quotas.items()
+            )
+        )
+        return dict(zip(quotas, pages))
+
+    async def fetch_edges_batch(
+        self, paper_ids: List[str], fanout: int = 10
+    ) -> Dict[str, Dict[str, List[PaperMetadata]]]:
+        # Citations and references of many papers, keyed by paper id then direction. One batch
+        # call lists the linked ids of every paper; lists longer than the batch response holds
+        # are paged by id; then all ids are hydrated together through fetch_papers. `fanout`
+        # caps the linked papers kept per paper, across both directions.
+        # Each paper's item is cached on its own, as fetch_papers does, so a paper whose links
+        # were looked up in another batch (or prefetched) is not asked for again.
+        fields = [*COUNT_FIELDS.values(), *(f"{d}.paperId" for d in EDGE_KEYS)]
+        params = {"fields": ",".join(fields)}
+        items: Dict[str, dict] = {}
+        missing: List[str] = []
+        urls = {paper_id: f"{BASE_URL}/paper/{paper_id}" for paper_id in paper_ids}
+        cached = await self.upstream.cached_many(SOURCE, "edges", list(urls.values()), params)
+        for paper_id, url in urls.items():
+            if url in cached:
+                items[paper_id] = cached[url]
+            else:
+                missing.append(paper_id)
+        for start in range(0, len(missing), BATCH_SIZE):
+            chunk = missing[start : start + BATCH_SIZE]
             try:
-                response = await client.get(url, params=params, headers=self._headers())
-                response.raise_for_status()
+                data = await self.upstream.post(
+                    SOURCE,
+                    "edges_batch",
+                    f"{BASE_URL}/paper/batch",
+                    json_body={"ids": chunk},
+                    params=params,
+                    headers=self._headers(),
+                    timeout=self.timeout,
+                    budget=self.budget,
+                    cache=False,
+                )
             except Exception as exc:  # pragma: no cover - defensive
-                logger.warning("Semantic Scholar citations failed: %s", exc)
-                return []
-        data = response.json().get("data", [])
-        results: List[PaperMetadata] = []
-        for item in data:
-            citing_paper = item.get("citingPaper", {})
-            meta = self._to_metadata(citing_paper)
-            if meta:
-                results.append(meta)
-        return results
+                logger.warning("Semantic Scholar batch edges failed: %s", exc)
+                continue
+            for paper_id, item in zip(chunk, data):
+                if item:
+                    items[paper_id] = item
+                    await self.upstream.store(
+                        SOURCE, "edges", f"{BASE_URL}/paper/{paper_id}", params, item
+                    )
+        linked_ids = await asyncio.gather(
+            *(self._linked_ids(paper_id, item, fanout) for paper_id, item in items.items())
+        )
+        linked = dict(zip(items, linked_ids))
+        hydrated = await self.fetch_papers(
+            [i for directions in linked.values() for ids in directions.values() for i in ids]
+        )
+        return {
+            paper_id: {
+                direction: [meta for meta in (hydrated.get(i) for i in ids) if meta]
+                for direction, ids in directions.items()
+            }
+            for paper_id, directions in linked.items()
+        }
 
     def _to_metadata(self, payload: dict) -> Optional[PaperMetadata]:
         if not payload:
@@ -97,6 +291,11 @@ class SemanticScholarClient:
             pdf_link = pdf_obj.get("url")
         authors = payload.get("authors") or []
         author_names = [a.get("name") for a in authors if a.get("name")]
+        external_ids = {
+            str(k).lower(): str(v) for k, v in (payload.get("externalIds") or {}).items() if v
+        }
+        if payload.get("paperId"):
+            external_ids[SOURCE] = payload["paperId"]
         return PaperMetadata(
             id=str(paper_id) if paper_id else payload.get("url") or payload.get("paperId", ""),
             title=payload.get("title") or "Untitled",
@@ -106,4 +305,5 @@ class SemanticScholarClient:
             pdf_link=pdf_link,
             keywords=[],
             source="semantic_scholar",
+            external_ids=external_ids,
         )
@@ -0,0 +1,73 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(
+        self, task: "asyncio.Future[Any]", context: Optional[contextvars.Context]
+    ) -> None:
+        self.task = task
+        self.context = context
+        self.waiters = 0
+
+
+# Concurrent callers with the same key share one in-flight upstream call. The shared call is
+# only cancelled once every caller waiting on it has gone away.
+class SingleFlight:
+    def __init__(self) -> None:
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def joining(self, key: str) -> bool:
+        # True if a call to run(key) now would share an existing flight.
+        return key in self._flights
+
+    async def run(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[T]],
+        context: Optional[contextvars.Context] = None,
+    ) -> T:
+        # `context` is what a new flight runs in; by default, a copy of the caller's.
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.get_running_loop().create_task(factory(), context=context)
+            flight = _Flight(task, context)
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._finish(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Detach first so a caller arriving mid-cancellation starts a fresh flight.
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def context(self, key: str) -> Optional[contextvars.Context]:
+        # The context the flight for `key` runs in, if one is running and was given one.
+        flight = self._flights.get(key)
+        return flight.context if flight is not None else None
+
+    def _finish(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Mark the exception as retrieved; waiters already received it via shield().
+            flight.task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+        }
@@ -1,6 +1,6 @@
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
 from dotenv import load_dotenv
 from pydantic import Field
@@ -23,6 +23,73 @@ class Settings(BaseSettings):
     request_timeout: int = Field(default=15, alias="REQUEST_TIMEOUT_SECONDS")
     max_graph_nodes: int = Field(default=30, alias="MAX_GRAPH_NODES")
     max_graph_depth: int = Field(default=2, alias="MAX_GRAPH_DEPTH")
+    expand_concurrency: int = Field(default=8, alias="EXPAND_CONCURRENCY")
+    expand_strategy: Literal["best_first", "bfs"] = Field(
+        default="best_first", alias="EXPAND_STRATEGY"
+    )
+    expand_deadline_seconds: Optional[float] = Field(default=None, alias="EXPAND_DEADLINE_SECONDS")
+    citation_fanout: int = Field(default=40, alias="CITATION_FANOUT")
+    prefetch_enabled: bool = Field(default=True, alias="PREFETCH_ENABLED")
+    prefetch_nodes: int = Field(default=4, alias="PREFETCH_NODES")
+    prefetch_concurrency: int = Field(default=2, alias="PREFETCH_CONCURRENCY")
+    prefetch_reserve: float = Field(default=0.5, alias="PREFETCH_RESERVE")
+    prefetch_warmup_path: Optional[str] = Field(default=None, alias="PREFETCH_WARMUP_PATH")
+    prefetch_warmup_papers: int = Field(default=50, alias="PREFETCH_WARMUP_PAPERS")
+    claude_cache_ttl: float = Field(default=24 * 3600, alias="CLAUDE_CACHE_TTL_SECONDS")
+    claude_cache_max_entries: int = Field(default=1024, alias="CLAUDE_CACHE_MAX_ENTRIES")
+    claude_context_tokens: int = Field(default=2000, alias="CLAUDE_CONTEXT_TOKENS")
+    claude_context_papers: int = Field(default=15, alias="CLAUDE_CONTEXT_PAPERS")
+    local_corpus_path: Optional[str] = Field(default=None, alias="LOCAL_CORPUS_PATH")
+    local_corpus_mode: Literal["source", "primary"] = Field(
+        default="source", alias="LOCAL_CORPUS_MODE"
+    )
+    session_ttl: float = Field(default=1800, alias="SESSION_TTL_SECONDS")
+    session_max_count: int = Field(default=256, alias="SESSION_MAX_COUNT")
+    session_max_bytes: int = Field(default=256 * 1024 * 1024, alias="SESSION_MAX_BYTES")
+    response_compression_min_bytes: int = Field(
+        default=1024, alias="RESPONSE_COMPRESSION_MIN_BYTES"
+    )
+    trace_buffer_size: int = Field(default=200, alias="TRACE_BUFFER_SIZE")
+    trace_max_spans: int = Field(default=2000, alias="TRACE_MAX_SPANS")
+    profiling_enabled: bool = Field(default=False, alias="PROFILING_ENABLED")
+    profile_interval_ms: float = Field(default=5.0, alias="PROFILE_INTERVAL_MS")
+    http_max_connections: int = Field(default=20, alias="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive: int = Field(default=10, alias="HTTP_MAX_KEEPALIVE")
+    http_keepalive_expiry: float = Field(default=30.0, alias="HTTP_KEEPALIVE_EXPIRY_SECONDS")
+    http2_enabled: bool = Field(default=True, alias="HTTP2_ENABLED")
+    cassette_mode: Literal["off", "record", "replay"] = Field(default="off", alias="CASSETTE_MODE")
+    cassette_path: Optional[str] = Field(default=None, alias="CASSETTE_PATH")
+    cassette_latency_scale: float = Field(default=0.0, alias="CASSETTE_LATENCY_SCALE")
+    cache_enabled: bool = Field(default=True, alias="CACHE_ENABLED")
+    cache_max_entries: int = Field(default=4096, alias="CACHE_MAX_ENTRIES")
+    cache_sqlite_path: Optional[str] = Field(default=None, alias="CACHE_SQLITE_PATH")
+    cache_ttl_default: float = Field(default=3600, alias="CACHE_TTL_SECONDS")
+    cache_ttl_semantic_scholar: float = Field(
+        default=6 * 3600, alias="CACHE_TTL_SEMANTIC_SCHOLAR_SECONDS"
+    )
+    cache_ttl_openalex: float = Field(default=6 * 3600, alias="CACHE_TTL_OPENALEX_SECONDS")
+    cache_ttl_arxiv: float = Field(default=3600, alias="CACHE_TTL_ARXIV_SECONDS")
+    cache_negative_ttl: float = Field(default=300, alias="CACHE_NEGATIVE_TTL_SECONDS")
+    cache_failure_ttl: float = Field(default=30, alias="CACHE_FAILURE_TTL_SECONDS")
+    coalesce_enabled: bool = Field(default=True, alias="COALESCE_ENABLED")
+    decode_offload_bytes: int = Field(default=128 * 1024, alias="DECODE_OFFLOAD_BYTES")
+    rate_semantic_scholar: float = Field(default=3.0, alias="RATE_SEMANTIC_SCHOLAR")
+    burst_semantic_scholar: int = Field(default=10, alias="BURST_SEMANTIC_SCHOLAR")
+    rate_semantic_scholar_keyed: float = Field(default=10.0, alias="RATE_SEMANTIC_SCHOLAR_KEYED")
+    burst_semantic_scholar_keyed: int = Field(default=10, alias="BURST_SEMANTIC_SCHOLAR_KEYED")
+    rate_openalex: float = Field(default=5.0, alias="RATE_OPENALEX")
+    burst_openalex: int = Field(default=10, alias="BURST_OPENALEX")
+    rate_openalex_polite: float = Field(default=10.0, alias="RATE_OPENALEX_POLITE")
+    burst_openalex_polite: int = Field(default=10, alias="BURST_OPENALEX_POLITE")
+    rate_arxiv: float = Field(default=0.5, alias="RATE_ARXIV")
+    burst_arxiv: int = Field(default=3, alias="BURST_ARXIV")
+    rate_limit_max_wait: float = Field(default=5.0, alias="RATE_LIMIT_MAX_WAIT_SECONDS")
+    retry_attempts: int = Field(default=2, alias="RETRY_ATTEMPTS")
+    retry_backoff_base: float = Field(default=0.5, alias="RETRY_BACKOFF_BASE_SECONDS")
+    retry_backoff_max: float = Field(default=8.0, alias="RETRY_BACKOFF_MAX_SECONDS")
+    retry_after_max: float = Field(default=30.0, alias="RETRY_AFTER_MAX_SECONDS")
+    breaker_failure_threshold: int = Field(default=5, alias="BREAKER_FAILURE_THRESHOLD")
+    breaker_cooldown: float = Field(default=30.0, alias="BREAKER_COOLDOWN_SECONDS")
 
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", populate_by_name=True, extra="ignore"
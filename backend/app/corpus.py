@@ -0,0 +1,409 @@
+import argparse
+import gzip
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+
+from .identity import identity_keys
+from .models import EdgeType, PaperMetadata, RelatedPaper
+from .relevance import tokenize
+
+logger = logging.getLogger(__name__)
+
+SOURCE = "local"
+DB_NAME = "corpus.db"
+BATCH_SIZE = 5000
+# Terms used from a keyword or title query; more only slows FTS down without changing ranks.
+MAX_QUERY_TERMS = 16
+# Out-edges (paper -> cited) and in-edges (paper -> citing), as CSR arrays.
+DIRECTIONS = {
+    "references": "SELECT src, dst FROM edges ORDER BY src, dst",
+    "citations": "SELECT dst, src FROM edges ORDER BY dst, src",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    rowid INTEGER PRIMARY KEY, id TEXT NOT NULL, title TEXT NOT NULL, abstract TEXT,
+    year INTEGER, authors TEXT NOT NULL, pdf_link TEXT, external_ids TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ids (key TEXT PRIMARY KEY, paper INTEGER NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS authors (name TEXT NOT NULL, paper INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS refs (src TEXT NOT NULL, dst TEXT NOT NULL);
+CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+    title, abstract, content='papers', content_rowid='rowid'
+);
+"""
+
+
+def _openalex_key(url: str) -> str:
+    # Same form identity_keys() produces for OpenAlex ids.
+    return f"openalex:{url.rstrip('/').rsplit('/', 1)[-1].lower()}"
+
+
+def _openalex_abstract(index: Optional[Dict[str, List[int]]]) -> Optional[str]:
+    if not index:
+        return None
+    positions = sorted((pos, word) for word, spots in index.items() for pos in spots)
+    return " ".join(word for _, word in positions)
+
+
+def openalex_work(record: Dict[str, Any]) -> Tuple[PaperMetadata, List[str]]:
+    ids = record.get("ids") or {}
+    external_ids = {str(k): str(v) for k, v in ids.items() if v}
+    external_ids.setdefault("openalex", record["id"])
+    authors = [
+        a["author"]["display_name"]
+        for a in record.get("authorships") or []
+        if (a.get("author") or {}).get("display_name")
+    ]
+    location = record.get("best_oa_location") or {}
+    meta = PaperMetadata(
+        id=ids.get("doi") or record["id"],
+        title=record.get("display_name") or record.get("title") or "Untitled",
+        abstract=_openalex_abstract(record.get("abstract_inverted_index")),
+        authors=authors,
+        year=record.get("publication_year"),
+        pdf_link=location.get("pdf_url"),
+        source=SOURCE,
+        external_ids=external_ids,
+    )
+    return meta, [_openalex_key(ref) for ref in record.get("referenced_works") or []]
+
+
+def s2_paper(record: Dict[str, Any]) -> Tuple[PaperMetadata, List[str]]:
+    # Accepts both the Datasets API "papers" records and Graph API paper objects.
+    raw_ids = record.get("externalids") or record.get("externalIds") or {}
+    external_ids = {str(k).lower(): str(v) for k, v in raw_ids.items() if v}
+    paper_id = record.get("paperId") or (record.get("url") or "").rstrip("/").rsplit("/", 1)[-1]
+    if paper_id:
+        external_ids["semantic_scholar"] = paper_id
+    if record.get("corpusid"):
+        external_ids.setdefault("corpusid", str(record["corpusid"]))
+    pdf = record.get("openAccessPdf") or record.get("openaccessinfo") or {}
+    meta = PaperMetadata(
+        id=paper_id or f"CorpusId:{external_ids.get('corpusid')}",
+        title=record.get("title") or "Untitled",
+        abstract=record.get("abstract"),
+        authors=[a["name"] for a in record.get("authors") or [] if a.get("name")],
+        year=record.get("year"),
+        pdf_link=pdf.get("url"),
+        source=SOURCE,
+        external_ids=external_ids,
+    )
+    return meta, []
+
+
+def read_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class CorpusWriter:
+    # Streams OpenAlex / Semantic Scholar dumps into DIR: corpus.db (papers plus identifier,
+    # author and FTS5 indexes) and memory-mapped CSR citation arrays. Holds one batch at a time.
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.directory / DB_NAME)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.executescript(SCHEMA)
+        self.counts = {"papers": 0, "duplicates": 0, "abstracts": 0, "refs": 0, "skipped": 0}
+        self._pending = 0
+
+    def add(self, record: Dict[str, Any]) -> None:
+        if "citingcorpusid" in record:
+            # Semantic Scholar "citations" dataset: one edge per line.
+            if record.get("citedcorpusid"):
+                self._ref(
+                    f"corpus_id:{record['citingcorpusid']}",
+                    f"corpus_id:{record['citedcorpusid']}",
+                )
+            return
+        if "abstract" in record and "corpusid" in record and "title" not in record:
+            # Semantic Scholar "abstracts" dataset, joined onto papers by corpus id.
+            self.conn.execute(
+                "UPDATE papers SET abstract = ? WHERE rowid = "
+                "(SELECT paper FROM ids WHERE key = ?)",
+                (record["abstract"], f"corpus_id:{record['corpusid']}"),
+            )
+            self.counts["abstracts"] += 1
+            self._tick()
+            return
+        try:
+            if str(record.get("id", "")).startswith("https://openalex.org/W"):
+                meta, references = openalex_work(record)
+            else:
+                meta, references = s2_paper(record)
+        except (KeyError, TypeError, ValidationError) as exc:
+            logger.debug("Skipping unreadable record: %s", exc)
+            self.counts["skipped"] += 1
+            return
+        self._paper(meta, references)
+
+    def _paper(self, meta: PaperMetadata, references: List[str]) -> None:
+        keys = identity_keys(meta)
+        marks = ",".join("?" * len(keys))
+        existing = self.conn.execute(
+            f"SELECT paper FROM ids WHERE key IN ({marks}) LIMIT 1", keys
+        ).fetchone()
+        if existing:
+            # The first dump to mention a paper wins; later copies only add identifiers and
+            # references.
+            self.counts["duplicates"] += 1
+            self._identify(existing[0], keys, references)
+            return
+        cursor = self.conn.execute(
+            "INSERT INTO papers (id, title, abstract, year, authors, pdf_link, external_ids) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                meta.id,
+                meta.title,
+                meta.abstract,
+                meta.year,
+                json.dumps(meta.authors),
+                str(meta.pdf_link) if meta.pdf_link else None,
+                json.dumps(meta.external_ids),
+            ),
+        )
+        paper = cursor.lastrowid
+        self.conn.executemany(
+            "INSERT INTO authors (name, paper) VALUES (?, ?)",
+            [(name.lower().strip(), paper) for name in dict.fromkeys(meta.authors)],
+        )
+        self._identify(paper, keys, references)
+        self.counts["papers"] += 1
+        self._tick()
+
+    def _identify(self, paper: int, keys: List[str], references: List[str]) -> None:
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO ids (key, paper) VALUES (?, ?)", [(k, paper) for k in keys]
+        )
+        # References are resolved by key at finalize; any key of the citing paper will do.
+        source_key = next((k for k in keys if not k.startswith("id:")), keys[0])
+        for reference in references:
+            self._ref(source_key, reference)
+
+    def _ref(self, src: str, dst: str) -> None:
+        self.conn.execute("INSERT INTO refs (src, dst) VALUES (?, ?)", (src, dst))
+        self.counts["refs"] += 1
+        self._tick()
+
+    def _tick(self) -> None:
+        self._pending += 1
+        if self._pending >= BATCH_SIZE:
+            self.conn.commit()
+            self._pending = 0
+
+    def finalize(self) -> Dict[str, int]:
+        # Resolve reference keys to papers, then build the text index and the CSR arrays. All
+        # sorting happens inside SQLite, which spills to disk for large corpora.
+        self.conn.commit()
+        conn = self.conn
+        conn.execute("CREATE INDEX IF NOT EXISTS authors_name ON authors (name)")
+        conn.execute("DROP TABLE IF EXISTS edges")
+        conn.execute(
+            "CREATE TABLE edges AS SELECT DISTINCT s.paper AS src, d.paper AS dst FROM refs r "
+            "JOIN ids s ON s.key = r.src JOIN ids d ON d.key = r.dst WHERE s.paper != d.paper"
+        )
+        conn.execute("INSERT INTO papers_fts (papers_fts) VALUES ('rebuild')")
+        conn.commit()
+        size = (conn.execute("SELECT MAX(rowid) FROM papers").fetchone()[0] or 0) + 1
+        edges = conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+        for name, query in DIRECTIONS.items():
+            self._write_csr(name, query, size, edges)
+        self.counts["edges"] = edges
+        return self.counts
+
+    def _write_csr(self, name: str, query: str, size: int, edges: int) -> None:
+        indptr = np.lib.format.open_memmap(
+            self.directory / f"{name}.indptr.npy", mode="w+", dtype=np.int64, shape=(size + 1,)
+        )
+        indices = np.lib.format.open_memmap(
+            self.directory / f"{name}.indices.npy", mode="w+", dtype=np.int32, shape=(edges,)
+        )
+        indptr[:] = 0
+        cursor = self.conn.execute(query)
+        position = 0
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            pairs = np.asarray(rows, dtype=np.int64)
+            indices[position : position + len(pairs)] = pairs[:, 1]
+            np.add.at(indptr, pairs[:, 0] + 1, 1)
+            position += len(pairs)
+        np.cumsum(indptr, out=indptr)
+        indptr.flush()
+        indices.flush()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def ingest(directory: str, paths: Sequence[str]) -> Dict[str, int]:
+    writer = CorpusWriter(directory)
+    try:
+        for path in paths:
+            logger.info("Ingesting %s", path)
+            for record in read_jsonl(Path(path)):
+                writer.add(record)
+        return writer.finalize()
+    finally:
+        writer.close()
+
+
+class LocalCorpus:
+    # Read side. Queries are synchronous and serialized on one connection; async callers
+    # go through clients.local_corpus, which runs them in a worker thread.
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self._conn = sqlite3.connect(
+            f"file:{self.directory / DB_NAME}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._adjacency = {
+            name: (
+                np.load(self.directory / f"{name}.indptr.npy", mmap_mode="r"),
+                np.load(self.directory / f"{name}.indices.npy", mmap_mode="r"),
+            )
+            for name in DIRECTIONS
+        }
+
+    def resolve(self, meta: PaperMetadata) -> Optional[int]:
+        keys = identity_keys(meta)
+        marks = ",".join("?" * len(keys))
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT paper FROM ids WHERE key IN ({marks}) LIMIT 1", keys
+            ).fetchone()
+        return row[0] if row else None
+
+    def papers(self, rowids: Sequence[int]) -> List[PaperMetadata]:
+        if not rowids:
+            return []
+        marks = ",".join("?" * len(rowids))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid, id, title, abstract, year, authors, pdf_link, external_ids "
+                f"FROM papers WHERE rowid IN ({marks})",
+                [int(r) for r in rowids],
+            ).fetchall()
+        by_rowid = {row[0]: row for row in rows}
+        papers = []
+        for rowid in rowids:
+            row = by_rowid.get(int(rowid))
+            if row is None:
+                continue
+            _, paper_id, title, abstract, year, authors, pdf_link, external_ids = row
+            papers.append(
+                PaperMetadata(
+                    id=paper_id,
+                    title=title,
+                    abstract=abstract,
+                    year=year,
+                    authors=json.loads(authors),
+                    pdf_link=pdf_link,
+                    source=SOURCE,
+                    external_ids=json.loads(external_ids),
+                )
+            )
+        return papers
+
+    def search(
+        self, text: str, limit: int, title_only: bool = False, exclude: Optional[int] = None
+    ) -> List[PaperMetadata]:
+        terms = list(dict.fromkeys(tokenize(text)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        query = " OR ".join(f'"{term}"' for term in terms)
+        if title_only:
+            query = f"title : ({query})"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid FROM papers_fts WHERE papers_fts MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit + 1),
+            ).fetchall()
+        return self.papers([r[0] for r in rows if r[0] != exclude][:limit])
+
+    def by_authors(
+        self, authors: Sequence[str], limit: int, exclude: Optional[int] = None
+    ) -> List[PaperMetadata]:
+        found: List[int] = []
+        with self._lock:
+            for name in authors[:3]:
+                rows = self._conn.execute(
+                    "SELECT paper FROM authors WHERE name = ? LIMIT ?",
+                    (name.lower().strip(), limit + 1),
+                ).fetchall()
+                found.extend(r[0] for r in rows if r[0] != exclude and r[0] not in found)
+                if len(found) >= limit:
+                    break
+        return self.papers(found[:limit])
+
+    def neighbours(self, rowid: int, direction: str, limit: int) -> List[PaperMetadata]:
+        indptr, indices = self._adjacency[direction]
+        if rowid + 1 >= len(indptr):
+            return []
+        start, end = int(indptr[rowid]), int(indptr[rowid + 1])
+        return self.papers(indices[start : min(end, start + limit)].tolist())
+
+    def find(self, identifier: str) -> Optional[PaperMetadata]:
+        # A DOI, arXiv id or URL as typed by the user.
+        rowid = self.resolve(PaperMetadata(id=identifier, title=identifier))
+        return self.papers([rowid])[0] if rowid is not None else None
+
+    def related(
+        self, meta: PaperMetadata, keywords: Sequence[str], fanout: int = 10
+    ) -> List[RelatedPaper]:
+        # The local counterpart of GraphBuilder._gather_related, with the same per-source limits.
+        rowid = self.resolve(meta)
+        related: List[RelatedPaper] = []
+        if rowid is not None:
+            for direction in DIRECTIONS:
+                related.extend(
+                    (p, EdgeType.citation, direction == "citations")
+                    for p in self.neighbours(rowid, direction, fanout // 2)
+                )
+        related.extend(
+            (p, EdgeType.semantic, False)
+            for p in self.search(" ".join(keywords), 5, exclude=rowid)
+        )
+        related.extend(
+            (p, EdgeType.semantic, False)
+            for p in self.search(meta.title, 3, title_only=True, exclude=rowid)
+        )
+        related.extend(
+            (p, EdgeType.author, False) for p in self.by_authors(meta.authors, 3, exclude=rowid)
+        )
+        return related
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build a local paper corpus from dataset dumps")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest_cmd = commands.add_parser("ingest", help="ingest JSONL(.gz) dumps into DIR")
+    ingest_cmd.add_argument("directory")
+    ingest_cmd.add_argument("paths", nargs="+")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    counts = ingest(args.directory, args.paths)
+    print(json.dumps(counts))
+
+
+if __name__ == "__main__":
+    main()
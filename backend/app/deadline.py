@@ -0,0 +1,135 @@
+import contextvars
+import itertools
+import time
+from typing import Dict, Optional, Tuple
+
+# Absolute time.monotonic() deadline for upstream work started in the current context.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "upstream_deadline", default=None
+)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+class CallBudget:
+    # Upstream requests an expansion may still send. Charged for every attempt that goes out,
+    # retries included, so cache hits, coalesced calls and requests refused locally are free.
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.used = 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.used >= self.limit
+
+
+_budget: contextvars.ContextVar[Optional[CallBudget]] = contextvars.ContextVar(
+    "upstream_budget", default=None
+)
+
+
+def deadline_context(
+    deadline_at: Optional[float], budget: Optional[CallBudget] = None
+) -> contextvars.Context:
+    # Engine tasks are created with this context so every upstream call they make sees it.
+    context = contextvars.copy_context()
+    if deadline_at is not None:
+        context.run(_deadline.set, deadline_at)
+    if budget is not None:
+        context.run(_budget.set, budget)
+    return context
+
+
+class SharedLimits:
+    # Limits of work shared by several callers: it may run until the latest of their
+    # deadlines, and each request it sends is charged to a caller whose budget allows it.
+    # Callers join and leave while the work runs.
+    def __init__(self) -> None:
+        self._callers: Dict[int, Tuple[Optional[float], Optional[CallBudget]]] = {}
+        self._tokens = itertools.count()
+
+    def join(self) -> int:
+        # Registers the limits of the current context; returns the token to leave() with.
+        token = next(self._tokens)
+        self._callers[token] = (_deadline.get(), _budget.get())
+        return token
+
+    def leave(self, token: int) -> None:
+        self._callers.pop(token, None)
+
+    @property
+    def deadline_at(self) -> Optional[float]:
+        deadlines = [deadline_at for deadline_at, _ in self._callers.values()]
+        if not deadlines or None in deadlines:
+            return None
+        return max(deadlines)
+
+    def charge(self) -> None:
+        budgets = [budget for _, budget in self._callers.values()]
+        if not budgets or None in budgets:
+            return
+        for budget in budgets:
+            if not budget.exhausted:
+                budget.used += 1
+                return
+        raise BudgetExhausted("upstream call budgets of every waiting caller spent")
+
+
+_shared: contextvars.ContextVar[Optional[SharedLimits]] = contextvars.ContextVar(
+    "upstream_shared_limits", default=None
+)
+
+
+def shared_context(limits: SharedLimits) -> contextvars.Context:
+    # A copy of the current context for shared work that may outlive the caller starting it:
+    # its deadline and call budget are those of whoever is waiting on `limits`.
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    context.run(_budget.set, None)
+    context.run(_shared.set, limits)
+    return context
+
+
+def shared_limits(context: contextvars.Context) -> Optional[SharedLimits]:
+    return context.get(_shared)
+
+
+def check_budget() -> None:
+    # Fails fast, without charging, if the current caller could not pay for a request.
+    budget = _budget.get()
+    if budget is not None and budget.exhausted:
+        raise BudgetExhausted(f"upstream call budget of {budget.limit} spent")
+
+
+def charge_call() -> None:
+    shared = _shared.get()
+    if shared is not None:
+        shared.charge()
+        return
+    check_budget()
+    budget = _budget.get()
+    if budget is not None:
+        budget.used += 1
+
+
+def remaining() -> Optional[float]:
+    shared = _shared.get()
+    deadline_at = shared.deadline_at if shared is not None else _deadline.get()
+    if deadline_at is None:
+        return None
+    return deadline_at - time.monotonic()
+
+
+def clamp_timeout(timeout: float) -> float:
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("request deadline reached")
+    return min(timeout, left)
@@ -0,0 +1,120 @@
+import gzip
+from typing import Any, Dict, List, Optional, Tuple
+
+import msgpack
+import orjson
+from fastapi import Response
+
+from .graph_store import EDGE_TYPES, GraphState
+from .models import TruncationReason
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COLUMNAR_JSON = "application/vnd.research-spider.columnar+json"
+MSGPACK = "application/msgpack"
+MSGPACK_ALIASES = (MSGPACK, "application/x-msgpack")
+COLUMNAR_VERSION = 1
+# Level 1: about a third of the time of level 5 for ~10% more bytes on graph payloads.
+GZIP_LEVEL = 1
+ZSTD_LEVEL = 3
+
+
+def negotiate(accept: str) -> Optional[str]:
+    # None means the default pydantic JSON response.
+    if any(alias in accept for alias in MSGPACK_ALIASES):
+        return MSGPACK
+    if COLUMNAR_JSON in accept:
+        return COLUMNAR_JSON
+    return None
+
+
+class StringTable:
+    # Abstracts, author names and source labels repeat across nodes; each is sent once and
+    # referenced by index.
+    def __init__(self) -> None:
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def ref(self, value: Optional[str]) -> Optional[int]:
+        if value is None:
+            return None
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+
+def columnar(
+    state: GraphState,
+    truncated_reason: Optional[TruncationReason] = None,
+    build_seconds: Optional[float] = None,
+) -> Dict[str, Any]:
+    # Node fields as parallel arrays; edges as integer arrays of node indices and type codes.
+    # Built straight from the compact store, without creating a pydantic model per node.
+    strings = StringTable()
+    records = state.records
+    nodes = {
+        "id": state.ids,
+        "title": [r.title for r in records],
+        "abstract": [strings.ref(r.abstract) for r in records],
+        "authors": [[strings.ref(name) for name in r.authors] for r in records],
+        "year": [r.year for r in records],
+        "pdf_link": [str(r.pdf_link) if r.pdf_link else None for r in records],
+        "source": [strings.ref(r.source) for r in records],
+        "keywords": [list(r.keywords) for r in records],
+        "references": [list(r.references) for r in records],
+        "external_ids": [r.external_ids for r in records],
+    }
+    return {
+        "version": COLUMNAR_VERSION,
+        "strings": strings.values,
+        "nodes": nodes,
+        "edges": {
+            "source": state.sources.tolist(),
+            "target": state.targets.tolist(),
+            "type": state.types.tolist(),
+        },
+        "edge_types": [edge_type.value for edge_type in EDGE_TYPES],
+        "truncated": truncated_reason is not None,
+        "truncated_reason": truncated_reason.value if truncated_reason else None,
+        "stats": state.stats(build_seconds).model_dump(),
+    }
+
+
+def encode(payload: Dict[str, Any], media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    return orjson.dumps(payload)
+
+
+def compress(body: bytes, accept_encoding: str, min_bytes: int) -> Tuple[bytes, Optional[str]]:
+    if len(body) < min_bytes:
+        return body, None
+    if zstandard is not None and "zstd" in accept_encoding:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), "zstd"
+    if "gzip" in accept_encoding:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def graph_response(
+    state: GraphState,
+    media_type: str,
+    accept_encoding: str,
+    min_bytes: int,
+    truncated_reason: Optional[TruncationReason] = None,
+    build_seconds: Optional[float] = None,
+    extra: Optional[Dict[str, Any]] = None,
+) -> Response:
+    payload = columnar(state, truncated_reason, build_seconds)
+    payload.update(extra or {})
+    body = encode(payload, media_type)
+    body, encoding = compress(body, accept_encoding, min_bytes)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
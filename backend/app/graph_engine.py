@@ -1,87 +1,452 @@
 import asyncio
+import heapq
+import itertools
 import logging
-from collections import deque
-from typing import Dict, List, Set, Tuple
+import time
+from collections import Counter
+from typing import AsyncIterator, Awaitable, Dict, Iterator, List, Optional, Tuple
 
 from .clients.arxiv import ArxivClient
+from .clients.local_corpus import LocalCorpusClient
 from .clients.openalex import OpenAlexClient
-from .clients.semantic_scholar import SemanticScholarClient
-from .models import EdgeType, GraphEdge, GraphNode, GraphResponse, PaperMetadata
+from .clients.semantic_scholar import SemanticScholarClient, paper_identifier
+from .models import (
+    EdgeType,
+    GraphEdge,
+    GraphEvent,
+    GraphEventType,
+    GraphNode,
+    GraphResponse,
+    PaperMetadata,
+    RelatedPaper,
+    TruncationReason,
+)
 from .config import get_settings
+from .deadline import CallBudget, deadline_context
+from .graph_store import GraphState
+from .queries import query_terms
+from .relevance import RelevanceScorer
+from .telemetry import EXPANSION_NODES, EXPANSIONS, span
+from .upstream import Upstream
 
 logger = logging.getLogger(__name__)
 
+# (priority, discovery order, node id, depth); lower priority values are expanded first.
+FrontierEntry = Tuple[float, int, str, int]
+# A node found this round: (node id, its metadata, edge type, depth).
+Discovered = Tuple[str, PaperMetadata, EdgeType, int]
+# Citing and cited papers of one node, keyed "citations" and "references".
+Edges = Dict[str, List[PaperMetadata]]
+
+
+async def collect(events: AsyncIterator[GraphEvent]) -> GraphResponse:
+    nodes: Dict[str, GraphNode] = {}
+    edges: List[GraphEdge] = []
+    truncated_reason: Optional[TruncationReason] = None
+    async for event in events:
+        # Batches may repeat a node after a duplicate from another source was merged in.
+        nodes.update((node.id, node) for node in event.nodes)
+        edges.extend(event.edges)
+        if event.type == GraphEventType.summary:
+            truncated_reason = event.truncated_reason
+    return GraphResponse(
+        nodes=list(nodes.values()),
+        edges=edges,
+        truncated=truncated_reason is not None,
+        truncated_reason=truncated_reason,
+    )
+
 
 class GraphBuilder:
-    def __init__(self) -> None:
+    def __init__(
+        self, upstream: Optional[Upstream] = None, corpus: Optional[LocalCorpusClient] = None
+    ) -> None:
         settings = get_settings()
-        self.semantic_client = SemanticScholarClient(timeout=settings.request_timeout)
-        self.openalex_client = OpenAlexClient(timeout=settings.request_timeout)
-        self.arxiv_client = ArxivClient(timeout=settings.request_timeout)
+        upstream = upstream or Upstream()
+        self.semantic_client = SemanticScholarClient(
+            timeout=settings.request_timeout, upstream=upstream
+        )
+        self.openalex_client = OpenAlexClient(timeout=settings.request_timeout, upstream=upstream)
+        self.arxiv_client = ArxivClient(timeout=settings.request_timeout, upstream=upstream)
         self.max_nodes = settings.max_graph_nodes
         self.max_depth = settings.max_graph_depth
+        self.concurrency = max(1, settings.expand_concurrency)
+        self.deadline_seconds = settings.expand_deadline_seconds
+        self.strategy = settings.expand_strategy
+        self.fanout = settings.citation_fanout
+        self.corpus = corpus
+        # "primary": answer from the local corpus and call upstream only for nodes it misses.
+        self.local_first = corpus is not None and settings.local_corpus_mode == "primary"
 
     async def expand(
-        self, root: PaperMetadata, max_nodes: int | None = None, max_depth: int | None = None
+        self,
+        root: PaperMetadata,
+        max_nodes: int | None = None,
+        max_depth: int | None = None,
+        deadline_seconds: float | None = None,
+        max_upstream_calls: int | None = None,
     ) -> GraphResponse:
-        max_nodes = max_nodes or self.max_nodes
+        state, truncated_reason, build_seconds = await self.build(
+            root,
+            max_nodes=max_nodes,
+            max_depth=max_depth,
+            deadline_seconds=deadline_seconds,
+            max_upstream_calls=max_upstream_calls,
+        )
+        return state.graph(truncated_reason, build_seconds=build_seconds)
+
+    async def build(
+        self,
+        root: PaperMetadata,
+        max_nodes: int | None = None,
+        max_depth: int | None = None,
+        deadline_seconds: float | None = None,
+        max_upstream_calls: int | None = None,
+    ) -> Tuple[GraphState, Optional[TruncationReason], float]:
+        return await self.build_roots(
+            [root],
+            max_nodes=max_nodes,
+            max_depth=max_depth,
+            deadline_seconds=deadline_seconds,
+            max_upstream_calls=max_upstream_calls,
+        )
+
+    async def build_roots(
+        self,
+        roots: List[PaperMetadata],
+        max_nodes: int | None = None,
+        max_depth: int | None = None,
+        deadline_seconds: float | None = None,
+        max_upstream_calls: int | None = None,
+        state: Optional[GraphState] = None,
+    ) -> Tuple[GraphState, Optional[TruncationReason], float]:
+        # Builds into the compact state without per-node events; callers decide how to
+        # serialize it, so pydantic models are created at most once, for the response.
+        # Several roots grow one graph from a shared frontier, so neighbourhoods that overlap
+        # are fetched once and the node budget is global.
+        started = time.perf_counter()
+        state = state or GraphState.from_roots(roots)
+        truncated_reason: Optional[TruncationReason] = None
+        async for event in self.grow(
+            state,
+            state.root_ids,
+            max_nodes=max_nodes or self.max_nodes,
+            max_depth=max_depth,
+            deadline_seconds=deadline_seconds,
+            max_upstream_calls=max_upstream_calls,
+            emit_batches=False,
+        ):
+            if event.type == GraphEventType.summary:
+                truncated_reason = event.truncated_reason
+        return state, truncated_reason, time.perf_counter() - started
+
+    async def stream(
+        self,
+        root: PaperMetadata,
+        max_nodes: int | None = None,
+        max_depth: int | None = None,
+        deadline_seconds: float | None = None,
+        max_upstream_calls: int | None = None,
+        state: Optional[GraphState] = None,
+    ) -> AsyncIterator[GraphEvent]:
+        # Yields one batch per resolved frontier node, a progress event per round and a final
+        # summary. A batch carries new nodes plus existing nodes that absorbed a duplicate.
+        state = state or GraphState(root)
+        yield GraphEvent(
+            type=GraphEventType.batch, nodes=[state.node(state.root_id)], node_count=len(state)
+        )
+        async for event in self.grow(
+            state,
+            [state.root_id],
+            max_nodes=max_nodes or self.max_nodes,
+            max_depth=max_depth,
+            deadline_seconds=deadline_seconds,
+            max_upstream_calls=max_upstream_calls,
+        ):
+            yield event
+
+    async def grow(
+        self,
+        state: GraphState,
+        seeds: List[str],
+        max_nodes: int,
+        max_depth: int | None = None,
+        deadline_seconds: float | None = None,
+        max_upstream_calls: int | None = None,
+        emit_batches: bool = True,
+    ) -> AsyncIterator[GraphEvent]:
+        # Expands outward from existing nodes of `state` until it holds max_nodes nodes.
+        # Depths are relative to the seeds; seeds that were already expanded are skipped.
         max_depth = max_depth or self.max_depth
-        nodes: Dict[str, GraphNode] = {}
-        edges: List[GraphEdge] = []
-        seen: Set[str] = set()
-
-        def add_node(meta: PaperMetadata) -> GraphNode:
-            node_id = meta.id or meta.title
-            graph_node = GraphNode(**meta.dict(), id=node_id)
-            nodes[node_id] = graph_node
-            return graph_node
-
-        root_node = add_node(root)
-        queue: deque[Tuple[GraphNode, int]] = deque([(root_node, 0)])
-        seen.add(root_node.id)
-
-        while queue and len(nodes) < max_nodes:
-            current, depth = queue.popleft()
-            if depth >= max_depth:
-                continue
-            related = await self._gather_related(current)
-            for meta, edge_type in related:
-                node_id = meta.id or meta.title
-                if node_id in seen:
-                    edges.append(GraphEdge(source=current.id, target=node_id, type=edge_type))
-                    continue
-                if len(nodes) >= max_nodes:
-                    continue
-                seen.add(node_id)
-                new_node = add_node(meta)
-                edges.append(GraphEdge(source=current.id, target=new_node.id, type=edge_type))
-                queue.append((new_node, depth + 1))
-        return GraphResponse(nodes=list(nodes.values()), edges=edges)
+        deadline_seconds = deadline_seconds or self.deadline_seconds
+        deadline_at = time.monotonic() + deadline_seconds if deadline_seconds else None
+        # Upstream calls made by the lookup tasks clamp their timeouts to this deadline, and each
+        # request they send is charged to the call budget.
+        budget = CallBudget(max_upstream_calls) if max_upstream_calls else None
+        context = deadline_context(deadline_at, budget)
+        truncated_reason: Optional[TruncationReason] = None
+        identity = state.identity
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        def expired() -> bool:
+            return deadline_at is not None and time.monotonic() >= deadline_at
+
+        def cut_short() -> Optional[TruncationReason]:
+            if expired():
+                return TruncationReason.deadline
+            if budget is not None and budget.exhausted:
+                return TruncationReason.upstream_budget
+            return None
+
+        async def round_edges(
+            batch: "asyncio.Task[Dict[str, Edges]]", identifier: Optional[str]
+        ) -> Edges:
+            if identifier is None:
+                return {}
+            # Shielded: the batch is shared by the round and must outlive any one node's task.
+            return (await asyncio.shield(batch)).get(identifier, {})
+
+        async def gather_bounded(
+            node: GraphNode,
+            batch: "Optional[asyncio.Task[Dict[str, Edges]]]",
+            identifier: Optional[str],
+        ) -> Tuple[List[RelatedPaper], Optional[TruncationReason]]:
+            async with semaphore:
+                reason = cut_short()
+                if reason is not None:
+                    return [], reason
+                edges = round_edges(batch, identifier) if batch is not None else None
+                with span("gather_related", node=node.id) as current:
+                    related = await self._gather_related(node, edges)
+                    current.set(results=len(related))
+            # Lookups still running at the deadline, or refused once the budget was spent, were
+            # cut short, so this result may be thin.
+            return related, cut_short()
+
+        scorer = state.scorer if self.strategy == "best_first" else None
+        order = itertools.count()
+        start_nodes = len(state)
+        frontier: List[FrontierEntry] = [
+            (0.0, next(order), node_id, 0)
+            for node_id in dict.fromkeys(seeds)
+            if node_id in state and node_id not in state.expanded
+        ]
+        depth = 0
+
+        while frontier and len(state) < max_nodes:
+            reason = cut_short()
+            if reason is not None:
+                truncated_reason = reason
+                break
+            take = min(self.concurrency, len(frontier))
+            # Expand the best `take` candidates concurrently, but merge in pop order so the
+            # result is deterministic for the same upstream responses.
+            scheduled = [heapq.heappop(frontier) for _ in range(take)]
+            expanding = [state.node(node_id) for _, _, node_id, _ in scheduled]
+            identifiers = [paper_identifier(node) for node in expanding]
+            batch: "Optional[asyncio.Task[Dict[str, Edges]]]" = None
+            if not self.local_first:
+                # With the local corpus first, most nodes never reach upstream; the few that
+                # do fall back to their own edge lookups instead of a round-wide batch.
+                batch = asyncio.create_task(
+                    self.semantic_client.fetch_edges_batch(
+                        [i for i in identifiers if i is not None], fanout=self.fanout
+                    ),
+                    context=context,
+                )
+            tasks = [
+                asyncio.create_task(
+                    gather_bounded(node, batch, identifier), context=context
+                )
+                for node, identifier in zip(expanding, identifiers)
+            ]
+            discovered: List[Discovered] = []
+            mentions: Counter[str] = Counter()
+            # Nodes whose results were cut short or not merged go back on the frontier
+            # unexpanded, so a later session expansion can still grow them.
+            unfinished: List[FrontierEntry] = []
+            try:
+                for position, (entry, task) in enumerate(zip(scheduled, tasks)):
+                    _, _, current_id, node_depth = entry
+                    if len(state) >= max_nodes:
+                        unfinished.extend(scheduled[position:])
+                        break
+                    related, reason = await task
+                    if reason is not None and truncated_reason is None:
+                        truncated_reason = reason
+                    complete = reason is None
+                    batch_nodes: Dict[str, None] = {}
+                    batch_edges: List[Tuple[str, str, EdgeType]] = []
+                    references: List[str] = []
+                    with span("dedup", node=current_id, candidates=len(related)):
+                        for meta, edge_type, incoming in related:
+                            node_id = identity.resolve(meta)
+                            if node_id is not None:
+                                # Same paper seen via another source or id: merge, don't re-add.
+                                mentions[node_id] += 1
+                                if state.merge(node_id, meta):
+                                    batch_nodes[node_id] = None
+                            elif len(state) >= max_nodes:
+                                complete = False
+                                continue
+                            else:
+                                node_id = state.add(meta)
+                                mentions[node_id] += 1
+                                depth = max(depth, node_depth + 1)
+                                batch_nodes[node_id] = None
+                                # Nodes at max_depth are kept in the graph but never expanded.
+                                if node_depth + 1 < max_depth:
+                                    discovered.append((node_id, meta, edge_type, node_depth + 1))
+                            source, target = (
+                                (node_id, current_id) if incoming else (current_id, node_id)
+                            )
+                            if edge_type == EdgeType.citation and not incoming:
+                                references.append(node_id)
+                            if state.link(source, target, edge_type):
+                                batch_edges.append((source, target, edge_type))
+                        if references and state.add_references(current_id, references):
+                            batch_nodes[current_id] = None
+                    if complete:
+                        state.expanded.add(current_id)
+                    else:
+                        unfinished.append(entry)
+                    if emit_batches and (batch_nodes or batch_edges):
+                        yield GraphEvent(
+                            type=GraphEventType.batch,
+                            nodes=[state.node(node_id) for node_id in batch_nodes],
+                            edges=[
+                                GraphEdge.model_construct(source=s, target=t, type=e)
+                                for s, t, e in batch_edges
+                            ],
+                            depth=node_depth + 1,
+                            node_count=len(state),
+                            edge_count=state.edge_count,
+                        )
+            finally:
+                # Budget reached, or the consumer went away: drop the rest of the round.
+                pending = [*tasks, batch] if batch is not None else tasks
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+            for entry in unfinished:
+                heapq.heappush(frontier, entry)
+            with span("score", candidates=len(discovered)):
+                self._enqueue(frontier, discovered, mentions, scorer, order)
+            yield GraphEvent(
+                type=GraphEventType.progress,
+                depth=depth,
+                node_count=len(state),
+                edge_count=state.edge_count,
+                frontier_size=len(frontier),
+            )
+        EXPANSION_NODES.observe(len(state) - start_nodes)
+        EXPANSIONS.inc(truncated=truncated_reason.value if truncated_reason else "none")
+        yield GraphEvent(
+            type=GraphEventType.summary,
+            depth=depth,
+            node_count=len(state),
+            edge_count=state.edge_count,
+            truncated=truncated_reason is not None,
+            truncated_reason=truncated_reason,
+        )
+
+    async def warm(self, nodes: List[GraphNode], concurrency: int = 1) -> None:
+        # Makes the upstream lookups expanding `nodes` would make, for their effect on the
+        # cache: one edges batch for all of them, then each node's searches.
+        identifiers = [paper_identifier(node) for node in nodes]
+        batch = asyncio.ensure_future(
+            self.semantic_client.fetch_edges_batch(
+                [i for i in identifiers if i is not None], fanout=self.fanout
+            )
+        )
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def node_edges(identifier: Optional[str]) -> Edges:
+            if identifier is None:
+                return {}
+            return (await asyncio.shield(batch)).get(identifier, {})
+
+        async def warm_one(node: GraphNode, identifier: Optional[str]) -> None:
+            async with semaphore:
+                await self._gather_related(node, node_edges(identifier))
+
+        try:
+            await asyncio.gather(*map(warm_one, nodes, identifiers))
+        finally:
+            batch.cancel()
+            await asyncio.gather(batch, return_exceptions=True)
+
+    def _enqueue(
+        self,
+        frontier: List[FrontierEntry],
+        discovered: List[Discovered],
+        mentions: Counter[str],
+        scorer: Optional[RelevanceScorer],
+        order: Iterator[int],
+    ) -> None:
+        if not discovered:
+            return
+        if scorer is None:
+            # Plain BFS: shallower first, then discovery order.
+            priorities = [float(node_depth) for _, _, _, node_depth in discovered]
+        else:
+            scores = scorer.score(
+                [meta for _, meta, _, _ in discovered],
+                [edge_type for _, _, edge_type, _ in discovered],
+                [mentions[node_id] for node_id, _, _, _ in discovered],
+                [node_depth for _, _, _, node_depth in discovered],
+            )
+            priorities = (-scores).tolist()
+        for (node_id, _, _, node_depth), priority in zip(discovered, priorities):
+            heapq.heappush(frontier, (priority, next(order), node_id, node_depth))
+
+    async def _edges(self, node: GraphNode, edges: Optional[Awaitable[Edges]]) -> Edges:
+        if edges is not None:
+            result = dict(await edges)
+        elif (identifier := paper_identifier(node)) is not None:
+            found = await self.semantic_client.fetch_edges_batch([identifier], fanout=self.fanout)
+            result = dict(found.get(identifier, {}))
+        else:
+            result = {}
+        if not result.get("references") and node.references:
+            # Papers Semantic Scholar cannot resolve may still list OpenAlex referenced_works.
+            quota = self.fanout - len(result.get("citations", []))
+            result["references"] = await self.openalex_client.fetch_references(node, quota)
+        return result
 
     async def _gather_related(
-        self, node: GraphNode
-    ) -> List[tuple[PaperMetadata, EdgeType]]:
-        keywords = node.keywords or (node.title.split() if node.title else [])
+        self, node: GraphNode, edges: Optional[Awaitable[Edges]] = None
+    ) -> List[RelatedPaper]:
+        # `edges` lets the caller supply this node's share of a round-wide batch lookup.
+        # Citation neighbours come first: they are the densest part of the graph, and nodes are
+        # added in this order until max_nodes is reached.
+        search_terms, arxiv_terms = query_terms(node)
+        local: List[RelatedPaper] = []
+        if self.corpus is not None:
+            local = await self.corpus.related(node, search_terms, self.fanout)
+            if local and self.local_first:
+                return local
         tasks = [
-            self.semantic_client.search_by_keywords(keywords, limit=5),
-            self.semantic_client.fetch_citations(node.id, limit=5),
+            self._edges(node, edges),
+            self.semantic_client.search_by_keywords(search_terms, limit=5),
             self.openalex_client.search_by_title(node.title, limit=3),
             self.openalex_client.related_by_authors(node.authors, limit=3),
-            self.arxiv_client.search(keywords, limit=3),
+            self.arxiv_client.search(arxiv_terms, limit=3),
         ]
         results = await asyncio.gather(*tasks, return_exceptions=True)
-        related: List[tuple[PaperMetadata, EdgeType]] = []
+        related = local
         for idx, result in enumerate(results):
             if isinstance(result, Exception):
                 logger.warning("Related search failed: %s", result)
                 continue
-            edge_type = EdgeType.semantic
-            if idx == 1:
-                edge_type = EdgeType.citation
-            elif idx in (2, 4):
-                edge_type = EdgeType.semantic
-            elif idx == 3:
-                edge_type = EdgeType.author
-            for meta in result:
-                related.append((meta, edge_type))
+            if idx == 0:
+                related.extend(
+                    (meta, EdgeType.citation, True) for meta in result.get("citations", [])
+                )
+                related.extend(
+                    (meta, EdgeType.citation, False) for meta in result.get("references", [])
+                )
+                continue
+            edge_type = EdgeType.author if idx == 3 else EdgeType.semantic
+            related.extend((meta, edge_type, False) for meta in result)
         return related
@@ -0,0 +1,263 @@
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .identity import IdentityIndex
+from .models import (
+    EdgeType,
+    GraphEdge,
+    GraphNode,
+    GraphResponse,
+    GraphStats,
+    PaperMetadata,
+    TruncationReason,
+)
+from .relevance import RelevanceScorer
+
+EDGE_TYPES: List[EdgeType] = list(EdgeType)
+EDGE_CODES: Dict[EdgeType, int] = {edge_type: code for code, edge_type in enumerate(EDGE_TYPES)}
+
+
+def _sizeof(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items()
+        )
+    return sys.getsizeof(value)
+
+
+def _union(old: tuple, new: List[str]) -> tuple:
+    return tuple(dict.fromkeys([*old, *new]))
+
+
+class PaperRecord:
+    # Slotted, validated-once copy of a node's metadata; GraphNode models are only built for
+    # responses and events.
+    __slots__ = (
+        "title",
+        "abstract",
+        "keywords",
+        "authors",
+        "year",
+        "pdf_link",
+        "source",
+        "references",
+        "external_ids",
+    )
+
+    def __init__(self, meta: PaperMetadata) -> None:
+        self.title = meta.title
+        self.abstract = meta.abstract
+        self.keywords = tuple(meta.keywords)
+        # Author names and source labels repeat across many nodes; share one string each.
+        self.authors = tuple(sys.intern(name) for name in meta.authors)
+        self.year = meta.year
+        self.pdf_link = meta.pdf_link
+        self.source = sys.intern(meta.source) if meta.source else None
+        self.references = tuple(meta.references)
+        self.external_ids = dict(meta.external_ids)
+
+    def merge(self, meta: PaperMetadata) -> bool:
+        # Union of fields from another source's record of the same paper. Returns True if changed.
+        before = [getattr(self, field) for field in self.__slots__]
+        if (not self.title or self.title == "Untitled") and meta.title:
+            self.title = meta.title
+        if meta.abstract and len(meta.abstract) > len(self.abstract or ""):
+            self.abstract = meta.abstract
+        self.keywords = _union(self.keywords, meta.keywords)
+        if len(meta.authors) > len(self.authors):
+            self.authors = tuple(sys.intern(name) for name in meta.authors)
+        self.year = self.year or meta.year
+        self.pdf_link = self.pdf_link or meta.pdf_link
+        if meta.source and meta.source not in (self.source or "").split(","):
+            self.source = ",".join(filter(None, [self.source, meta.source]))
+        self.references = _union(self.references, meta.references)
+        self.external_ids = {**meta.external_ids, **self.external_ids}
+        return before != [getattr(self, field) for field in self.__slots__]
+
+    def size(self) -> int:
+        # Upper bound: interned strings shared with other records are counted every time.
+        return sys.getsizeof(self) + sum(_sizeof(getattr(self, f)) for f in self.__slots__)
+
+    def to_node(self, node_id: str) -> GraphNode:
+        # Fields were validated when the source metadata was parsed; skip re-validation.
+        return GraphNode.model_construct(
+            id=node_id,
+            title=self.title,
+            abstract=self.abstract,
+            keywords=list(self.keywords),
+            authors=list(self.authors),
+            year=self.year,
+            pdf_link=self.pdf_link,
+            source=self.source,
+            references=list(self.references),
+            external_ids=dict(self.external_ids),
+        )
+
+
+class GraphState:
+    # Everything an expansion has learned, stored compactly: interned string ids mapped to
+    # dense indices, slotted metadata records, and deduplicated edges as parallel int arrays
+    # with edge-type codes. Graph sessions keep one alive between requests so later
+    # expansions reuse the dedup index and never re-expand a node.
+    def __init__(self, root: PaperMetadata) -> None:
+        self.root = root
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.records: List[PaperRecord] = []
+        self.sources = array("i")
+        self.targets = array("i")
+        self.types = array("b")
+        self.identity = IdentityIndex()
+        self.expanded: Set[str] = set()
+        self._edge_keys: Set[int] = set()
+        self._record_bytes = 0
+        self._scorer: Optional[RelevanceScorer] = None
+        self.root_id = self.add(root)
+        self.roots: List[PaperMetadata] = [root]
+        self.root_ids: List[str] = [self.root_id]
+
+    @classmethod
+    def from_roots(cls, roots: List[PaperMetadata]) -> "GraphState":
+        state = cls(roots[0])
+        for root in roots[1:]:
+            state.add_root(root)
+        return state
+
+    def add_root(self, meta: PaperMetadata) -> str:
+        # A root listed twice, or under another identifier, merges into the existing node.
+        node_id = self.identity.resolve(meta)
+        if node_id is None:
+            node_id = self.add(meta)
+        else:
+            self.merge(node_id, meta)
+        if node_id not in self.root_ids:
+            self.roots.append(meta)
+            self.root_ids.append(node_id)
+            self._scorer = None
+        return node_id
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self.index
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.types)
+
+    @property
+    def scorer(self) -> RelevanceScorer:
+        if self._scorer is None:
+            self._scorer = RelevanceScorer(self.root, more_roots=self.roots[1:])
+        return self._scorer
+
+    def add(self, meta: PaperMetadata) -> str:
+        node_id = meta.id or meta.title
+        if node_id in self.index:
+            # Distinct papers without an id may share a title, "Untitled" most often.
+            node_id = f"{node_id}#{len(self.ids)}"
+        node_id = sys.intern(node_id)
+        record = PaperRecord(meta)
+        self.index[node_id] = len(self.ids)
+        self.ids.append(node_id)
+        self.records.append(record)
+        self.identity.add(node_id, meta)
+        self._record_bytes += record.size() + sys.getsizeof(node_id)
+        return node_id
+
+    def merge(self, node_id: str, meta: PaperMetadata) -> bool:
+        record = self.records[self.index[node_id]]
+        before = record.size()
+        changed = record.merge(meta)
+        if changed:
+            self._record_bytes += record.size() - before
+        # Ids only the duplicate carried now resolve here too, so a third copy known by just
+        # one of them is not added as a new node.
+        self.identity.add(node_id, meta)
+        return changed
+
+    def add_references(self, node_id: str, references: List[str]) -> bool:
+        # Ids of graph nodes the paper cites. Returns True if any were new.
+        record = self.records[self.index[node_id]]
+        merged = _union(record.references, references)
+        if merged == record.references:
+            return False
+        before = record.size()
+        record.references = merged
+        self._record_bytes += record.size() - before
+        return True
+
+    def link(self, source: str, target: str, edge_type: EdgeType) -> bool:
+        # Returns True if the edge is new; self-loops and repeats are dropped.
+        if source == target:
+            return False
+        src, dst, code = self.index[source], self.index[target], EDGE_CODES[edge_type]
+        key = (src << 34) | (dst << 3) | code
+        if key in self._edge_keys:
+            return False
+        self._edge_keys.add(key)
+        self.sources.append(src)
+        self.targets.append(dst)
+        self.types.append(code)
+        return True
+
+    def node(self, node_id: str) -> GraphNode:
+        return self.records[self.index[node_id]].to_node(node_id)
+
+    def edge(self, position: int) -> GraphEdge:
+        return GraphEdge.model_construct(
+            source=self.ids[self.sources[position]],
+            target=self.ids[self.targets[position]],
+            type=EDGE_TYPES[self.types[position]],
+        )
+
+    def csr(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Out-edges grouped by source: targets[indptr[i]:indptr[i + 1]] are node i's neighbours,
+        # with their edge-type codes alongside.
+        n = len(self.ids)
+        sources = np.asarray(self.sources, dtype=np.int32)
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+        targets = np.asarray(self.targets, dtype=np.int32)[order]
+        types = np.asarray(self.types, dtype=np.int8)[order]
+        return indptr, targets, types
+
+    def approx_bytes(self) -> int:
+        # Graph storage only (records, id maps, edge arrays and dedup keys); excludes the
+        # identity index used while building.
+        edge_bytes = sum(sys.getsizeof(a) for a in (self.sources, self.targets, self.types))
+        edge_bytes += sys.getsizeof(self._edge_keys) + 32 * len(self._edge_keys)
+        id_bytes = sum(sys.getsizeof(c) for c in (self.ids, self.index, self.records))
+        return self._record_bytes + id_bytes + edge_bytes
+
+    def stats(self, build_seconds: Optional[float] = None) -> GraphStats:
+        approx = self.approx_bytes()
+        return GraphStats(
+            node_count=len(self.ids),
+            edge_count=self.edge_count,
+            approx_bytes=approx,
+            bytes_per_node=round(approx / max(1, len(self.ids)), 1),
+            build_seconds=round(build_seconds, 4) if build_seconds is not None else None,
+        )
+
+    def graph(
+        self,
+        truncated_reason: Optional[TruncationReason] = None,
+        build_seconds: Optional[float] = None,
+    ) -> GraphResponse:
+        return GraphResponse(
+            nodes=[record.to_node(node_id) for node_id, record in zip(self.ids, self.records)],
+            edges=[self.edge(position) for position in range(self.edge_count)],
+            truncated=truncated_reason is not None,
+            truncated_reason=truncated_reason,
+            stats=self.stats(build_seconds),
+        )
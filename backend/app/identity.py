@@ -0,0 +1,180 @@
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .models import PaperMetadata
+
+DOI_PREFIX_RE = re.compile(r"^(?:https?://(?:dx\.)?doi\.org/|doi:)", re.IGNORECASE)
+ARXIV_PREFIX_RE = re.compile(r"^(?:https?://(?:export\.)?arxiv\.org/(?:abs|pdf)/|arxiv:)", re.I)
+ARXIV_VERSION_RE = re.compile(r"v\d+$")
+# arXiv assigns DataCite DOIs of this form, which is how OpenAlex usually reports preprints.
+ARXIV_DOI_RE = re.compile(r"^10\.48550/arxiv\.(.+)$")
+TITLE_CLEAN_RE = re.compile(r"[^a-z0-9]+")
+NUMBER_RE = re.compile(r"\d+")
+# Namespaces spelled differently across sources (Semantic Scholar "PubMed", OpenAlex "pmid").
+ID_ALIASES = {"pubmed": "pmid", "corpusid": "corpus_id"}
+
+# MinHash/LSH over character shingles of the normalized title. 8 bands x 4 rows puts the LSH
+# candidate threshold near 0.6 Jaccard; candidates are then verified exactly.
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE = 4
+PRIME = 4294967291
+_rng = np.random.default_rng(20240229)
+_PERM_A = _rng.integers(1, PRIME, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, PRIME, size=NUM_PERM, dtype=np.uint64)
+
+
+def normalize_doi(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    doi = DOI_PREFIX_RE.sub("", value.strip()).lower()
+    return doi if doi.startswith("10.") else None
+
+
+def normalize_arxiv(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    arxiv_id = ARXIV_PREFIX_RE.sub("", value.strip()).lower()
+    return ARXIV_VERSION_RE.sub("", arxiv_id) or None
+
+
+def normalize_title(title: Optional[str]) -> str:
+    return TITLE_CLEAN_RE.sub(" ", (title or "").lower()).strip()
+
+
+def identity_keys(meta: PaperMetadata) -> List[str]:
+    keys: Set[str] = set()
+    ids = {k.lower(): v for k, v in meta.external_ids.items() if v}
+    doi = normalize_doi(ids.get("doi")) or normalize_doi(meta.id)
+    if doi:
+        keys.add(f"doi:{doi}")
+        arxiv_doi = ARXIV_DOI_RE.match(doi)
+        if arxiv_doi:
+            keys.add(f"arxiv:{ARXIV_VERSION_RE.sub('', arxiv_doi.group(1))}")
+    arxiv_id = normalize_arxiv(ids.get("arxiv"))
+    if not arxiv_id and meta.id and ARXIV_PREFIX_RE.match(meta.id):
+        arxiv_id = normalize_arxiv(meta.id)
+    if arxiv_id:
+        keys.add(f"arxiv:{arxiv_id}")
+    for name, value in ids.items():
+        if name not in ("doi", "arxiv"):
+            # OpenAlex reports these as URLs, Semantic Scholar as bare ids.
+            value = str(value).rstrip("/").rsplit("/", 1)[-1].lower()
+            keys.add(f"{ID_ALIASES.get(name, name)}:{value}")
+    # The source's own id, so exact repeats resolve even without external identifiers. Papers
+    # without one are matched by title only, or every "Untitled" paper would be one node.
+    if meta.id:
+        keys.add(f"id:{meta.id}")
+    return sorted(keys)
+
+
+def _shingles(title: str) -> Set[str]:
+    if len(title) <= SHINGLE:
+        return {title}
+    return {title[i : i + SHINGLE] for i in range(len(title) - SHINGLE + 1)}
+
+
+def _shingle_hashes(title: str) -> np.ndarray:
+    # Sorted unique crc32s of the shingles: a few bytes each instead of a set of str objects,
+    # which matters once the index holds tens of thousands of titles.
+    shingles = _shingles(title)
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode()) for s in shingles), dtype=np.uint32, count=len(shingles)
+    )
+    return np.unique(hashes)
+
+
+def _minhash(hashes: np.ndarray) -> np.ndarray:
+    # (a * x + b) mod p for every permutation at once; values stay below 2**64.
+    values = hashes.astype(np.uint64)
+    permuted = (values[:, None] * _PERM_A[None, :] + _PERM_B[None, :]) % PRIME
+    return permuted.min(axis=0)
+
+
+def _jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    shared = np.intersect1d(a, b, assume_unique=True).size
+    return shared / (a.size + b.size - shared)
+
+
+def _numbers(title: str) -> str:
+    return " ".join(sorted(set(NUMBER_RE.findall(title))))
+
+
+def _band_key(signature: np.ndarray, band: int, numbers: str) -> int:
+    # Numbers are part of the bucket key: "Part 1" vs "Part 2" or "GPT-3" vs "GPT-4" are
+    # near-identical text but different papers, and must never become merge candidates.
+    # Hashed to an int to keep the index small; a collision only adds a candidate to verify.
+    return hash((band, numbers, signature[band * ROWS : (band + 1) * ROWS].tobytes()))
+
+
+class IdentityIndex:
+    def __init__(self, title_threshold: float = 0.8, min_title_length: int = 24) -> None:
+        self.title_threshold = title_threshold
+        self.min_title_length = min_title_length
+        self._keys: Dict[str, str] = {}
+        self._buckets: Dict[int, List[str]] = defaultdict(list)
+        self._titles: Dict[str, np.ndarray] = {}
+        self._years: Dict[str, Optional[int]] = {}
+        self._last: Optional[Tuple[str, np.ndarray, List[int]]] = None
+        self.fuzzy_merges = 0
+        self.key_merges = 0
+
+    def resolve(self, meta: PaperMetadata) -> Optional[str]:
+        for key in identity_keys(meta):
+            node_id = self._keys.get(key)
+            if node_id is not None:
+                self.key_merges += 1
+                return node_id
+        node_id = self._resolve_title(meta)
+        if node_id is not None:
+            self.fuzzy_merges += 1
+        return node_id
+
+    def add(self, node_id: str, meta: PaperMetadata) -> None:
+        for key in identity_keys(meta):
+            self._keys.setdefault(key, node_id)
+        title = normalize_title(meta.title)
+        if len(title) < self.min_title_length or node_id in self._titles:
+            return
+        shingles, band_keys = self._signature(title)
+        self._titles[node_id] = shingles
+        self._years[node_id] = meta.year
+        for band_key in band_keys:
+            self._buckets[band_key].append(node_id)
+
+    def _signature(self, title: str) -> Tuple[np.ndarray, List[int]]:
+        # resolve() and the add() that usually follows it hash the same title; reuse the work.
+        if self._last is not None and self._last[0] == title:
+            return self._last[1], self._last[2]
+        shingles = _shingle_hashes(title)
+        signature = _minhash(shingles)
+        numbers = _numbers(title)
+        band_keys = [_band_key(signature, band, numbers) for band in range(BANDS)]
+        self._last = (title, shingles, band_keys)
+        return shingles, band_keys
+
+    def _resolve_title(self, meta: PaperMetadata) -> Optional[str]:
+        title = normalize_title(meta.title)
+        if len(title) < self.min_title_length:
+            return None
+        shingles, band_keys = self._signature(title)
+        best_id: Optional[str] = None
+        best_score = self.title_threshold
+        checked: Set[str] = set()
+        for band_key in band_keys:
+            for node_id in self._buckets.get(band_key, ()):
+                if node_id in checked:
+                    continue
+                checked.add(node_id)
+                year = self._years.get(node_id)
+                if meta.year and year and abs(meta.year - year) > 1:
+                    continue
+                score = _jaccard(shingles, self._titles[node_id])
+                if score >= best_score:
+                    best_id, best_score = node_id, score
+        return best_id
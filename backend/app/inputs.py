@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import re
+from typing import Dict, List, Optional
+
+from .clients.local_corpus import LocalCorpusClient
+from .clients.openalex import OpenAlexClient
+from .clients.semantic_scholar import SemanticScholarClient
+from .identity import normalize_arxiv, normalize_doi
+from .models import InputType, PaperMetadata
+
+logger = logging.getLogger(__name__)
+
+DOI_RE = re.compile(r"10\.\d{4,9}/[-._;()/:A-Z0-9]+", re.IGNORECASE)
+ARXIV_URL_RE = re.compile(r"arxiv\.org/(?:abs|pdf)/([^\s?#]+?)(?:\.pdf)?(?:[?#]|$)", re.I)
+S2_URL_RE = re.compile(r"semanticscholar\.org/paper/(?:[^/\s]+/)?([0-9a-f]{40})\b", re.I)
+# Local corpus lookups run in worker threads; bound how many a bulk request starts at once.
+LOCAL_LOOKUPS = 8
+# Research plans in a bulk request are summarized by Claude, a few at a time.
+PLAN_SUMMARIES = 4
+
+
+def detect_input_type(text: str) -> InputType:
+    if DOI_RE.search(text) or text.startswith("http"):
+        return InputType.paper_link
+    return InputType.research_plan
+
+
+def find_doi(text: str) -> Optional[str]:
+    match = DOI_RE.search(text)
+    return normalize_doi(match.group(0).rstrip(".,;")) if match else None
+
+
+def semantic_identifier(text: str) -> str:
+    # The Graph API form of a pasted link: DOI:, ARXIV:, a paper id, or URL: as a last resort.
+    doi = find_doi(text)
+    if doi:
+        return f"DOI:{doi}"
+    arxiv = ARXIV_URL_RE.search(text)
+    if arxiv:
+        return f"ARXIV:{normalize_arxiv(arxiv.group(1))}"
+    paper = S2_URL_RE.search(text)
+    if paper:
+        return paper.group(1).lower()
+    if text.startswith("http"):
+        return f"URL:{text}"
+    return text
+
+
+class InputResolver:
+    # Resolves many paper links at once. Each source is asked once for everything still
+    # missing: the local corpus (first in primary mode), then one Semantic Scholar batch, then
+    # OpenAlex by DOI, then the local corpus as a fallback.
+    def __init__(
+        self,
+        semantic_client: SemanticScholarClient,
+        openalex_client: OpenAlexClient,
+        corpus: Optional[LocalCorpusClient] = None,
+        local_first: bool = False,
+    ) -> None:
+        self.semantic_client = semantic_client
+        self.openalex_client = openalex_client
+        self.corpus = corpus
+        self.local_first = local_first and corpus is not None
+
+    async def resolve(self, texts: List[str]) -> List[Optional[PaperMetadata]]:
+        found: Dict[str, PaperMetadata] = {}
+        pending = list(dict.fromkeys(texts))
+        if self.local_first:
+            found.update(await self._local(pending))
+            pending = [text for text in pending if text not in found]
+        if pending:
+            identifiers = {text: semantic_identifier(text) for text in pending}
+            papers = await self.semantic_client.fetch_papers(list(identifiers.values()))
+            for text, identifier in identifiers.items():
+                if papers.get(identifier):
+                    found[text] = papers[identifier]
+            pending = [text for text in pending if text not in found]
+        dois = {text: find_doi(text) for text in pending}
+        if any(dois.values()):
+            works = await self.openalex_client.fetch_by_dois([d for d in dois.values() if d])
+            for text, doi in dois.items():
+                if doi in works:
+                    found[text] = works[doi]
+            pending = [text for text in pending if text not in found]
+        if pending and self.corpus is not None and not self.local_first:
+            found.update(await self._local(pending))
+        return [found.get(text) for text in texts]
+
+    async def _local(self, texts: List[str]) -> Dict[str, PaperMetadata]:
+        semaphore = asyncio.Semaphore(LOCAL_LOOKUPS)
+
+        async def lookup(text: str) -> Optional[PaperMetadata]:
+            async with semaphore:
+                return await self.corpus.fetch_paper(find_doi(text) or text)
+
+        papers = await asyncio.gather(*(lookup(text) for text in texts))
+        return {text: paper for text, paper in zip(texts, papers) if paper}
@@ -1,30 +1,87 @@
+import asyncio
+import json
 import logging
-import re
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Union
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 
-from .claude import answer_about_paper, build_plan_summary
+from .analytics import graph_analytics
+from .claude import (
+    ClaudeCache,
+    answer_about_paper,
+    build_plan_summary,
+    stream_answer_about_paper,
+)
+from .clients.local_corpus import LocalCorpusClient
 from .clients.semantic_scholar import SemanticScholarClient
 from .clients.openalex import OpenAlexClient
 from .config import Settings, get_settings
-from .graph_engine import GraphBuilder
+from .formats import graph_response, negotiate
+from .graph_engine import GraphBuilder, collect
+from .graph_store import GraphState
+from .inputs import (
+    PLAN_SUMMARIES,
+    InputResolver,
+    detect_input_type,
+    find_doi,
+    semantic_identifier,
+)
 from .models import (
     AnalyzeInputRequest,
     AnalyzeInputResponse,
+    BulkAnalyzeRequest,
+    BulkAnalyzeResponse,
+    BulkAnalyzeResult,
     ClaudeChatRequest,
     ClaudeChatResponse,
     ExpandGraphRequest,
+    ExpandOptions,
+    ExpandRootsRequest,
+    ExpandSessionRequest,
+    GraphAnalytics,
+    GraphEvent,
+    GraphEventType,
     GraphResponse,
     InputType,
     PaperMetadata,
+    SessionGraphResponse,
 )
+from .prefetch import Prefetcher
+from .queries import EMPTY_ARXIV
+from .sessions import GraphSession, SessionStore
+from .telemetry import REGISTRY, TelemetryMiddleware, Trace, TraceStore, span
+from .transport import HttpPool
+from .upstream import Upstream
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI(title="Research Spider")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    app.state.upstream = Upstream.from_settings(get_settings())
+    app.state.sessions = SessionStore(get_settings())
+    app.state.traces = TraceStore(get_settings().trace_buffer_size)
+    app.state.claude_cache = ClaudeCache(get_settings())
+    corpus_path = get_settings().local_corpus_path
+    app.state.corpus = LocalCorpusClient.open(corpus_path) if corpus_path else None
+    app.state.prefetcher = Prefetcher(
+        GraphBuilder(upstream=app.state.upstream, corpus=app.state.corpus), app.state.upstream
+    )
+    app.state.prefetcher.start()
+    try:
+        yield
+    finally:
+        await app.state.prefetcher.aclose()
+        await app.state.upstream.aclose()
+        if app.state.corpus is not None:
+            app.state.corpus.close()
+
+
+app = FastAPI(title="Research Spider", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,23 +89,73 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "Server-Timing"],
+)
+app.add_middleware(
+    TelemetryMiddleware,
+    max_spans=get_settings().trace_max_spans,
+    profiling_enabled=get_settings().profiling_enabled,
+    profile_interval=get_settings().profile_interval_ms / 1000,
 )
 
 
-def detect_input_type(text: str) -> InputType:
-    if re.search(r"10\\.\\d{4,9}/[-._;()/:A-Z0-9]+", text, re.IGNORECASE) or text.startswith(
-        "http"
-    ):
-        return InputType.paper_link
-    return InputType.research_plan
+def get_upstream(request: Request) -> Upstream:
+    return request.app.state.upstream
+
+
+def get_http_pool(upstream: Upstream = Depends(get_upstream)) -> Optional[HttpPool]:
+    return upstream.pool
+
+
+def get_claude_cache(request: Request) -> ClaudeCache:
+    return request.app.state.claude_cache
+
+
+def get_semantic_client(
+    settings: Settings = Depends(get_settings), upstream: Upstream = Depends(get_upstream)
+) -> SemanticScholarClient:
+    return SemanticScholarClient(api_key=settings.semantic_scholar_api_key, upstream=upstream)
+
+
+def get_openalex_client(
+    settings: Settings = Depends(get_settings), upstream: Upstream = Depends(get_upstream)
+) -> OpenAlexClient:
+    return OpenAlexClient(email=settings.openalex_email, upstream=upstream)
+
+
+def get_local_corpus(request: Request) -> Optional[LocalCorpusClient]:
+    return request.app.state.corpus
+
+
+def get_graph_builder(
+    upstream: Upstream = Depends(get_upstream),
+    corpus: Optional[LocalCorpusClient] = Depends(get_local_corpus),
+) -> GraphBuilder:
+    return GraphBuilder(upstream=upstream, corpus=corpus)
 
 
-def get_semantic_client(settings: Settings = Depends(get_settings)) -> SemanticScholarClient:
-    return SemanticScholarClient(api_key=settings.semantic_scholar_api_key)
+def get_prefetcher(request: Request) -> Prefetcher:
+    return request.app.state.prefetcher
 
 
-def get_openalex_client(settings: Settings = Depends(get_settings)) -> OpenAlexClient:
-    return OpenAlexClient(email=settings.openalex_email)
+def get_session_store(request: Request) -> SessionStore:
+    return request.app.state.sessions
+
+
+def get_trace(request: Request, trace_id: str) -> Trace:
+    trace = request.app.state.traces.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found; only recent ones are kept.")
+    return trace
+
+
+def get_session(
+    session_id: str, store: SessionStore = Depends(get_session_store)
+) -> GraphSession:
+    session = store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Graph session not found or expired.")
+    return session
 
 
 @app.post("/analyze-input", response_model=AnalyzeInputResponse)
@@ -56,6 +163,10 @@ async def analyze_input(
     payload: AnalyzeInputRequest,
     semantic_client: SemanticScholarClient = Depends(get_semantic_client),
     openalex_client: OpenAlexClient = Depends(get_openalex_client),
+    pool: Optional[HttpPool] = Depends(get_http_pool),
+    claude_cache: ClaudeCache = Depends(get_claude_cache),
+    corpus: Optional[LocalCorpusClient] = Depends(get_local_corpus),
+    settings: Settings = Depends(get_settings),
 ) -> AnalyzeInputResponse:
     text = payload.input_text.strip()
     if not text:
@@ -65,29 +176,398 @@ async def analyze_input(
     metadata: Optional[PaperMetadata] = None
 
     if input_type == InputType.research_plan:
-        metadata = await build_plan_summary(text)
+        metadata = await build_plan_summary(text, pool=pool, cache=claude_cache)
     else:
-        doi_match = re.search(r"10\\.\\d{4,9}/[-._;()/:A-Z0-9]+", text, re.IGNORECASE)
-        doi = doi_match.group(0) if doi_match else None
-        metadata = await semantic_client.fetch_paper(doi or text)
+        doi = find_doi(text)
+        local_first = corpus is not None and settings.local_corpus_mode == "primary"
+        if local_first:
+            metadata = await corpus.fetch_paper(doi or text)
+        if not metadata:
+            metadata = await semantic_client.fetch_paper(semantic_identifier(text))
         if not metadata and doi:
             metadata = await openalex_client.fetch_by_doi(doi)
+        if not metadata and corpus is not None and not local_first:
+            metadata = await corpus.fetch_paper(doi or text)
         if not metadata:
             raise HTTPException(status_code=404, detail="Paper could not be retrieved.")
     return AnalyzeInputResponse(input_type=input_type, metadata=metadata)
 
 
+@app.post("/analyze-inputs", response_model=BulkAnalyzeResponse)
+async def analyze_inputs(
+    payload: BulkAnalyzeRequest,
+    semantic_client: SemanticScholarClient = Depends(get_semantic_client),
+    openalex_client: OpenAlexClient = Depends(get_openalex_client),
+    pool: Optional[HttpPool] = Depends(get_http_pool),
+    claude_cache: ClaudeCache = Depends(get_claude_cache),
+    corpus: Optional[LocalCorpusClient] = Depends(get_local_corpus),
+    settings: Settings = Depends(get_settings),
+) -> BulkAnalyzeResponse:
+    # Paper links are resolved together, one batch per source, instead of one fallback chain
+    # per link; research plans are summarized concurrently. Failures are reported per input.
+    texts = [text.strip() for text in payload.inputs]
+    types = [detect_input_type(text) for text in texts]
+    links = [text for text, kind in zip(texts, types) if text and kind == InputType.paper_link]
+    resolver = InputResolver(
+        semantic_client,
+        openalex_client,
+        corpus,
+        local_first=settings.local_corpus_mode == "primary",
+    )
+    papers = dict(zip(links, await resolver.resolve(links)))
+    semaphore = asyncio.Semaphore(PLAN_SUMMARIES)
+
+    async def analyze(text: str, input_type: InputType) -> BulkAnalyzeResult:
+        if not text:
+            return BulkAnalyzeResult(
+                input=text, input_type=input_type, error="Input text is required."
+            )
+        if input_type == InputType.paper_link:
+            metadata = papers.get(text)
+        else:
+            async with semaphore:
+                metadata = await build_plan_summary(text, pool=pool, cache=claude_cache)
+        if metadata is None:
+            return BulkAnalyzeResult(
+                input=text, input_type=input_type, error="Paper could not be retrieved."
+            )
+        return BulkAnalyzeResult(input=text, input_type=input_type, metadata=metadata)
+
+    results = await asyncio.gather(*(analyze(text, kind) for text, kind in zip(texts, types)))
+    return BulkAnalyzeResponse(results=list(results))
+
+
+async def expansion_response(
+    roots: List[PaperMetadata],
+    options: ExpandOptions,
+    request: Request,
+    builder: GraphBuilder,
+    prefetcher: Prefetcher,
+    settings: Settings,
+    store: Optional[SessionStore] = None,
+) -> Response:
+    # Shared by the non-streaming expansion endpoints. With a store, the graph is built into a
+    # new session whose id the response carries; nothing else can reach it before that.
+    session = store.create(roots[0], roots[1:]) if store is not None else None
+    prefetcher.begin(roots=roots)
+    state, truncated_reason, build_seconds = await builder.build_roots(
+        roots,
+        max_nodes=options.max_nodes,
+        max_depth=options.max_depth,
+        deadline_seconds=options.deadline_seconds,
+        max_upstream_calls=options.max_upstream_calls,
+        state=session.state if session is not None else None,
+    )
+    if session is not None:
+        store.record(session)
+    prefetcher.schedule(state)
+    analytics = await asyncio.to_thread(graph_analytics, state) if options.analytics else None
+    media_type = negotiate(request.headers.get("accept", ""))
+    with span("serialize", format=media_type or "json", nodes=len(state)):
+        if media_type is None:
+            # Serialized here rather than by FastAPI so the span covers the encoding.
+            graph = state.graph(truncated_reason, build_seconds=build_seconds)
+            graph.analytics = analytics
+            if session is not None:
+                graph = SessionGraphResponse.model_construct(session_id=session.id, **dict(graph))
+            return Response(content=graph.model_dump_json(), media_type="application/json")
+        extra = {}
+        if analytics is not None:
+            extra["analytics"] = analytics.model_dump()
+        if session is not None:
+            extra["session_id"] = session.id
+        return graph_response(
+            state,
+            media_type,
+            request.headers.get("accept-encoding", ""),
+            settings.response_compression_min_bytes,
+            truncated_reason=truncated_reason,
+            build_seconds=build_seconds,
+            extra=extra,
+        )
+
+
 @app.post("/expand-graph", response_model=GraphResponse)
-async def expand_graph(payload: ExpandGraphRequest) -> GraphResponse:
-    builder = GraphBuilder()
-    return await builder.expand(
-        payload.root_metadata, max_nodes=payload.max_nodes, max_depth=payload.max_depth
+async def expand_graph(
+    payload: ExpandGraphRequest,
+    request: Request,
+    builder: GraphBuilder = Depends(get_graph_builder),
+    prefetcher: Prefetcher = Depends(get_prefetcher),
+    store: SessionStore = Depends(get_session_store),
+    settings: Settings = Depends(get_settings),
+) -> Response:
+    return await expansion_response(
+        [payload.root_metadata],
+        payload,
+        request,
+        builder,
+        prefetcher,
+        settings,
+        store=store if payload.create_session else None,
     )
 
 
+@app.post("/expand-graph/roots", response_model=GraphResponse)
+async def expand_roots(
+    payload: ExpandRootsRequest,
+    request: Request,
+    builder: GraphBuilder = Depends(get_graph_builder),
+    prefetcher: Prefetcher = Depends(get_prefetcher),
+    store: SessionStore = Depends(get_session_store),
+    settings: Settings = Depends(get_settings),
+) -> Response:
+    # One merged graph for a reading list: the roots share a frontier, dedup and node budget.
+    return await expansion_response(
+        payload.roots,
+        payload,
+        request,
+        builder,
+        prefetcher,
+        settings,
+        store=store if payload.create_session else None,
+    )
+
+
+def format_event(event: GraphEvent, sse: bool) -> str:
+    data = event.model_dump_json()
+    if sse:
+        return f"event: {event.type.value}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+@app.post("/expand-graph/stream")
+async def expand_graph_stream(
+    payload: ExpandGraphRequest,
+    request: Request,
+    builder: GraphBuilder = Depends(get_graph_builder),
+    prefetcher: Prefetcher = Depends(get_prefetcher),
+    store: SessionStore = Depends(get_session_store),
+) -> StreamingResponse:
+    # NDJSON by default; Server-Sent Events framing when the client asks for it. If the client
+    # disconnects, Starlette cancels the generator and the engine cancels pending lookups.
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    session = store.create(payload.root_metadata) if payload.create_session else None
+    state = session.state if session is not None else GraphState(payload.root_metadata)
+
+    async def events() -> AsyncIterator[str]:
+        prefetcher.begin(roots=[payload.root_metadata])
+        async for event in builder.stream(
+            payload.root_metadata,
+            max_nodes=payload.max_nodes,
+            max_depth=payload.max_depth,
+            deadline_seconds=payload.deadline_seconds,
+            max_upstream_calls=payload.max_upstream_calls,
+            state=state,
+        ):
+            if event.type == GraphEventType.summary:
+                if session is not None:
+                    event.session_id = session.id
+                    store.record(session)
+                prefetcher.schedule(state)
+            yield format_event(event, sse)
+
+    async def session_events() -> AsyncIterator[str]:
+        async with session.lock:
+            async for chunk in events():
+                yield chunk
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(
+        events() if session is None else session_events(), media_type=media_type
+    )
+
+
+@app.post("/sessions", response_model=SessionGraphResponse)
+async def create_session(
+    payload: ExpandGraphRequest,
+    builder: GraphBuilder = Depends(get_graph_builder),
+    prefetcher: Prefetcher = Depends(get_prefetcher),
+    store: SessionStore = Depends(get_session_store),
+) -> SessionGraphResponse:
+    session = store.create(payload.root_metadata)
+    prefetcher.begin(roots=[payload.root_metadata])
+    async with session.lock:
+        graph = await collect(
+            builder.stream(
+                payload.root_metadata,
+                max_nodes=payload.max_nodes,
+                max_depth=payload.max_depth,
+                deadline_seconds=payload.deadline_seconds,
+                max_upstream_calls=payload.max_upstream_calls,
+                state=session.state,
+            )
+        )
+        store.record(session)
+        prefetcher.schedule(session.state)
+    return SessionGraphResponse(session_id=session.id, **graph.model_dump())
+
+
+@app.post("/sessions/roots", response_model=SessionGraphResponse)
+async def create_roots_session(
+    payload: ExpandRootsRequest,
+    builder: GraphBuilder = Depends(get_graph_builder),
+    prefetcher: Prefetcher = Depends(get_prefetcher),
+    store: SessionStore = Depends(get_session_store),
+) -> SessionGraphResponse:
+    session = store.create(payload.roots[0], payload.roots[1:])
+    prefetcher.begin(roots=payload.roots)
+    async with session.lock:
+        _, truncated_reason, build_seconds = await builder.build_roots(
+            payload.roots,
+            max_nodes=payload.max_nodes,
+            max_depth=payload.max_depth,
+            deadline_seconds=payload.deadline_seconds,
+            max_upstream_calls=payload.max_upstream_calls,
+            state=session.state,
+        )
+        store.record(session)
+        prefetcher.schedule(session.state)
+        graph = session.state.graph(truncated_reason, build_seconds=build_seconds)
+    return SessionGraphResponse(session_id=session.id, **graph.model_dump())
+
+
+@app.get("/sessions/{session_id}", response_model=SessionGraphResponse)
+async def get_session_graph(
+    request: Request,
+    session: GraphSession = Depends(get_session),
+    settings: Settings = Depends(get_settings),
+) -> Union[SessionGraphResponse, Response]:
+    media_type = negotiate(request.headers.get("accept", ""))
+    if media_type is None:
+        return SessionGraphResponse(session_id=session.id, **session.graph().model_dump())
+    return graph_response(
+        session.state,
+        media_type,
+        request.headers.get("accept-encoding", ""),
+        settings.response_compression_min_bytes,
+        extra={"session_id": session.id},
+    )
+
+
+@app.get("/sessions/{session_id}/analytics", response_model=GraphAnalytics)
+async def session_analytics(session: GraphSession = Depends(get_session)) -> GraphAnalytics:
+    # Computed off the loop, and only again once the session's graph has grown.
+    async with session.lock:
+        return await asyncio.to_thread(graph_analytics, session.state)
+
+
+@app.post("/sessions/{session_id}/expand", response_model=SessionGraphResponse)
+async def expand_session(
+    payload: ExpandSessionRequest,
+    session: GraphSession = Depends(get_session),
+    builder: GraphBuilder = Depends(get_graph_builder),
+    prefetcher: Prefetcher = Depends(get_prefetcher),
+    store: SessionStore = Depends(get_session_store),
+) -> SessionGraphResponse:
+    unknown = [node_id for node_id in payload.node_ids if node_id not in session.state]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown node ids: {', '.join(unknown)}")
+    prefetcher.begin(node_ids=payload.node_ids)
+    async with session.lock:
+        delta = await collect(
+            builder.grow(
+                session.state,
+                payload.node_ids,
+                max_nodes=len(session.state) + payload.max_new_nodes,
+                max_depth=payload.max_depth,
+                deadline_seconds=payload.deadline_seconds,
+                max_upstream_calls=payload.max_upstream_calls,
+            )
+        )
+        store.record(session)
+        prefetcher.schedule(session.state)
+    return SessionGraphResponse(session_id=session.id, **delta.model_dump())
+
+
+@app.delete("/sessions/{session_id}", status_code=204)
+async def delete_session(
+    session_id: str, store: SessionStore = Depends(get_session_store)
+) -> None:
+    if not store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Graph session not found or expired.")
+
+
+@app.get("/session-stats")
+async def session_stats(store: SessionStore = Depends(get_session_store)) -> dict:
+    return store.stats()
+
+
 @app.post("/claude-chat", response_model=ClaudeChatResponse)
-async def claude_chat(payload: ClaudeChatRequest) -> ClaudeChatResponse:
+async def claude_chat(
+    payload: ClaudeChatRequest,
+    pool: Optional[HttpPool] = Depends(get_http_pool),
+    claude_cache: ClaudeCache = Depends(get_claude_cache),
+) -> ClaudeChatResponse:
     answer = await answer_about_paper(
-        payload.paper_metadata, payload.related_papers, payload.message
+        payload.paper_metadata,
+        payload.related_papers,
+        payload.message,
+        pool=pool,
+        cache=claude_cache,
     )
     return ClaudeChatResponse(answer=answer)
+
+
+@app.post("/claude-chat/stream")
+async def claude_chat_stream(
+    payload: ClaudeChatRequest,
+    pool: Optional[HttpPool] = Depends(get_http_pool),
+    claude_cache: ClaudeCache = Depends(get_claude_cache),
+) -> StreamingResponse:
+    # Server-Sent Events: one `delta` event per text chunk, then `done` with the full answer.
+    async def events() -> AsyncIterator[str]:
+        parts = []
+        async for chunk in stream_answer_about_paper(
+            payload.paper_metadata,
+            payload.related_papers,
+            payload.message,
+            pool=pool,
+            cache=claude_cache,
+        ):
+            parts.append(chunk)
+            yield f"event: delta\ndata: {json.dumps({'text': chunk})}\n\n"
+        yield f"event: done\ndata: {json.dumps({'answer': ''.join(parts)})}\n\n"
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
+
+
+@app.get("/claude-stats")
+async def claude_stats(claude_cache: ClaudeCache = Depends(get_claude_cache)) -> dict:
+    return claude_cache.stats()
+
+
+@app.get("/prefetch-stats")
+async def prefetch_stats(prefetcher: Prefetcher = Depends(get_prefetcher)) -> dict:
+    return prefetcher.stats()
+
+
+@app.get("/upstream-stats")
+async def upstream_stats(upstream: Upstream = Depends(get_upstream)) -> dict:
+    return {**upstream.stats(), "arxiv_empty_queries": EMPTY_ARXIV.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/traces")
+async def recent_traces(request: Request, limit: int = 20) -> list:
+    return [trace.summary() for trace in request.app.state.traces.recent(limit)]
+
+
+@app.get("/traces/{trace_id}")
+async def trace_detail(trace: Trace = Depends(get_trace)) -> dict:
+    return trace.to_dict()
+
+
+@app.get("/traces/{trace_id}/profile", response_class=PlainTextResponse)
+async def trace_profile(trace: Trace = Depends(get_trace)) -> PlainTextResponse:
+    # Collapsed stacks; feed to flamegraph.pl or open in speedscope.
+    if trace.profile is None:
+        raise HTTPException(
+            status_code=404, detail="Not profiled; retry with ?profile=1 and PROFILING_ENABLED."
+        )
+    return PlainTextResponse(trace.profile)
@@ -1,7 +1,14 @@
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, model_validator
+
+
+# Default node cap per expansion, and the cap for requests that opt into large-graph mode.
+MAX_GRAPH_NODES = 100
+LARGE_GRAPH_MAX_NODES = 20000
+# Inputs per bulk analysis and roots per multi-root expansion: a long reading list.
+MAX_ROOTS = 200
 
 
 class InputType(str, Enum):
@@ -19,6 +26,9 @@ class PaperMetadata(BaseModel):
     pdf_link: Optional[HttpUrl] = None
     source: Optional[str] = None
     references: List[str] = Field(default_factory=list)
+    external_ids: Dict[str, str] = Field(
+        default_factory=dict, description="Identifiers of the same paper in other sources"
+    )
 
 
 class AnalyzeInputRequest(BaseModel):
@@ -30,6 +40,22 @@ class AnalyzeInputResponse(BaseModel):
     metadata: PaperMetadata
 
 
+class BulkAnalyzeRequest(BaseModel):
+    inputs: List[str] = Field(min_length=1, max_length=MAX_ROOTS)
+
+
+class BulkAnalyzeResult(BaseModel):
+    input: str
+    input_type: InputType
+    metadata: Optional[PaperMetadata] = None
+    error: Optional[str] = None
+
+
+class BulkAnalyzeResponse(BaseModel):
+    # One result per input, in request order.
+    results: List[BulkAnalyzeResult]
+
+
 class GraphNode(PaperMetadata):
     id: str
 
@@ -42,20 +68,124 @@ class EdgeType(str, Enum):
 
 
 class GraphEdge(BaseModel):
+    # Citation edges point from the citing paper to the cited one.
     source: str
     target: str
     type: EdgeType
 
 
+# A paper found while expanding a node: (paper, edge type, incoming). Incoming edges point
+# from the found paper to the node, as for a paper that cites it.
+RelatedPaper = Tuple[PaperMetadata, EdgeType, bool]
+
+
+class TruncationReason(str, Enum):
+    deadline = "deadline"
+    upstream_budget = "upstream_budget"
+
+
+class GraphStats(BaseModel):
+    node_count: int
+    edge_count: int
+    approx_bytes: int = Field(description="Estimated server-side graph storage")
+    bytes_per_node: float
+    build_seconds: Optional[float] = None
+
+
+class GraphAnalytics(BaseModel):
+    # Per-node lists are aligned with node_ids. Components and communities are numbered by
+    # size, largest first; rank 0 is the node with the highest PageRank.
+    node_ids: List[str]
+    pagerank: List[float]
+    rank: List[int]
+    in_degree: List[int]
+    out_degree: List[int]
+    betweenness: List[float] = Field(description="Sampled estimate, normalized to [0, 1]")
+    component: List[int]
+    community: List[int]
+    component_sizes: List[int]
+    community_sizes: List[int]
+    key_papers: List[str] = Field(description="Node ids with the highest PageRank")
+    compute_seconds: float
+
+
 class GraphResponse(BaseModel):
     nodes: List[GraphNode]
     edges: List[GraphEdge]
+    truncated: bool = False
+    truncated_reason: Optional[TruncationReason] = None
+    stats: Optional[GraphStats] = None
+    analytics: Optional[GraphAnalytics] = None
 
 
-class ExpandGraphRequest(BaseModel):
-    root_metadata: PaperMetadata
-    max_nodes: int = Field(default=30, ge=1, le=100)
+class GraphEventType(str, Enum):
+    batch = "batch"
+    progress = "progress"
+    summary = "summary"
+
+
+class GraphEvent(BaseModel):
+    type: GraphEventType
+    nodes: List[GraphNode] = Field(default_factory=list)
+    edges: List[GraphEdge] = Field(default_factory=list)
+    depth: int = 0
+    node_count: int = 0
+    edge_count: int = 0
+    frontier_size: int = 0
+    truncated: bool = False
+    truncated_reason: Optional[TruncationReason] = None
+    session_id: Optional[str] = None
+
+
+class ExpandOptions(BaseModel):
+    max_nodes: int = Field(default=30, ge=1, le=LARGE_GRAPH_MAX_NODES)
     max_depth: int = Field(default=2, ge=1, le=5)
+    deadline_seconds: Optional[float] = Field(default=None, gt=0, le=300)
+    max_upstream_calls: Optional[int] = Field(default=None, ge=1)
+    large: bool = Field(default=False, description="Large-graph mode: raises the max_nodes cap")
+    analytics: bool = Field(
+        default=False, description="Attach centrality scores and cluster labels to the response"
+    )
+
+    @model_validator(mode="after")
+    def check_node_cap(self) -> "ExpandOptions":
+        if not self.large and self.max_nodes > MAX_GRAPH_NODES:
+            raise ValueError(
+                f"max_nodes above {MAX_GRAPH_NODES} requires large=true "
+                f"(up to {LARGE_GRAPH_MAX_NODES})"
+            )
+        return self
+
+
+class ExpandGraphRequest(ExpandOptions):
+    root_metadata: PaperMetadata
+    create_session: bool = Field(
+        default=False,
+        description="Keep the graph server-side; the response or streamed summary carries its id",
+    )
+
+
+class ExpandRootsRequest(ExpandOptions):
+    # One merged graph: roots share the frontier, dedup and node budget, and count toward it.
+    roots: List[PaperMetadata] = Field(min_length=1, max_length=MAX_ROOTS)
+    max_nodes: int = Field(default=MAX_GRAPH_NODES, ge=1, le=LARGE_GRAPH_MAX_NODES)
+    create_session: bool = Field(
+        default=False, description="Keep the graph server-side; the response carries its id"
+    )
+
+
+class ExpandSessionRequest(BaseModel):
+    node_ids: List[str] = Field(min_length=1)
+    max_new_nodes: int = Field(default=30, ge=1, le=100)
+    max_depth: int = Field(default=1, ge=1, le=5)
+    deadline_seconds: Optional[float] = Field(default=None, gt=0, le=300)
+    max_upstream_calls: Optional[int] = Field(default=None, ge=1)
+
+
+class SessionGraphResponse(GraphResponse):
+    # On expansion, nodes/edges are only the delta: new nodes and edges, plus existing nodes
+    # that absorbed a duplicate.
+    session_id: str
 
 
 class ClaudeChatRequest(BaseModel):
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from .clients.semantic_scholar import paper_identifier
+from .config import Settings, get_settings
+from .graph_engine import GraphBuilder
+from .graph_store import GraphState
+from .models import GraphNode, PaperMetadata
+from .resilience import background_context
+from .telemetry import span
+from .upstream import Upstream
+
+logger = logging.getLogger(__name__)
+
+# Leaves short-listed by degree per node to prefetch, before ranking them by relevance.
+SHORTLIST = 8
+# Warmed node ids remembered for hit accounting.
+MAX_TRACKED = 4096
+HEADROOM_POLL_SECONDS = 0.5
+
+
+class Prefetcher:
+    # Speculative expansion lookups. After each expansion the leaves a user is most likely to
+    # expand next are warmed in the upstream cache in the background. Background requests
+    # only spend rate budget above the PREFETCH_RESERVE share of each source's burst, and a
+    # foreground expansion starting while a source is below that cancels work in progress.
+    # Per process, like the cache it fills.
+    def __init__(
+        self, builder: GraphBuilder, upstream: Upstream, settings: Optional[Settings] = None
+    ) -> None:
+        settings = settings or get_settings()
+        self.builder = builder
+        # Without a response cache there is nowhere to keep what is fetched.
+        self.enabled = settings.prefetch_enabled and upstream.cache is not None
+        self.max_nodes = settings.prefetch_nodes
+        self.concurrency = max(1, settings.prefetch_concurrency)
+        self.ttl = settings.cache_ttl_default
+        self.warmup_path = settings.prefetch_warmup_path
+        self.warmup_papers = settings.prefetch_warmup_papers
+        budgets = (builder.semantic_client.budget, builder.openalex_client.budget, "arxiv")
+        self.policies = [upstream.policies[name] for name in budgets if name in upstream.policies]
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._warmup: "Optional[asyncio.Task[None]]" = None
+        self._warmed: "OrderedDict[str, float]" = OrderedDict()
+        self._pending: Set[str] = set()
+        self.requested: Counter[str] = Counter()
+        self.jobs = 0
+        self.warmed = 0
+        self.cancelled = 0
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+        self.warmup: Dict[str, Any] = {"papers": 0, "seconds": None}
+
+    def start(self) -> None:
+        if self.enabled and self.warmup_path:
+            self._warmup = asyncio.create_task(self.warm_up(), context=background_context())
+
+    async def aclose(self) -> None:
+        pending = [*self._tasks, self._warmup] if self._warmup is not None else [*self._tasks]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if self.enabled and self.warmup_path:
+            self._save()
+
+    def begin(
+        self, roots: Sequence[PaperMetadata] = (), node_ids: Sequence[str] = ()
+    ) -> None:
+        # A foreground expansion from `roots` or existing `node_ids` is starting. Speculative
+        # work in progress is dropped only if a source is already short of headroom, as the
+        # expansion will need that capacity (what was fetched stays cached); otherwise it runs
+        # on inside the reserve. Each node counts as a hit if it was warmed recently, and
+        # roots are tallied for the next warm-up.
+        if not self._has_headroom():
+            for task in list(self._tasks):
+                task.cancel()
+        for root in roots:
+            identifier = paper_identifier(root)
+            if identifier is not None:
+                self.requested[identifier] += 1
+        if not self.enabled:
+            return
+        cutoff = time.monotonic() - self.ttl
+        for node_id in [*node_ids, *(root.id or root.title for root in roots)]:
+            if self._warmed.get(node_id, cutoff) > cutoff:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def schedule(self, state: GraphState) -> None:
+        if not self.enabled or self.max_nodes <= 0:
+            return
+        nodes = self._candidates(state)
+        if not nodes:
+            return
+        if not self._has_headroom():
+            self.skipped += 1
+            return
+        task = asyncio.create_task(self._run(nodes), context=background_context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _candidates(self, state: GraphState) -> List[GraphNode]:
+        # Leaves not yet expanded or warmed, short-listed by degree, then ranked by relevance
+        # to the roots boosted by how connected the leaf already is.
+        n = len(state)
+        sources = np.asarray(state.sources, dtype=np.int64)
+        targets = np.asarray(state.targets, dtype=np.int64)
+        degree = np.bincount(sources, minlength=n) + np.bincount(targets, minlength=n)
+        cutoff = time.monotonic() - self.ttl
+        leaves = [
+            i
+            for i, node_id in enumerate(state.ids)
+            if node_id not in state.expanded
+            and node_id not in self._pending
+            and self._warmed.get(node_id, cutoff) <= cutoff
+        ]
+        if not leaves:
+            return []
+        leaves = np.asarray(leaves, dtype=np.int64)
+        leaves = leaves[np.argsort(-degree[leaves], kind="stable")[: SHORTLIST * self.max_nodes]]
+        nodes = [state.node(state.ids[i]) for i in leaves]
+        relevance = state.scorer.similarity(nodes)
+        boost = np.log1p(degree[leaves])
+        order = np.argsort(-(relevance * (1.0 + boost)), kind="stable")[: self.max_nodes]
+        return [nodes[i] for i in order]
+
+    def _has_headroom(self) -> bool:
+        return all(policy.has_headroom() for policy in self.policies)
+
+    async def _run(self, nodes: List[GraphNode]) -> None:
+        node_ids = [node.id for node in nodes]
+        self._pending.update(node_ids)
+        self.jobs += 1
+        try:
+            with span("prefetch", nodes=len(nodes)):
+                await self.builder.warm(nodes, self.concurrency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self._pending.difference_update(node_ids)
+        self._mark(node_ids)
+
+    def _mark(self, node_ids: Sequence[str]) -> None:
+        now = time.monotonic()
+        for node_id in node_ids:
+            self._warmed[node_id] = now
+            self._warmed.move_to_end(node_id)
+        self.warmed += len(node_ids)
+        while len(self._warmed) > MAX_TRACKED:
+            self._warmed.popitem(last=False)
+
+    async def warm_up(self) -> None:
+        # Preloads the papers requested most often before the last shutdown: their metadata,
+        # then the lookups of a first expansion from each, paced by the rate-budget headroom.
+        identifiers = self._load()
+        if not identifiers:
+            return
+        started = time.perf_counter()
+        papers = await self.builder.semantic_client.fetch_papers(identifiers)
+        roots = [meta for meta in papers.values() if meta is not None]
+        if not roots:
+            return
+        state = GraphState.from_roots(roots)
+        nodes = [state.node(node_id) for node_id in state.root_ids]
+        for start in range(0, len(nodes), max(1, self.max_nodes)):
+            while not self._has_headroom():
+                await asyncio.sleep(HEADROOM_POLL_SECONDS)
+            chunk = nodes[start : start + max(1, self.max_nodes)]
+            with span("prefetch", nodes=len(chunk), warmup=True):
+                await self.builder.warm(chunk, self.concurrency)
+            self._mark([node.id for node in chunk])
+            self.warmup["papers"] += len(chunk)
+        self.warmup["seconds"] = round(time.perf_counter() - started, 3)
+        logger.info("Prefetch warm-up preloaded %s papers", len(nodes))
+
+    def _load(self) -> List[str]:
+        path = Path(self.warmup_path)
+        if not path.exists():
+            return []
+        lines = path.read_text(encoding="utf-8").splitlines()
+        return [line.strip() for line in lines if line.strip()][: self.warmup_papers]
+
+    def _save(self) -> None:
+        # This process's most requested roots first, then the previous list. With several
+        # workers the last one to stop writes the file.
+        ranked = [identifier for identifier, _ in self.requested.most_common()]
+        identifiers = list(dict.fromkeys([*ranked, *self._load()]))[: self.warmup_papers]
+        if not identifiers:
+            return
+        path = Path(self.warmup_path)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partial = path.with_suffix(path.suffix + ".tmp")
+            partial.write_text("\n".join(identifiers) + "\n", encoding="utf-8")
+            os.replace(partial, path)
+        except OSError as exc:
+            logger.warning("Could not save the prefetch warm-up list: %s", exc)
+
+    def stats(self) -> Dict[str, Any]:
+        observed = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "jobs": self.jobs,
+            "running": len(self._tasks),
+            "warmed_nodes": self.warmed,
+            "cancelled": self.cancelled,
+            "skipped_no_headroom": self.skipped,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / observed, 4) if observed else None,
+            "warmup": self.warmup,
+        }
@@ -0,0 +1,132 @@
+import itertools
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from .config import get_settings
+from .models import PaperMetadata
+from .relevance import STOPWORDS, tokenize
+
+# Search terms per source. Semantic Scholar ranks by relevance, so a few terms sharpen the
+# match; arXiv ANDs every term, and beyond two the result is usually empty.
+SEARCH_TERMS = 4
+ARXIV_TERMS = 2
+# Where a word occurs weighs in its score: explicit keywords over the title over the abstract.
+FIELD_WEIGHTS = (("keywords", 3.0), ("title", 2.0), ("abstract", 1.0))
+MIN_TERM_LENGTH = 3
+EMPTY_MEMORY = 4096
+# Short queries look up each subset of their terms; longer ones scan the remembered entries.
+SUBSET_TERMS = 4
+UNTITLED = "untitled"
+
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9\-]*|[^\sa-z0-9\-]")
+
+
+def _phrases(text: str) -> List[List[str]]:
+    # RAKE candidates: runs of content words, split at stopwords and punctuation.
+    phrases: List[List[str]] = []
+    current: List[str] = []
+    for token in WORD_RE.findall(text.lower()):
+        if len(token) >= MIN_TERM_LENGTH and token not in STOPWORDS and not token.isdigit():
+            current.append(token)
+        elif current:
+            phrases.append(current)
+            current = []
+    if current:
+        phrases.append(current)
+    return phrases
+
+
+def ranked_terms(meta: PaperMetadata) -> List[str]:
+    # RAKE-style word scores: degree over frequency (words of longer phrases are more
+    # specific), times the field-weighted frequency. Ties go to longer words, a cheap proxy
+    # for rarity, then alphabetical, so the same paper always yields the same terms.
+    fields = {
+        "keywords": " , ".join(meta.keywords),
+        "title": meta.title if (meta.title or "").lower() != UNTITLED else "",
+        "abstract": meta.abstract or "",
+    }
+    degree: Counter = Counter()
+    frequency: Counter = Counter()
+    weighted: Dict[str, float] = {}
+    for name, weight in FIELD_WEIGHTS:
+        for phrase in _phrases(fields[name]):
+            for word in phrase:
+                degree[word] += len(phrase)
+                frequency[word] += 1
+                weighted[word] = weighted.get(word, 0.0) + weight
+    scores = {word: weighted[word] * degree[word] / frequency[word] for word in weighted}
+    return sorted(scores, key=lambda word: (-scores[word], -len(word), word))
+
+
+def canonical_terms(keywords: Iterable[str]) -> List[str]:
+    # One query form per set of words: lowercased, split, deduplicated and sorted, so
+    # near-identical queries share a cache key and coalesce.
+    return sorted({word for keyword in keywords for word in keyword.lower().split()})
+
+
+def title_query(title: Optional[str]) -> str:
+    # Content words of a title in their order. OpenAlex search ignores case, punctuation and
+    # stopwords, so they should not give the same search a cache key of its own.
+    if not title or title.lower() == UNTITLED:
+        return ""
+    return " ".join(tokenize(title))
+
+
+class EmptyQueries:
+    # AND queries that came back empty. Adding terms to an AND query can only narrow it, so
+    # a query containing all the terms of a remembered empty one is predicted empty and not
+    # sent. Entries expire with the negative cache TTL, as new papers may match later.
+    def __init__(self, max_entries: int = EMPTY_MEMORY, ttl: Optional[float] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[FrozenSet[str], float]" = OrderedDict()
+        self.recorded = 0
+        self.skipped = 0
+
+    def _ttl(self) -> float:
+        return self.ttl if self.ttl is not None else get_settings().cache_negative_ttl
+
+    def predicts_empty(self, terms: Sequence[str]) -> bool:
+        query = frozenset(terms)
+        if len(query) <= SUBSET_TERMS:
+            keys: Iterable[FrozenSet[str]] = (
+                frozenset(subset)
+                for size in range(1, len(query) + 1)
+                for subset in itertools.combinations(query, size)
+            )
+        else:
+            keys = [key for key in self._entries if key <= query]
+        now = time.monotonic()
+        for key in keys:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                continue
+            if expires_at <= now:
+                del self._entries[key]
+                continue
+            self.skipped += 1
+            return True
+        return False
+
+    def record(self, terms: Sequence[str]) -> None:
+        key = frozenset(terms)
+        self._entries[key] = time.monotonic() + self._ttl()
+        self._entries.move_to_end(key)
+        self.recorded += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "recorded": self.recorded, "skipped": self.skipped}
+
+
+def query_terms(meta: PaperMetadata) -> Tuple[List[str], List[str]]:
+    # (Semantic Scholar terms, arXiv terms), each in canonical order.
+    ranked = ranked_terms(meta)
+    return sorted(ranked[:SEARCH_TERMS]), sorted(ranked[:ARXIV_TERMS])
+
+
+# Shared by every request in the process, like the response cache.
+EMPTY_ARXIV = EmptyQueries()
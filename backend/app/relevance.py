@@ -0,0 +1,122 @@
+import math
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .models import EdgeType, PaperMetadata
+
+# Hashed term space; crc32 keeps feature ids stable across processes (unlike hash()).
+DIM = 1 << 18
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9\-]+")
+STOPWORDS = frozenset(
+    """
+    a about above after again against all also an and any are as at be because been before
+    being between both but by can could did do does doing during each few for from further had
+    has have having here how however i if in into is it its itself just more most much must
+    new no nor not of off on once only or other our out over own same should so some such
+    than that the their them then there these they this those through to too under until up
+    use used using very via was we were what when where which while who whom why will with
+    within without would you your paper study approach based results show towards
+    """.split()
+)
+
+EDGE_WEIGHTS: Dict[EdgeType, float] = {
+    EdgeType.citation: 1.0,
+    EdgeType.semantic: 0.8,
+    EdgeType.keyword: 0.75,
+    EdgeType.author: 0.6,
+}
+# Small floor so an off-topic citation still outranks nothing, and a per-level decay so the
+# search doesn't dive to max_depth along a single thread.
+BASE_SIMILARITY = 0.1
+DEPTH_DECAY = 0.85
+MENTION_BONUS = 0.15
+# Chat context ranking: the question matters more than the paper it is asked about.
+QUESTION_WEIGHT = 0.7
+
+
+def tokenize(text: str) -> List[str]:
+    return [tok for tok in TOKEN_RE.findall(text.lower()) if tok not in STOPWORDS]
+
+
+def document(meta: PaperMetadata) -> str:
+    return " ".join([meta.title or "", meta.abstract or "", " ".join(meta.keywords)])
+
+
+def term_features(text: str) -> Dict[int, float]:
+    features: Dict[int, float] = {}
+    for token, count in Counter(tokenize(text)).items():
+        index = zlib.crc32(token.encode()) & (DIM - 1)
+        features[index] = features.get(index, 0.0) + 1.0 + math.log(count)
+    return features
+
+
+def unit_vector(text: str) -> np.ndarray:
+    vector = np.zeros(DIM, dtype=np.float32)
+    features = term_features(text)
+    if features:
+        indices = np.fromiter(features.keys(), dtype=np.int64, count=len(features))
+        values = np.fromiter(features.values(), dtype=np.float32, count=len(features))
+        vector[indices] = values / np.linalg.norm(values)
+    return vector
+
+
+class RelevanceScorer:
+    def __init__(
+        self,
+        root: PaperMetadata,
+        question: Optional[str] = None,
+        more_roots: Sequence[PaperMetadata] = (),
+    ) -> None:
+        self.root = unit_vector(document(root))
+        if more_roots:
+            # Several roots: score against their centroid, each root counting equally.
+            for other in more_roots:
+                self.root += unit_vector(document(other))
+            norm = np.linalg.norm(self.root)
+            if norm > 0:
+                self.root /= norm
+        if question:
+            blended = QUESTION_WEIGHT * unit_vector(question) + (1 - QUESTION_WEIGHT) * self.root
+            norm = np.linalg.norm(blended)
+            if norm > 0:
+                self.root = blended / norm
+
+    def similarity(self, candidates: Sequence[PaperMetadata]) -> np.ndarray:
+        # Cosine similarity for a whole batch at once: candidate vectors stay as flat
+        # (row, column, value) triples and are reduced with bincount, never densified.
+        rows: List[int] = []
+        cols: List[int] = []
+        vals: List[float] = []
+        for row, meta in enumerate(candidates):
+            features = term_features(document(meta))
+            rows.extend([row] * len(features))
+            cols.extend(features.keys())
+            vals.extend(features.values())
+        n = len(candidates)
+        if not rows:
+            return np.zeros(n, dtype=np.float32)
+        row_ids = np.asarray(rows, dtype=np.int64)
+        values = np.asarray(vals, dtype=np.float32)
+        dots = np.bincount(row_ids, weights=self.root[np.asarray(cols)] * values, minlength=n)
+        norms = np.sqrt(np.bincount(row_ids, weights=values * values, minlength=n))
+        return np.divide(dots, norms, out=np.zeros(n), where=norms > 0).astype(np.float32)
+
+    def score(
+        self,
+        candidates: Sequence[PaperMetadata],
+        edge_types: Sequence[EdgeType],
+        mentions: Sequence[int],
+        depths: Sequence[int],
+    ) -> np.ndarray:
+        # mentions: how many expanded nodes returned the candidate; a cheap co-citation signal.
+        similarity = self.similarity(candidates)
+        weights = np.fromiter((EDGE_WEIGHTS[e] for e in edge_types), dtype=np.float32)
+        mention_counts = np.asarray(mentions, dtype=np.float32)
+        decay = np.power(DEPTH_DECAY, np.asarray(depths, dtype=np.float32))
+        return (
+            weights * (BASE_SIMILARITY + similarity) + MENTION_BONUS * np.log(mention_counts)
+        ) * decay
@@ -0,0 +1,300 @@
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from .config import Settings, get_settings
+from .deadline import SharedLimits, remaining, shared_context
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class Priority:
+    # Background work (prefetching) may only spend rate budget foreground requests are not
+    # about to need. Mutable, so a shared call started in the background can be promoted when
+    # a foreground request joins it.
+    def __init__(self, background: bool) -> None:
+        self.background = background
+
+
+_priority: contextvars.ContextVar[Optional[Priority]] = contextvars.ContextVar(
+    "upstream_priority", default=None
+)
+
+
+def is_background() -> bool:
+    priority = _priority.get()
+    return priority is not None and priority.background
+
+
+def background_context() -> contextvars.Context:
+    # A fresh context, so nothing of the request that started the work (its trace, its
+    # deadline) carries over.
+    context = contextvars.Context()
+    context.run(_priority.set, Priority(True))
+    return context
+
+
+def flight_context(limits: SharedLimits) -> contextvars.Context:
+    # Where a shared upstream call runs: bound by the deadlines and call budgets of the callers
+    # waiting on `limits` rather than the starting caller's, with a priority of its own that
+    # stays background only while every waiter is.
+    context = shared_context(limits)
+    context.run(_priority.set, Priority(is_background()))
+    return context
+
+
+def promote(context: contextvars.Context) -> None:
+    # Called when a caller joins the shared call running in `context`.
+    priority = context.get(_priority)
+    if priority is not None and not is_background():
+        priority.background = False
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class ThrottledError(Exception):
+    pass
+
+
+def parse_retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _fits_deadline(delay: float) -> bool:
+    left = remaining()
+    return left is None or delay < left
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def available(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def reserve(self, max_wait: float, keep: float = 0.0) -> float:
+        # Tokens may go negative: each caller reserves its slot and sleeps until it is due.
+        # Callers passing `keep` never wait; they are refused unless that many tokens would
+        # remain for everyone else.
+        now = time.monotonic()
+        self.available()
+        if keep and (self.tokens - 1 < keep or self.blocked_until > now):
+            raise ThrottledError("rate budget is reserved for foreground requests")
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            raise ThrottledError(f"rate limit wait of {wait:.1f}s exceeds {max_wait:.1f}s")
+        self.tokens -= 1
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, cooldown: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN:
+            # Let a single probe through; everyone else keeps failing fast until it reports.
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> bool:
+        self.failures += 1
+        self._probing = False
+        if self.state != HALF_OPEN and self.failures < self.failure_threshold:
+            return False
+        tripped = self.state != OPEN
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        if tripped:
+            self.trips += 1
+        return tripped
+
+    def release(self) -> None:
+        # The call ended without a verdict (cancelled or throttled locally).
+        self._probing = False
+
+
+class SourcePolicy:
+    def __init__(self, name: str, rate: float, burst: int, settings: Settings) -> None:
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(settings.breaker_failure_threshold, settings.breaker_cooldown)
+        self.max_wait = settings.rate_limit_max_wait
+        # Share of the burst background requests must leave untouched.
+        self.background_keep = settings.prefetch_reserve * self.bucket.capacity
+        self.max_retries = settings.retry_attempts
+        self.backoff_base = settings.retry_backoff_base
+        self.backoff_max = settings.retry_backoff_max
+        self.retry_after_max = settings.retry_after_max
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.local_throttled = 0
+        self.rejected = 0
+
+    def has_headroom(self) -> bool:
+        # Whether a background request would be let through right now.
+        return (
+            self.breaker.state == CLOSED
+            and self.bucket.available() - 1 >= self.background_keep
+            and self.bucket.blocked_until <= time.monotonic()
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps retries from concurrent expansions from landing in lockstep.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    async def execute(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        healthy: Optional[bool] = None
+        try:
+            response = await self._send_with_retries(send)
+            healthy = response.status_code not in RETRYABLE_STATUS
+            return response
+        except httpx.TransportError:
+            healthy = False
+            raise
+        finally:
+            if healthy is None:
+                self.breaker.release()
+            elif healthy:
+                self.breaker.record_success()
+            elif self.breaker.record_failure():
+                logger.warning(
+                    "%s circuit opened after %s consecutive failures; cooling down for %ss",
+                    self.name,
+                    self.breaker.failures,
+                    self.breaker.cooldown,
+                )
+
+    async def _send_with_retries(
+        self, send: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        attempt = 0
+        while True:
+            max_wait = self.max_wait
+            if attempt:
+                # A retry waits out a pause the server asked for (capped at retry_after_max)
+                # on top of the usual wait, rather than failing as throttled.
+                max_wait += max(0.0, self.bucket.blocked_until - time.monotonic())
+            left = remaining()
+            if left is not None:
+                max_wait = min(max_wait, left)
+            try:
+                keep = self.background_keep if is_background() else 0.0
+                wait = self.bucket.reserve(max_wait, keep)
+            except ThrottledError:
+                self.local_throttled += 1
+                raise
+            if wait:
+                await asyncio.sleep(wait)
+            self.requests += 1
+            try:
+                response = await send()
+            except httpx.TransportError:
+                delay = self._backoff(attempt)
+                if attempt >= self.max_retries or not _fits_deadline(delay):
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    return response
+                retry_after = parse_retry_after(response)
+                if response.status_code == 429:
+                    self.throttled += 1
+                if retry_after:
+                    self.bucket.pause(min(retry_after, self.retry_after_max))
+                delay = max(retry_after or 0, self._backoff(attempt))
+                if (
+                    attempt >= self.max_retries
+                    or (retry_after or 0) > self.retry_after_max
+                    or not _fits_deadline(delay)
+                ):
+                    return response
+            self.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "trips": self.breaker.trips,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "local_throttled": self.local_throttled,
+            "rejected": self.rejected,
+        }
+
+
+def build_policies(settings: Optional[Settings] = None) -> Dict[str, SourcePolicy]:
+    settings = settings or get_settings()
+    budgets = {
+        "semantic_scholar": (settings.rate_semantic_scholar, settings.burst_semantic_scholar),
+        "semantic_scholar_keyed": (
+            settings.rate_semantic_scholar_keyed,
+            settings.burst_semantic_scholar_keyed,
+        ),
+        "openalex": (settings.rate_openalex, settings.burst_openalex),
+        "openalex_polite": (settings.rate_openalex_polite, settings.burst_openalex_polite),
+        "arxiv": (settings.rate_arxiv, settings.burst_arxiv),
+    }
+    return {
+        name: SourcePolicy(name, rate, burst, settings) for name, (rate, burst) in budgets.items()
+    }
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
+
+from .config import Settings, get_settings
+from .graph_store import GraphState
+from .models import GraphResponse, PaperMetadata
+
+logger = logging.getLogger(__name__)
+
+
+class GraphSession:
+    def __init__(self, root: PaperMetadata, more_roots: Sequence[PaperMetadata] = ()) -> None:
+        self.id = uuid.uuid4().hex
+        self.state = GraphState.from_roots([root, *more_roots])
+        # Expansions of one session run one at a time; they mutate the same state.
+        self.lock = asyncio.Lock()
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.size = self.state.approx_bytes()
+
+    def graph(self) -> GraphResponse:
+        return self.state.graph()
+
+
+class SessionStore:
+    # In-memory graph sessions with an idle TTL, evicted least recently used first once the
+    # estimated total size passes the memory cap. Sessions are per process, not shared between
+    # workers.
+    def __init__(self, settings: Optional[Settings] = None) -> None:
+        settings = settings or get_settings()
+        self.ttl = settings.session_ttl
+        self.max_sessions = settings.session_max_count
+        self.max_bytes = settings.session_max_bytes
+        self._sessions: "OrderedDict[str, GraphSession]" = OrderedDict()
+        self.size = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def create(
+        self, root: PaperMetadata, more_roots: Sequence[PaperMetadata] = ()
+    ) -> GraphSession:
+        self._purge()
+        session = GraphSession(root, more_roots)
+        self._sessions[session.id] = session
+        self.size += session.size
+        self._evict()
+        return session
+
+    def get(self, session_id: str) -> Optional[GraphSession]:
+        self._purge()
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self.size -= session.size
+        return True
+
+    def record(self, session: GraphSession) -> None:
+        # Called after an expansion so the memory cap reflects what the session now holds.
+        before = session.size
+        session.size = session.state.approx_bytes()
+        session.last_used = time.monotonic()
+        if session.id in self._sessions:
+            self.size += session.size - before
+            self._sessions.move_to_end(session.id)
+        self._evict()
+
+    def _purge(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used > cutoff:
+                break
+            self.delete(session.id)
+            self.expirations += 1
+
+    def _evict(self) -> None:
+        # The most recently used session is kept even if it alone exceeds the cap.
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self.size > self.max_bytes
+        ):
+            session_id = next(iter(self._sessions))
+            self.delete(session_id)
+            self.evictions += 1
+            logger.info("Evicted graph session %s to stay under the memory cap", session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "approx_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,430 @@
+import collections
+import contextvars
+import itertools
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Tracing and metrics without external dependencies. Every HTTP request gets a Trace; code on
+# the hot path opens spans with `span(...)`, which land in the current request's trace (if
+# any) and in a per-span-name latency histogram. Metrics render in the Prometheus text format.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+NODE_BUCKETS = (1, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, Any]) -> Labels:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self.values: Dict[Labels, float] = collections.defaultdict(float)
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        self.values[self._key(labels)] += amount
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.values[self._key(labels)] -= amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # Per label set: one count per bucket (non-cumulative), then sum and total count.
+        self.values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        counts = self.values.get(key)
+        if counts is None:
+            counts = self.values[key] = [0.0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        counts[-2] += value
+        counts[-1] += 1
+
+    def samples(self) -> Iterator[str]:
+        for key, counts in sorted(self.values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {_format_value(cumulative)}"
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {_format_value(counts[-1])}"
+            plain = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum{plain} {_format_value(counts[-2])}"
+            yield f"{self.name}_count{plain} {_format_value(counts[-1])}"
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Any:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_SECONDS = REGISTRY.register(
+    Histogram(
+        "spider_http_request_duration_seconds",
+        "API request latency, until the last body chunk is sent.",
+        ("method", "route", "status"),
+    )
+)
+HTTP_IN_FLIGHT = REGISTRY.register(
+    Gauge("spider_http_requests_in_flight", "API requests being handled.")
+)
+UPSTREAM_SECONDS = REGISTRY.register(
+    Histogram(
+        "spider_upstream_request_duration_seconds",
+        "Upstream call latency including rate-limit waits and retries; cache hits excluded.",
+        ("source", "endpoint"),
+    )
+)
+UPSTREAM_REQUESTS = REGISTRY.register(
+    Counter(
+        "spider_upstream_requests_total",
+        "Upstream lookups by outcome: an HTTP status, cache_hit, timeout, deadline, "
+        "throttled, circuit_open, budget, predicted_empty or error.",
+        ("source", "endpoint", "outcome"),
+    )
+)
+UPSTREAM_IN_FLIGHT = REGISTRY.register(
+    Gauge("spider_upstream_requests_in_flight", "Upstream calls in progress.", ("source",))
+)
+UPSTREAM_BYTES = REGISTRY.register(
+    Histogram(
+        "spider_upstream_response_bytes",
+        "Upstream response body sizes.",
+        ("source",),
+        buckets=BYTE_BUCKETS,
+    )
+)
+SPAN_SECONDS = REGISTRY.register(
+    Histogram("spider_span_duration_seconds", "Duration of traced stages.", ("span",))
+)
+EXPANSION_NODES = REGISTRY.register(
+    Histogram(
+        "spider_expansion_nodes",
+        "Nodes added per expansion.",
+        buckets=NODE_BUCKETS,
+    )
+)
+EXPANSIONS = REGISTRY.register(
+    Counter(
+        "spider_expansions_total",
+        "Finished expansions by truncation reason (none when complete).",
+        ("truncated",),
+    )
+)
+
+
+class Span:
+    __slots__ = ("id", "parent", "name", "start", "duration", "attrs")
+
+    def __init__(self, span_id: int, parent: Optional[int], name: str, attrs: Dict[str, Any]):
+        self.id = span_id
+        self.parent = parent
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attrs = attrs
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+class Trace:
+    def __init__(self, name: str, max_spans: int) -> None:
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.status: Optional[int] = None
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self.profile: Optional[str] = None
+        self._ids = itertools.count(1)
+
+    def open(self, name: str, parent: Optional[int], attrs: Dict[str, Any]) -> Span:
+        return Span(next(self._ids), parent, name, attrs)
+
+    def record(self, span: Span) -> None:
+        # Large expansions open thousands of spans; keep memory bounded per trace.
+        if len(self.spans) < self.max_spans:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+    def totals(self) -> Dict[str, Tuple[int, float]]:
+        totals: Dict[str, Tuple[int, float]] = {}
+        for span in self.spans:
+            count, seconds = totals.get(span.name, (0, 0.0))
+            totals[span.name] = (count + 1, seconds + (span.duration or 0.0))
+        return totals
+
+    def server_timing(self) -> str:
+        # Summed span time per stage. Concurrent spans overlap, so sums can exceed the total.
+        parts = [
+            f"{name};dur={seconds * 1000:.1f};desc=\"{count}x\""
+            for name, (count, seconds) in self.totals().items()
+        ]
+        return ", ".join(parts)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 2) if self.duration is not None else None,
+            "status": self.status,
+            "spans": len(self.spans),
+            "dropped_spans": self.dropped,
+            "profiled": self.profile is not None,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.summary(),
+            "stages": {
+                name: {"count": count, "total_ms": round(seconds * 1000, 2)}
+                for name, (count, seconds) in self.totals().items()
+            },
+            "span_list": [
+                {
+                    "id": span.id,
+                    "parent": span.parent,
+                    "name": span.name,
+                    "offset_ms": round((span.start - self.start) * 1000, 2),
+                    "duration_ms": (
+                        round(span.duration * 1000, 2) if span.duration is not None else None
+                    ),
+                    **span.attrs,
+                }
+                for span in self.spans
+            ],
+        }
+
+
+_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_parent: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    trace = _trace.get()
+    if trace is None:
+        current = Span(0, None, name, attrs)
+        token = None
+    else:
+        current = trace.open(name, _parent.get(), attrs)
+        token = _parent.set(current.id)
+    try:
+        yield current
+    except BaseException as exc:
+        current.attrs.setdefault("error", type(exc).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        if token is not None:
+            _parent.reset(token)
+            trace.record(current)
+        SPAN_SECONDS.observe(current.duration, span=name)
+
+
+class TraceStore:
+    # The most recent request traces, for /traces. Per process.
+    def __init__(self, size: int) -> None:
+        self._traces: Deque[Trace] = collections.deque(maxlen=max(1, size))
+        self._by_id: Dict[str, Trace] = {}
+
+    def add(self, trace: Trace) -> None:
+        if len(self._traces) == self._traces.maxlen:
+            self._by_id.pop(self._traces[0].id, None)
+        self._traces.append(trace)
+        self._by_id[trace.id] = trace
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        return self._by_id.get(trace_id)
+
+    def recent(self, limit: int) -> List[Trace]:
+        return list(self._traces)[-limit:][::-1]
+
+
+class SamplingProfiler:
+    # Samples the stack of one thread (the event loop's) from a background thread and counts
+    # collapsed stacks, the input format of flamegraph.pl and speedscope. Everything running
+    # on the loop is sampled, including other requests handled at the same time.
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: collections.Counter = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        self._thread.join()
+        lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        return "\n".join(lines) + "\n"
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                filename = code.co_filename.rsplit("/", 1)[-1]
+                names.append(f"{code.co_name} ({filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+
+class TelemetryMiddleware:
+    # Plain ASGI middleware (no BaseHTTPMiddleware task hop). Times each request until its last
+    # body chunk, so streamed responses are measured in full, and adds X-Trace-Id and
+    # Server-Timing headers. `?profile=1` runs the sampling profiler for that request when
+    # profiling is enabled.
+    def __init__(
+        self,
+        app: Any,
+        max_spans: int = 2000,
+        profiling_enabled: bool = False,
+        profile_interval: float = 0.005,
+    ) -> None:
+        self.app = app
+        self.max_spans = max_spans
+        self.profiling_enabled = profiling_enabled
+        self.profile_interval = profile_interval
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = Trace(f"{scope['method']} {scope['path']}", self.max_spans)
+        store: Optional[TraceStore] = getattr(scope["app"].state, "traces", None)
+        profiler: Optional[SamplingProfiler] = None
+        if self.profiling_enabled and b"profile=1" in scope.get("query_string", b""):
+            profiler = SamplingProfiler(threading.get_ident(), self.profile_interval)
+            profiler.start()
+        finished = False
+
+        def finish() -> None:
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            trace.duration = time.perf_counter() - trace.start
+            route = scope.get("route")
+            HTTP_SECONDS.observe(
+                trace.duration,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=trace.status or 500,
+            )
+            HTTP_IN_FLIGHT.dec()
+            if profiler is not None:
+                trace.profile = profiler.stop()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", trace.id.encode()))
+                timing = trace.server_timing()
+                if timing:
+                    headers.append((b"server-timing", timing.encode()))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                finish()
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        if store is not None:
+            store.add(trace)
+        token = _trace.set(trace)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            finish()
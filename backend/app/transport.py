@@ -0,0 +1,99 @@
+import asyncio
+import importlib.util
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from .cassette import CassetteTransport
+from .config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class HostTransport(httpx.AsyncBaseTransport):
+    # One host's share of an injected transport. The pool's connection cap is applied as a cap
+    # on requests in flight to the host, held until the response starts, so pool limits shape
+    # traffic to the simulator or a cassette as they would on the network.
+    def __init__(self, inner: httpx.AsyncBaseTransport, max_connections: Optional[int]) -> None:
+        self.inner = inner
+        self._slots = asyncio.Semaphore(max_connections) if max_connections else None
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._slots is None:
+            return await self.inner.handle_async_request(request)
+        async with self._slots:
+            return await self.inner.handle_async_request(request)
+
+    # aclose() is inherited as a no-op: the inner transport is shared by every host.
+
+
+# One app-lifetime httpx.AsyncClient per upstream host, so calls reuse warm connections.
+class HttpPool:
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        settings = settings or get_settings()
+        self.timeout = settings.request_timeout
+        self.limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        )
+        self.http2 = settings.http2_enabled and HTTP2_AVAILABLE
+        if settings.http2_enabled and not HTTP2_AVAILABLE:
+            logger.info("HTTP/2 requested but the 'h2' package is missing; using HTTP/1.1.")
+        # Replaces the network for every client, e.g. with the upstream simulator in benchmarks.
+        if transport is None and settings.cassette_mode != "off":
+            transport = CassetteTransport.from_settings(settings, self.limits, self.http2)
+        elif transport is not None:
+            logger.info(
+                "Injected transport: HTTP_MAX_CONNECTIONS applies per host as a request cap; "
+                "keep-alive and HTTP/2 settings do not apply."
+            )
+        self.transport = transport
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                # HTTP/2 is negotiated via ALPN, so plain-http hosts stay on HTTP/1.1.
+                http2=self.http2,
+                transport=(
+                    HostTransport(self.transport, self.limits.max_connections)
+                    if self.transport is not None
+                    else None
+                ),
+            )
+            self._clients[key] = client
+        return client
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+        if isinstance(self.transport, CassetteTransport):
+            await self.transport.shutdown()
+
+
+@asynccontextmanager
+async def session(
+    pool: Optional[HttpPool], url: str, timeout: float
+) -> AsyncIterator[httpx.AsyncClient]:
+    # Callers without an injected pool (scripts, ad-hoc use) fall back to a one-off client.
+    if pool is not None:
+        yield pool.client(url)
+        return
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        yield client
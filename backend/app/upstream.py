@@ -0,0 +1,407 @@
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import orjson
+
+from .cache import EMPTY, ERROR, OK, ResponseCache
+from .cassette import CassetteTransport
+from .coalesce import SingleFlight
+from .config import Settings, get_settings
+from .deadline import (
+    BudgetExhausted,
+    DeadlineExceeded,
+    SharedLimits,
+    charge_call,
+    check_budget,
+    clamp_timeout,
+    remaining,
+    shared_limits,
+)
+from .resilience import (
+    CircuitOpenError,
+    SourcePolicy,
+    ThrottledError,
+    build_policies,
+    flight_context,
+    promote,
+)
+from .telemetry import (
+    UPSTREAM_BYTES,
+    UPSTREAM_IN_FLIGHT,
+    UPSTREAM_REQUESTS,
+    UPSTREAM_SECONDS,
+    span,
+)
+from .transport import HttpPool, session
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that identify the caller rather than the query; excluded from cache keys.
+IDENTITY_PARAMS = {"mailto"}
+
+
+# Outcome labels for calls refused locally, before or between attempts.
+FAST_FAIL_OUTCOMES = {
+    CircuitOpenError: "circuit_open",
+    ThrottledError: "throttled",
+    DeadlineExceeded: "deadline",
+    BudgetExhausted: "budget",
+}
+
+
+class UpstreamError(Exception):
+    pass
+
+
+def parse_json(response: httpx.Response) -> Any:
+    return orjson.loads(response.content)
+
+
+def parse_text(response: httpx.Response) -> Any:
+    return response.text
+
+
+def request_key(
+    source: str,
+    endpoint: str,
+    url: str,
+    params: Optional[Dict[str, Any]],
+    body: Any = None,
+) -> str:
+    items = sorted(
+        (str(k), str(v)) for k, v in (params or {}).items() if k not in IDENTITY_PARAMS
+    )
+    key = f"{source}:{endpoint}:{url}?{json.dumps(items, separators=(',', ':'))}"
+    if body is not None:
+        key += f"#{json.dumps(body, sort_keys=True, separators=(',', ':'))}"
+    return key
+
+
+# Single funnel for upstream requests made by the clients, so caching, request coalescing, rate
+# limiting, retries and circuit breaking apply uniformly to every source.
+class Upstream:
+    def __init__(
+        self,
+        pool: Optional[HttpPool] = None,
+        cache: Optional[ResponseCache] = None,
+        flight: Optional[SingleFlight] = None,
+        policies: Optional[Dict[str, SourcePolicy]] = None,
+        offload_bytes: Optional[int] = None,
+    ) -> None:
+        self.pool = pool
+        self.cache = cache
+        self.flight = flight
+        self.policies = policies or {}
+        # Bodies at least this large are decoded in a worker thread; None decodes inline.
+        self.offload_bytes = offload_bytes
+        self.offloaded = 0
+
+    @classmethod
+    def from_settings(cls, settings: Optional[Settings] = None) -> "Upstream":
+        settings = settings or get_settings()
+        cache = ResponseCache(settings) if settings.cache_enabled else None
+        flight = SingleFlight() if settings.coalesce_enabled else None
+        return cls(
+            pool=HttpPool(settings),
+            cache=cache,
+            flight=flight,
+            policies=build_policies(settings),
+            offload_bytes=settings.decode_offload_bytes or None,
+        )
+
+    async def get(
+        self,
+        source: str,
+        endpoint: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 15,
+        parse: Callable[[httpx.Response], Any] = parse_json,
+        is_empty: Optional[Callable[[Any], bool]] = None,
+        budget: Optional[str] = None,
+    ) -> Any:
+        return await self.request(
+            "GET",
+            source,
+            endpoint,
+            url,
+            params=params,
+            headers=headers,
+            timeout=timeout,
+            parse=parse,
+            is_empty=is_empty,
+            budget=budget,
+        )
+
+    async def post(
+        self,
+        source: str,
+        endpoint: str,
+        url: str,
+        *,
+        json_body: Any,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 15,
+        parse: Callable[[httpx.Response], Any] = parse_json,
+        is_empty: Optional[Callable[[Any], bool]] = None,
+        budget: Optional[str] = None,
+        cache: bool = True,
+    ) -> Any:
+        # POSTs here are read-only lookups (batch endpoints), so they are cached and coalesced
+        # like GETs, keyed on the body as well.
+        return await self.request(
+            "POST",
+            source,
+            endpoint,
+            url,
+            params=params,
+            json_body=json_body,
+            headers=headers,
+            timeout=timeout,
+            parse=parse,
+            is_empty=is_empty,
+            budget=budget,
+            cache=cache,
+        )
+
+    async def request(
+        self,
+        method: str,
+        source: str,
+        endpoint: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json_body: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 15,
+        parse: Callable[[httpx.Response], Any] = parse_json,
+        is_empty: Optional[Callable[[Any], bool]] = None,
+        budget: Optional[str] = None,
+        cache: bool = True,
+    ) -> Any:
+        key = request_key(source, endpoint, url, params, json_body)
+        use_cache = cache and self.cache is not None
+        with span("upstream", source=source, endpoint=endpoint) as current:
+            if use_cache:
+                cached = await self.cache.get(key)
+                if cached is not None:
+                    current.set(cache="hit")
+                    UPSTREAM_REQUESTS.inc(source=source, endpoint=endpoint, outcome="cache_hit")
+                    kind, payload = cached
+                    if kind == ERROR:
+                        raise UpstreamError(f"{payload} (cached)")
+                    return payload
+
+            async def fetch() -> Any:
+                return await self._fetch(
+                    key,
+                    method,
+                    source,
+                    endpoint,
+                    url,
+                    params,
+                    json_body,
+                    headers,
+                    timeout,
+                    parse,
+                    is_empty,
+                    budget or source,
+                    use_cache,
+                )
+
+            joining = self.flight is not None and self.flight.joining(key)
+            if joining:
+                current.set(coalesced=True)
+            else:
+                # Joining a flight is free; otherwise fail fast once the budget is spent. The
+                # charge itself is made per attempt sent, in _fetch.
+                try:
+                    check_budget()
+                except BudgetExhausted:
+                    UPSTREAM_REQUESTS.inc(source=source, endpoint=endpoint, outcome="budget")
+                    raise
+            if self.flight is None:
+                return await fetch()
+            return await self._join(key, fetch, source, endpoint)
+
+    async def _join(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        source: str,
+        endpoint: str,
+    ) -> Any:
+        # A shared call runs until the latest deadline among the callers waiting on it, and
+        # charges their budgets; each caller waits at most until its own deadline, and the call
+        # is cancelled once no caller is left.
+        left = remaining()
+        if left is not None and left <= 0:
+            UPSTREAM_REQUESTS.inc(source=source, endpoint=endpoint, outcome="deadline")
+            raise DeadlineExceeded("request deadline reached")
+
+        async def wait() -> Any:
+            # Runs as its own task under wait_for, in a copy of the caller's context; the flight
+            # is looked up here so that joining and run() happen without a yield in between.
+            running = self.flight.context(key)
+            if running is None:
+                limits = SharedLimits()
+                context: Optional[contextvars.Context] = flight_context(limits)
+            else:
+                limits, context = shared_limits(running), None
+                promote(running)
+            token = limits.join() if limits is not None else None
+            try:
+                return await self.flight.run(key, fetch, context)
+            finally:
+                if token is not None:
+                    limits.leave(token)
+
+        try:
+            return await asyncio.wait_for(wait(), left)
+        except asyncio.TimeoutError:
+            UPSTREAM_REQUESTS.inc(source=source, endpoint=endpoint, outcome="deadline")
+            raise DeadlineExceeded("request deadline reached") from None
+
+    async def cached_many(
+        self,
+        source: str,
+        endpoint: str,
+        urls: List[str],
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        # Cache-only lookup of successful GET responses, by url. Misses and cached failures are
+        # left out.
+        if self.cache is None:
+            return {}
+        keys = {url: request_key(source, endpoint, url, params) for url in urls}
+        found = await self.cache.get_many(list(keys.values()))
+        return {
+            url: entry[1]
+            for url, key in keys.items()
+            if (entry := found.get(key)) is not None and entry[0] != ERROR
+        }
+
+    async def store(
+        self,
+        source: str,
+        endpoint: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        payload: Any,
+        empty: bool = False,
+    ) -> None:
+        # Seeds the entry a GET would have produced, e.g. from one item of a batch response.
+        if self.cache is not None:
+            key = request_key(source, endpoint, url, params)
+            await self.cache.set(key, source, EMPTY if empty else OK, payload)
+
+    async def _fetch(
+        self,
+        key: str,
+        method: str,
+        source: str,
+        endpoint: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        json_body: Any,
+        headers: Optional[Dict[str, str]],
+        timeout: float,
+        parse: Callable[[httpx.Response], Any],
+        is_empty: Optional[Callable[[Any], bool]],
+        budget: str,
+        use_cache: bool,
+    ) -> Any:
+        policy = self.policies.get(budget)
+        outcome = "error"
+        UPSTREAM_IN_FLIGHT.inc(source=source)
+        started = time.perf_counter()
+        try:
+            with span("http", source=source, endpoint=endpoint) as current:
+                async with session(self.pool, url, timeout) as client:
+
+                    async def send() -> httpx.Response:
+                        # Per-attempt timeouts shrink to fit the remaining deadline, and every
+                        # attempt sent is charged to the call budget.
+                        effective = clamp_timeout(timeout)
+                        charge_call()
+                        try:
+                            return await client.request(
+                                method,
+                                url,
+                                params=params,
+                                json=json_body,
+                                headers=headers,
+                                timeout=effective,
+                            )
+                        except httpx.TimeoutException as exc:
+                            if effective < timeout:
+                                raise DeadlineExceeded("request deadline reached") from exc
+                            raise
+
+                    response = await (policy.execute(send) if policy is not None else send())
+                    outcome = str(response.status_code)
+                    current.set(status=response.status_code, bytes=len(response.content))
+                    UPSTREAM_BYTES.observe(len(response.content), source=source)
+                    response.raise_for_status()
+                payload = await self._decode(parse, response)
+        except (CircuitOpenError, ThrottledError, DeadlineExceeded, BudgetExhausted) as exc:
+            # Local fail-fast decisions; nothing was learned about the upstream itself.
+            outcome = FAST_FAIL_OUTCOMES[type(exc)]
+            raise
+        except Exception as exc:
+            if isinstance(exc, httpx.TimeoutException):
+                outcome = "timeout"
+            if use_cache:
+                await self.cache.set(key, source, ERROR, str(exc) or type(exc).__name__)
+            raise
+        finally:
+            UPSTREAM_IN_FLIGHT.dec(source=source)
+            UPSTREAM_SECONDS.observe(
+                time.perf_counter() - started, source=source, endpoint=endpoint
+            )
+            UPSTREAM_REQUESTS.inc(source=source, endpoint=endpoint, outcome=outcome)
+        if use_cache:
+            kind = EMPTY if is_empty is not None and is_empty(payload) else OK
+            await self.cache.set(key, source, kind, payload)
+        return payload
+
+    async def _decode(
+        self, parse: Callable[[httpx.Response], Any], response: httpx.Response
+    ) -> Any:
+        # Large bodies are parsed in a worker thread. Parsers that work in chunks (the arXiv
+        # feed) let the loop run between chunks; a single orjson call still holds the GIL
+        # until it returns, which is why JSON sources ask only for the fields they read.
+        size = len(response.content)
+        if self.offload_bytes is None or size < self.offload_bytes:
+            return parse(response)
+        self.offloaded += 1
+        with span("decode", bytes=size):
+            return await asyncio.to_thread(parse, response)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "decode_offloaded": self.offloaded,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "coalescing": self.flight.stats() if self.flight is not None else None,
+            "sources": {name: policy.stats() for name, policy in self.policies.items()},
+            "cassette": (
+                self.pool.transport.stats()
+                if self.pool is not None and isinstance(self.pool.transport, CassetteTransport)
+                else None
+            ),
+        }
+
+    async def aclose(self) -> None:
+        if self.pool is not None:
+            await self.pool.aclose()
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,107 @@
+"""Memory per node and build time of the compact graph store vs. pydantic models.
+
+"compact" includes the identity index every GraphState builds for deduplication; the
+"identity" row shows that index alone.
+
+Run from the repo root:  python -m backend.benchmarks.large_graph [sizes...]
+"""
+import random
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+from backend.app.graph_store import GraphState
+from backend.app.identity import IdentityIndex
+from backend.app.models import EdgeType, GraphEdge, GraphNode, PaperMetadata
+
+EDGES_PER_NODE = 4
+WORDS = [f"term{i}" for i in range(2000)]
+AUTHORS = [f"Author {i}" for i in range(5000)]
+
+
+def synthetic_papers(count: int, seed: int = 7) -> List[PaperMetadata]:
+    rnd = random.Random(seed)
+    papers = []
+    for i in range(count):
+        papers.append(
+            PaperMetadata(
+                id=f"paper-{i:06d}",
+                title=" ".join(rnd.choices(WORDS, k=9)) + f" {i}",
+                abstract=" ".join(rnd.choices(WORDS, k=150)),
+                authors=rnd.choices(AUTHORS, k=4),
+                year=rnd.randint(1990, 2024),
+                source="semantic_scholar",
+                external_ids={"doi": f"10.1000/{i}", "semantic_scholar": f"paper-{i:06d}"},
+            )
+        )
+    return papers
+
+
+def edge_list(count: int, seed: int = 11) -> List[tuple]:
+    rnd = random.Random(seed)
+    types = list(EdgeType)
+    # Roughly a fifth of discovered edges repeat one already seen, as in real expansions.
+    edges = [
+        (rnd.randrange(count), rnd.randrange(count), rnd.choice(types))
+        for _ in range(count * EDGES_PER_NODE)
+    ]
+    return edges + rnd.sample(edges, len(edges) // 5)
+
+
+def build_compact(papers: List[PaperMetadata], edges: List[tuple]) -> GraphState:
+    state = GraphState(papers[0])
+    for meta in papers[1:]:
+        state.add(meta)
+    ids = state.ids
+    for src, dst, edge_type in edges:
+        state.link(ids[src], ids[dst], edge_type)
+    return state
+
+
+def build_identity(papers: List[PaperMetadata], edges: List[tuple]) -> IdentityIndex:
+    # The dedup index alone; GraphState builds one as part of build_compact.
+    index = IdentityIndex()
+    for meta in papers:
+        index.add(meta.id, meta)
+    return index
+
+
+def build_models(papers: List[PaperMetadata], edges: List[tuple]) -> Dict[str, object]:
+    # The previous representation: a GraphNode per paper and a GraphEdge per discovered edge.
+    nodes = {m.id: GraphNode(**{**m.model_dump(), "id": m.id}) for m in papers}
+    ids = [m.id for m in papers]
+    edge_models = [GraphEdge(source=ids[s], target=ids[d], type=t) for s, d, t in edges]
+    return {"nodes": nodes, "edges": edge_models}
+
+
+def measure(label: str, build, *args):
+    # Timed untraced; memory from a second, traced build (tracemalloc slows allocation down).
+    started = time.perf_counter()
+    result = build(*args)
+    elapsed = time.perf_counter() - started
+    del result
+    tracemalloc.start()
+    result = build(*args)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(args[0])
+    print(f"  {label:<9} {elapsed * 1000:9.1f} ms  {current / count:9.0f} B/node")
+    return result
+
+
+def main(sizes: List[int]) -> None:
+    for size in sizes:
+        papers = synthetic_papers(size)
+        edges = edge_list(size)
+        print(f"{size} nodes, {len(edges)} discovered edges")
+        # Metadata strings are shared with the source PaperMetadata in every variant, so the
+        # figures are the graph's own overhead on top of the parsed upstream responses.
+        measure("pydantic", build_models, papers, edges)
+        state = measure("compact", build_compact, papers, edges)
+        measure("identity", build_identity, papers, edges)
+        print(f"  compact graph: {state.edge_count} unique edges, {state.stats().model_dump()}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 5000, 20000])
@@ -0,0 +1,226 @@
+"""End-to-end load test against the simulated upstreams.
+
+Runs the FastAPI app in-process (lifespan included) with every upstream call answered by
+``UpstreamSimulator``, drives the chosen endpoints at a fixed concurrency, and reports
+throughput, latency percentiles, status codes and upstream call counts. Run from the repo root:
+
+    python -m backend.benchmarks.load_test --requests 200 --concurrency 16
+    python -m backend.benchmarks.load_test --endpoints expand-graph --error-rate 0.05 \
+        --throttle-rate 0.1
+
+Settings come from the environment as usual (e.g. CACHE_ENABLED=false to measure cold
+upstream traffic); --no-rate-limits lifts the per-source token buckets so the run measures
+the engine rather than the configured politeness.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from backend.benchmarks.simulator import (
+    ANTHROPIC_HOST,
+    ARXIV_HOST,
+    OPENALEX_HOST,
+    S2_HOST,
+    SimulatorConfig,
+    UpstreamSimulator,
+)
+
+ENDPOINTS = ("analyze-input", "expand-graph", "claude-chat")
+RATE_LIMIT_SOURCES = (
+    "SEMANTIC_SCHOLAR",
+    "SEMANTIC_SCHOLAR_KEYED",
+    "OPENALEX",
+    "OPENALEX_POLITE",
+    "ARXIV",
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-nodes", type=int, default=30)
+    parser.add_argument("--max-depth", type=int, default=2)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplies all medians")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--universe", type=int, default=20000, help="synthetic corpus size")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--no-rate-limits", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args()
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    # Must run before the app is imported: settings are read once and cached.
+    # Any key works; the simulator answers the Messages API and never checks it.
+    os.environ.setdefault("ANTHROPIC_API_KEY", "simulated")
+    os.environ["MAX_GRAPH_NODES"] = str(args.max_nodes)
+    if args.no_rate_limits:
+        for source in RATE_LIMIT_SOURCES:
+            os.environ[f"RATE_{source}"] = "100000"
+            os.environ[f"BURST_{source}"] = "100000"
+
+
+def simulator_config(args: argparse.Namespace) -> SimulatorConfig:
+    config = SimulatorConfig(universe=args.universe, seed=args.seed)
+    for profile in config.hosts.values():
+        profile.median_ms *= args.latency_scale
+        profile.error_rate = args.error_rate
+        profile.throttle_rate = args.throttle_rate
+    return config
+
+
+def request_factory(
+    endpoint: str, simulator: UpstreamSimulator, args: argparse.Namespace
+) -> Callable[[int], Tuple[str, Dict[str, Any]]]:
+    corpus = simulator.corpus
+    rng = random.Random(args.seed)
+    # Request i always targets the same paper, so runs are comparable between builds.
+    papers = [rng.randrange(corpus.universe) for _ in range(args.requests)]
+
+    def root(n: int) -> Dict[str, Any]:
+        return {
+            "id": corpus.s2_id(n),
+            "title": corpus.title(n),
+            "abstract": corpus.abstract(n),
+            "authors": corpus.authors(n),
+            "year": corpus.year(n),
+            "source": "semantic_scholar",
+            "external_ids": {"doi": corpus.doi(n), "semantic_scholar": corpus.s2_id(n)},
+        }
+
+    def analyze(i: int) -> Tuple[str, Dict[str, Any]]:
+        if i % 2:
+            return "/analyze-input", {"input_text": f"https://doi.org/{corpus.doi(papers[i])}"}
+        return "/analyze-input", {"input_text": f"A research plan about {corpus.title(papers[i])}"}
+
+    def expand(i: int) -> Tuple[str, Dict[str, Any]]:
+        return "/expand-graph", {
+            "root_metadata": root(papers[i]),
+            "max_nodes": args.max_nodes,
+            "max_depth": args.max_depth,
+        }
+
+    def chat(i: int) -> Tuple[str, Dict[str, Any]]:
+        n = papers[i]
+        return "/claude-chat", {
+            "paper_metadata": root(n),
+            "related_papers": [root(m) for m in corpus.citations(n)[:5]],
+            "message": "How does this paper relate to its citations?",
+        }
+
+    return {"analyze-input": analyze, "expand-graph": expand, "claude-chat": chat}[endpoint]
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "p99_ms": round(float(p99), 1),
+        "max_ms": round(float(values.max()), 1),
+    }
+
+
+async def drive(client: Any, make: Callable, total: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    async def worker() -> None:
+        while not queue.empty():
+            path, body = make(queue.get_nowait())
+            started = time.perf_counter()
+            response = await client.post(path, json=body)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 2),
+        **percentiles(latencies),
+        "statuses": dict(statuses),
+    }
+
+
+def upstream_calls(before: Counter, simulator: UpstreamSimulator) -> Dict[str, int]:
+    grouped: Dict[str, int] = defaultdict(int)
+    names = {S2_HOST: "semantic_scholar", OPENALEX_HOST: "openalex", ARXIV_HOST: "arxiv"}
+    names[ANTHROPIC_HOST] = "anthropic"
+    for (host, endpoint), count in (simulator.calls - before).items():
+        grouped[f"{names.get(host, host)}.{endpoint}"] += count
+    return dict(sorted(grouped.items()))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    from backend.app.config import get_settings
+    from backend.app.main import app
+    from backend.app.transport import HttpPool
+
+    simulator = UpstreamSimulator(simulator_config(args))
+    report: Dict[str, Any] = {"endpoints": {}}
+    async with app.router.lifespan_context(app):
+        upstream = app.state.upstream
+        await upstream.pool.aclose()
+        upstream.pool = HttpPool(get_settings(), transport=simulator)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://loadtest", timeout=None
+        ) as client:
+            for endpoint in args.endpoints:
+                before = Counter(simulator.calls)
+                make = request_factory(endpoint, simulator, args)
+                result = await drive(client, make, args.requests, args.concurrency)
+                result["upstream_calls"] = upstream_calls(before, simulator)
+                result["upstream_calls_per_request"] = round(
+                    sum(result["upstream_calls"].values()) / args.requests, 2
+                )
+                report["endpoints"][endpoint] = result
+        report["upstream"] = upstream.stats()
+    report["simulator"] = simulator.stats()
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    for endpoint, result in report["endpoints"].items():
+        print(
+            f"{endpoint:<14} {result['requests']:>5} req  {result['throughput_rps']:>8.2f} req/s  "
+            f"p50 {result['p50_ms']:>8.1f} ms  p95 {result['p95_ms']:>8.1f} ms  "
+            f"p99 {result['p99_ms']:>8.1f} ms  statuses {result['statuses']}"
+        )
+        print(f"{'':<14} upstream calls/request {result['upstream_calls_per_request']}")
+        for name, count in result["upstream_calls"].items():
+            print(f"{'':<16}{name:<32} {count:>7}")
+    print(f"simulated statuses: {report['simulator']['statuses']}")
+
+
+def main() -> None:
+    args = parse_args()
+    configure_environment(args)
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Payload size and encode time of /expand-graph response formats.
+
+Compares the default pydantic JSON response with the columnar JSON and MessagePack formats,
+raw and compressed. Run from the repo root:
+
+    python -m backend.benchmarks.response_formats [sizes...]
+"""
+import gzip
+import sys
+import time
+from typing import Callable, List
+
+from backend.app.formats import COLUMNAR_JSON, GZIP_LEVEL, MSGPACK, ZSTD_LEVEL, columnar, encode
+from backend.benchmarks.large_graph import build_compact, edge_list, synthetic_papers
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+REPEATS = 3
+
+
+def best_of(fn: Callable[[], bytes]) -> tuple:
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        body = fn()
+        timings.append(time.perf_counter() - started)
+    return body, min(timings)
+
+
+def report(label: str, body: bytes, seconds: float) -> None:
+    sizes = [f"raw {len(body) / 1024:9.1f} KiB"]
+    gz, gz_seconds = best_of(lambda: gzip.compress(body, compresslevel=GZIP_LEVEL))
+    sizes.append(f"gzip {len(gz) / 1024:8.1f} KiB (+{gz_seconds * 1000:.1f} ms)")
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        zs, zs_seconds = best_of(lambda: compressor.compress(body))
+        sizes.append(f"zstd {len(zs) / 1024:8.1f} KiB (+{zs_seconds * 1000:.1f} ms)")
+    print(f"  {label:<15} encode {seconds * 1000:8.1f} ms   " + "   ".join(sizes))
+
+
+def main(sizes: List[int]) -> None:
+    for size in sizes:
+        papers = synthetic_papers(size)
+        state = build_compact(papers, edge_list(size))
+        print(f"{size} nodes, {state.edge_count} edges")
+        # The default path: GraphResponse models, serialized by pydantic as FastAPI does.
+        body, seconds = best_of(lambda: state.graph().model_dump_json().encode())
+        report("pydantic json", body, seconds)
+        body, seconds = best_of(lambda: encode(columnar(state), COLUMNAR_JSON))
+        report("columnar json", body, seconds)
+        body, seconds = best_of(lambda: encode(columnar(state), MSGPACK))
+        report("msgpack", body, seconds)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000])
@@ -0,0 +1,388 @@
+"""Synthetic stand-in for every upstream API the backend calls.
+
+``UpstreamSimulator`` is an httpx transport: install it with ``HttpPool(settings,
+transport=UpstreamSimulator())`` and Semantic Scholar, OpenAlex, arXiv and the Anthropic
+Messages API are answered in-process, from a deterministic synthetic corpus, with configurable
+latency, error and 429 rates per host. Responses follow the real payload shapes closely enough
+for the clients' parsers, and the same query always returns the same papers, so the upstream
+cache and cross-source identity merging behave as they do in production.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import httpx
+
+S2_HOST = "api.semanticscholar.org"
+OPENALEX_HOST = "api.openalex.org"
+ARXIV_HOST = "export.arxiv.org"
+ANTHROPIC_HOST = "api.anthropic.com"
+# Nested citation/reference lists in simulated batch responses stop here; the rest is paged.
+NESTED_LIMIT = 20
+ARXIV_MAX_TERMS = 3
+
+WORDS = (
+    "graph neural network citation transformer attention protein folding retrieval language "
+    "model contrastive learning sparse dense embedding diffusion reinforcement policy bayesian "
+    "inference causal discovery federated privacy robust adversarial vision segmentation "
+    "molecular dynamics quantum circuit optimization scalable distributed benchmark survey "
+    "generative temporal spectral clustering kernel manifold topology"
+).split()
+FIRST_NAMES = "Ada Alan Grace Edsger Barbara Donald Frances John Radia Leslie Shafi Yoshua".split()
+LAST_NAMES = "Lovelace Turing Hopper Dijkstra Liskov Knuth Allen Backus Perlman Lamport".split()
+
+
+@dataclass
+class HostProfile:
+    # Latency is lognormal around `median_ms`; `sigma` sets the tail (0.5 puts p99 near 3.2x).
+    median_ms: float = 120.0
+    sigma: float = 0.5
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: float = 1.0
+
+
+@dataclass
+class SimulatorConfig:
+    universe: int = 20000
+    citations_per_paper: int = 25
+    # Pace of streamed Messages API output, after the host latency (time to first token).
+    token_ms: float = 15.0
+    seed: int = 7
+    hosts: Dict[str, HostProfile] = field(
+        default_factory=lambda: {
+            S2_HOST: HostProfile(median_ms=150.0),
+            OPENALEX_HOST: HostProfile(median_ms=100.0),
+            ARXIV_HOST: HostProfile(median_ms=300.0, sigma=0.7),
+            ANTHROPIC_HOST: HostProfile(median_ms=1500.0, sigma=0.4),
+        }
+    )
+
+
+def _select(work: Dict[str, Any], params: Any) -> Dict[str, Any]:
+    # OpenAlex `select=`: only the listed root fields.
+    fields = params.get("select")
+    return {k: v for k, v in work.items() if k in fields.split(",")} if fields else work
+
+
+def _stable(value: str) -> int:
+    return zlib.crc32(value.encode())
+
+
+class SyntheticCorpus:
+    # Paper n is generated from its number alone; every source describes the same paper
+    # n with the same DOI, so results from different APIs merge into one node.
+    def __init__(self, universe: int, citations_per_paper: int) -> None:
+        self.universe = universe
+        self.citations_per_paper = citations_per_paper
+        self._by_s2_id: Dict[str, int] = {}
+
+    def s2_id(self, n: int) -> str:
+        paper_id = hashlib.sha1(f"paper-{n}".encode()).hexdigest()
+        self._by_s2_id[paper_id] = n
+        return paper_id
+
+    def number(self, identifier: str) -> int:
+        # Known Semantic Scholar ids, DOI:/ARXIV: forms and DOI URLs map back to their paper;
+        # anything else is hashed onto one.
+        if identifier in self._by_s2_id:
+            return self._by_s2_id[identifier]
+        tail = identifier.rsplit("sim.", 1)[-1].rsplit("/", 1)[-1]
+        if tail.isdigit() and int(tail) < self.universe:
+            return int(tail)
+        return _stable(identifier) % self.universe
+
+    def title(self, n: int) -> str:
+        rng = random.Random(n)
+        return " ".join(rng.sample(WORDS, 6)).capitalize()
+
+    def abstract(self, n: int) -> str:
+        rng = random.Random(n * 31 + 1)
+        return " ".join(rng.choice(WORDS) for _ in range(60)).capitalize() + "."
+
+    def authors(self, n: int) -> List[str]:
+        rng = random.Random(n * 17 + 3)
+        return [
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(rng.randint(1, 5))
+        ]
+
+    def doi(self, n: int) -> str:
+        return f"10.5555/sim.{n}"
+
+    def arxiv_id(self, n: int) -> Optional[str]:
+        return f"{2000 + n % 400:04d}.{n:05d}" if n % 3 == 0 else None
+
+    def year(self, n: int) -> int:
+        return 1995 + n % 30
+
+    def citations(self, n: int) -> List[int]:
+        rng = random.Random(n * 7 + 5)
+        count = rng.randint(0, self.citations_per_paper * 2)
+        return [rng.randrange(self.universe) for _ in range(count)]
+
+    def references(self, n: int) -> List[int]:
+        rng = random.Random(n * 11 + 9)
+        return [rng.randrange(self.universe) for _ in range(rng.randint(5, 40))]
+
+    def matches(self, query: str, limit: int, offset: int = 0) -> List[int]:
+        rng = random.Random(_stable(query.lower()))
+        picks = [rng.randrange(self.universe) for _ in range(offset + limit)]
+        return picks[offset:]
+
+    def s2_paper(self, n: int) -> Dict[str, Any]:
+        external_ids: Dict[str, Any] = {"DOI": self.doi(n), "CorpusId": n}
+        if self.arxiv_id(n):
+            external_ids["ArXiv"] = self.arxiv_id(n)
+        return {
+            "paperId": self.s2_id(n),
+            "externalIds": external_ids,
+            "title": self.title(n),
+            "abstract": self.abstract(n),
+            "year": self.year(n),
+            "authors": [{"name": name} for name in self.authors(n)],
+            "openAccessPdf": {"url": f"https://example.org/pdf/{n}.pdf"} if n % 2 else None,
+        }
+
+    def openalex_work(self, n: int) -> Dict[str, Any]:
+        return {
+            "id": f"https://openalex.org/W{n}",
+            "doi": f"https://doi.org/{self.doi(n)}",
+            "ids": {
+                "openalex": f"https://openalex.org/W{n}",
+                "doi": f"https://doi.org/{self.doi(n)}",
+            },
+            "display_name": self.title(n),
+            "publication_year": self.year(n),
+            "authorships": [{"author": {"display_name": name}} for name in self.authors(n)],
+            "referenced_works": [f"https://openalex.org/W{r}" for r in self.references(n)],
+            # Bulk the real records carry and the client never reads; dropped under `select`.
+            "abstract_inverted_index": {
+                word: [i] for i, word in enumerate(self.abstract(n).rstrip(".").split())
+            },
+            "concepts": [
+                {"id": f"https://openalex.org/C{_stable(w)}", "display_name": w, "score": 0.5}
+                for w in self.title(n).lower().split()
+            ],
+            "counts_by_year": [
+                {"year": year, "cited_by_count": len(self.citations(n))}
+                for year in range(self.year(n), 2025)
+            ],
+        }
+
+    def arxiv_entry(self, n: int) -> str:
+        arxiv_id = self.arxiv_id(n) or f"sim/{n:07d}"
+        authors = "".join(
+            f"<author><name>{escape(name)}</name></author>" for name in self.authors(n)
+        )
+        return (
+            f"<entry><id>http://arxiv.org/abs/{arxiv_id}v1</id>"
+            f"<title>{escape(self.title(n))}</title><summary>{escape(self.abstract(n))}</summary>"
+            f"{authors}<arxiv:doi>{self.doi(n)}</arxiv:doi>"
+            f'<link title="pdf" href="http://arxiv.org/pdf/{arxiv_id}v1" '
+            'rel="related" type="application/pdf"/></entry>'
+        )
+
+
+class UpstreamSimulator(httpx.AsyncBaseTransport):
+    def __init__(self, config: Optional[SimulatorConfig] = None) -> None:
+        self.config = config or SimulatorConfig()
+        self.corpus = SyntheticCorpus(self.config.universe, self.config.citations_per_paper)
+        self._rng = random.Random(self.config.seed)
+        self.calls: Counter = Counter()
+        self.statuses: Counter = Counter()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": {
+                f"{host} {endpoint}": count for (host, endpoint), count in self.calls.items()
+            },
+            "statuses": dict(self.statuses),
+        }
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        profile = self.config.hosts.get(host, HostProfile())
+        endpoint, handler = self._route(request)
+        self.calls[(host, endpoint)] += 1
+        await asyncio.sleep(
+            profile.median_ms / 1000 * self._rng.lognormvariate(0.0, profile.sigma)
+        )
+        roll = self._rng.random()
+        if roll < profile.throttle_rate:
+            response = httpx.Response(429, headers={"Retry-After": f"{profile.retry_after:g}"})
+        elif roll < profile.throttle_rate + profile.error_rate:
+            response = httpx.Response(503, json={"message": "simulated upstream failure"})
+        elif handler is None:
+            response = httpx.Response(404, json={"error": "unknown endpoint"})
+        else:
+            response = handler(request)
+        self.statuses[response.status_code] += 1
+        return response
+
+    def _route(self, request: httpx.Request) -> Tuple[str, Any]:
+        host, path = request.url.host, request.url.path
+        if host == S2_HOST:
+            path = path.removeprefix("/graph/v1")
+            if path == "/paper/batch":
+                return "paper_batch", self._s2_batch
+            if path == "/paper/search":
+                return "search", self._s2_search
+            if path.endswith("/citations") or path.endswith("/references"):
+                return path.rsplit("/", 1)[-1], self._s2_edges
+            if path.startswith("/paper/"):
+                return "paper", self._s2_paper
+        elif host == OPENALEX_HOST:
+            if path == "/works":
+                return "works", self._openalex_works
+            if path.startswith("/works/"):
+                return "work", self._openalex_work
+        elif host == ARXIV_HOST and path == "/api/query":
+            return "query", self._arxiv_query
+        elif host == ANTHROPIC_HOST and path == "/v1/messages":
+            return "messages", self._messages
+        return path, None
+
+    def _s2_paper(self, request: httpx.Request) -> httpx.Response:
+        identifier = request.url.path.split("/paper/", 1)[1]
+        return httpx.Response(200, json=self.corpus.s2_paper(self.corpus.number(identifier)))
+
+    def _s2_batch(self, request: httpx.Request) -> httpx.Response:
+        ids = json.loads(request.content)["ids"]
+        numbers = [self.corpus.number(i) for i in ids]
+        if "citations.paperId" in request.url.params.get("fields", ""):
+            return httpx.Response(200, json=[self._s2_edge_ids(n) for n in numbers])
+        return httpx.Response(200, json=[self.corpus.s2_paper(n) for n in numbers])
+
+    def _s2_edge_ids(self, n: int) -> Dict[str, Any]:
+        # Like the real API, nested lists in batch responses are capped; counts are not.
+        citations, references = self.corpus.citations(n), self.corpus.references(n)
+        return {
+            "paperId": self.corpus.s2_id(n),
+            "citationCount": len(citations),
+            "referenceCount": len(references),
+            "citations": [{"paperId": self.corpus.s2_id(c)} for c in citations[:NESTED_LIMIT]],
+            "references": [{"paperId": self.corpus.s2_id(r)} for r in references[:NESTED_LIMIT]],
+        }
+
+    def _s2_search(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        limit, offset = int(params.get("limit", 10)), int(params.get("offset", 0))
+        numbers = self.corpus.matches(params.get("query", ""), limit, offset)
+        return httpx.Response(
+            200,
+            json={
+                "total": self.corpus.universe,
+                "offset": offset,
+                "data": [self.corpus.s2_paper(n) for n in numbers],
+            },
+        )
+
+    def _s2_edges(self, request: httpx.Request) -> httpx.Response:
+        _, identifier, direction = request.url.path.rsplit("/", 2)
+        n = self.corpus.number(identifier)
+        if direction == "citations":
+            key, numbers = "citingPaper", self.corpus.citations(n)
+        else:
+            key, numbers = "citedPaper", self.corpus.references(n)
+        params = request.url.params
+        limit, offset = int(params.get("limit", 100)), int(params.get("offset", 0))
+        page = numbers[offset : offset + limit]
+        if params.get("fields") == f"{key}.paperId":
+            data = [{key: {"paperId": self.corpus.s2_id(m)}} for m in page]
+        else:
+            data = [{key: self.corpus.s2_paper(m)} for m in page]
+        payload: Dict[str, Any] = {"offset": offset, "data": data}
+        if offset + limit < len(numbers):
+            payload["next"] = offset + limit
+        return httpx.Response(200, json=payload)
+
+    def _openalex_works(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        query = params.get("search") or params.get("filter", "")
+        limit = int(params.get("per-page", 25))
+        if query.startswith("openalex_id:"):
+            numbers = [int(w.lstrip("W")) for w in query.split(":", 1)[1].split("|")]
+        elif query.startswith("doi:"):
+            numbers = [self.corpus.number(d) for d in query.split(":", 1)[1].split("|")]
+        else:
+            numbers = self.corpus.matches(query, limit)
+        return httpx.Response(
+            200,
+            json={
+                "meta": {"count": self.corpus.universe, "per_page": limit},
+                "results": [_select(self.corpus.openalex_work(n), params) for n in numbers],
+            },
+        )
+
+    def _openalex_work(self, request: httpx.Request) -> httpx.Response:
+        identifier = request.url.path.split("/works/", 1)[1]
+        work = self.corpus.openalex_work(self.corpus.number(identifier))
+        return httpx.Response(200, json=_select(work, request.url.params))
+
+    def _arxiv_query(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        limit = int(params.get("max_results", 10))
+        query = params.get("search_query", "")
+        # Like arXiv, AND-ing many terms matches nothing, and so does a query whose "+AND+"
+        # arrived escaped as literal plus signs.
+        terms = re.findall(r"all:[^\s+]+", query)
+        empty = not terms or len(terms) > ARXIV_MAX_TERMS or "+" in query
+        numbers = [] if empty else self.corpus.matches(query, limit)
+        feed = (
+            '<feed xmlns="http://www.w3.org/2005/Atom" '
+            'xmlns:arxiv="http://arxiv.org/schemas/atom">'
+            + "".join(self.corpus.arxiv_entry(n) for n in numbers)
+            + "</feed>"
+        )
+        return httpx.Response(200, text=feed, headers={"content-type": "application/atom+xml"})
+
+    def _messages(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        prompt = body["messages"][-1]["content"]
+        rng = random.Random(_stable(prompt))
+        words = [rng.choice(WORDS) for _ in range(min(body.get("max_tokens", 400), 120))]
+        text = (
+            f"Title: {self.corpus.title(rng.randrange(self.corpus.universe))}\n"
+            f"Keywords: {', '.join(words[:5])}\n" + " ".join(words)
+        )
+        if body.get("stream"):
+            return httpx.Response(
+                200,
+                content=self._message_events(text.split(" ")),
+                headers={"content-type": "text/event-stream"},
+            )
+        return httpx.Response(
+            200,
+            json={
+                "id": f"msg_{_stable(prompt):08x}",
+                "type": "message",
+                "role": "assistant",
+                "model": body.get("model"),
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn",
+                "usage": {"input_tokens": len(prompt) // 4, "output_tokens": len(words)},
+            },
+        )
+
+    async def _message_events(self, tokens: List[str]) -> AsyncIterator[bytes]:
+        def event(kind: str, data: Dict[str, Any]) -> bytes:
+            return f"event: {kind}\ndata: {json.dumps({'type': kind, **data})}\n\n".encode()
+
+        yield event("message_start", {"message": {"role": "assistant", "content": []}})
+        yield event("content_block_start", {"index": 0, "content_block": {"type": "text"}})
+        for position, token in enumerate(tokens):
+            await asyncio.sleep(self.config.token_ms / 1000)
+            text = token if position == 0 else f" {token}"
+            yield event(
+                "content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": text}}
+            )
+        yield event("content_block_stop", {"index": 0})
+        yield event("message_delta", {"delta": {"stop_reason": "end_turn"}})
+        yield event("message_stop", {})
@@ -0,0 +1,69 @@
+import os
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+# Tests run against the simulated upstreams; lift the politeness limits so they measure the
+# code rather than the configured rates, and keep background prefetches out of the counts.
+SOURCES = ("SEMANTIC_SCHOLAR", "SEMANTIC_SCHOLAR_KEYED", "OPENALEX", "OPENALEX_POLITE", "ARXIV")
+for _source in SOURCES:
+    os.environ[f"RATE_{_source}"] = "100000"
+    os.environ[f"BURST_{_source}"] = "100000"
+os.environ["PREFETCH_ENABLED"] = "false"
+# Set explicitly so a developer's .env cannot point the suite at real files or cassettes.
+os.environ["CACHE_SQLITE_PATH"] = ""
+os.environ["LOCAL_CORPUS_PATH"] = ""
+os.environ["CASSETTE_MODE"] = "off"
+
+from backend.app.config import Settings, get_settings  # noqa: E402
+from backend.app.main import app  # noqa: E402
+from backend.app.transport import HttpPool  # noqa: E402
+from backend.benchmarks.simulator import UpstreamSimulator  # noqa: E402
+
+ROOT_PAPER = 42
+
+
+@pytest.fixture
+def settings() -> Settings:
+    return get_settings().model_copy()
+
+
+@pytest.fixture
+def simulator() -> UpstreamSimulator:
+    simulator = UpstreamSimulator()
+    for profile in simulator.config.hosts.values():
+        profile.median_ms = 1
+    return simulator
+
+
+@pytest.fixture
+def root(simulator) -> dict:
+    # Root metadata for a paper of the simulated corpus, as /analyze-input would return it.
+    corpus = simulator.corpus
+    return {
+        "id": corpus.s2_id(ROOT_PAPER),
+        "title": corpus.title(ROOT_PAPER),
+        "authors": corpus.authors(ROOT_PAPER),
+        "year": corpus.year(ROOT_PAPER),
+        "source": "semantic_scholar",
+        "external_ids": {
+            "doi": corpus.doi(ROOT_PAPER),
+            "semantic_scholar": corpus.s2_id(ROOT_PAPER),
+        },
+    }
+
+
+@pytest.fixture
+def client_factory(simulator):
+    # An async context manager yielding an httpx client wired to the app (lifespan included)
+    # whose upstream calls all go to the simulator.
+    @asynccontextmanager
+    async def factory():
+        async with app.router.lifespan_context(app):
+            app.state.upstream.pool = HttpPool(get_settings(), transport=simulator)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                yield client
+
+    return factory
@@ -0,0 +1,103 @@
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+
+from backend.app import analytics
+from backend.app.graph_store import GraphState
+from backend.app.models import EdgeType, PaperMetadata
+
+
+def build(node_ids: List[str], edges: List[Tuple[str, str, EdgeType]]) -> GraphState:
+    state = GraphState(PaperMetadata(id=node_ids[0], title=f"Paper {node_ids[0]}"))
+    for node_id in node_ids[1:]:
+        state.add(PaperMetadata(id=node_id, title=f"Paper {node_id}"))
+    for source, target, edge_type in edges:
+        state.link(source, target, edge_type)
+    return state
+
+
+def dense_pagerank(n: int, sources, targets, weights) -> np.ndarray:
+    # Textbook power iteration on the dense Google matrix, for comparison.
+    matrix = np.zeros((n, n))
+    for source, target, weight in zip(sources, targets, weights):
+        matrix[target, source] += weight
+    out = matrix.sum(axis=0)
+    matrix[:, out > 0] /= out[out > 0]
+    matrix[:, out == 0] = 1.0 / n
+    google = analytics.DAMPING * matrix + (1 - analytics.DAMPING) / n
+    rank = np.full(n, 1.0 / n)
+    for _ in range(1000):
+        rank = google @ rank
+    return rank
+
+
+def test_pagerank_matches_dense_power_iteration():
+    # Node 3 has no out-edges, so its rank is spread over everyone.
+    sources = np.array([0, 0, 1, 2, 2, 4])
+    targets = np.array([1, 2, 2, 0, 3, 2])
+    weights = np.array([1.0, 0.5, 1.0, 1.0, 0.8, 0.6])
+    scores = analytics.pagerank(5, sources, targets, weights)
+    assert scores.sum() == pytest.approx(1.0)
+    assert scores == pytest.approx(dense_pagerank(5, sources, targets, weights), abs=1e-6)
+
+
+def test_components_of_disjoint_graphs():
+    u, v = analytics.undirected(7, np.array([0, 1, 3, 5]), np.array([1, 2, 4, 3]))
+    labels = analytics.components(7, u, v)
+    assert labels.tolist() == [0, 0, 0, 3, 3, 3, 6]
+
+
+def test_betweenness_of_star_and_path():
+    # Star: every path between two leaves runs through the centre.
+    u, v = analytics.undirected(5, np.array([0, 0, 0, 0]), np.array([1, 2, 3, 4]))
+    assert analytics.betweenness(5, u, v) == pytest.approx([1, 0, 0, 0, 0])
+    # Path 0-1-2-3: node 1 lies on (0,2) and (0,3), out of three pairs not involving it.
+    u, v = analytics.undirected(4, np.array([0, 1, 2]), np.array([1, 2, 3]))
+    assert analytics.betweenness(4, u, v) == pytest.approx([0, 2 / 3, 2 / 3, 0])
+
+
+def test_betweenness_splits_between_shortest_paths():
+    # A 4-cycle: each pair of opposite corners has two shortest paths, one through each of
+    # the other corners.
+    u, v = analytics.undirected(4, np.array([0, 1, 2, 3]), np.array([1, 2, 3, 0]))
+    assert analytics.betweenness(4, u, v) == pytest.approx([1 / 6] * 4)
+
+
+def test_compute_on_a_small_graph():
+    citation, author = EdgeType.citation, EdgeType.author
+    state = build(
+        ["a", "b", "c", "d", "e", "f"],
+        [
+            ("a", "c", citation),
+            ("b", "c", citation),
+            ("d", "c", citation),
+            ("c", "e", citation),
+            ("f", "b", author),
+            # A repeat in the other direction is one undirected link for the structure.
+            ("e", "c", citation),
+        ],
+    )
+    result = analytics.compute(state)
+    assert result.node_ids == ["a", "b", "c", "d", "e", "f"]
+    assert result.in_degree == [0, 1, 4, 0, 1, 0]
+    assert result.out_degree == [1, 1, 1, 1, 1, 1]
+    assert sum(result.pagerank) == pytest.approx(1.0, abs=1e-5)
+    # c is cited by four papers; e only by c, but c passes all of its rank on to e.
+    assert result.key_papers[:2] == ["c", "e"]
+    assert result.rank[2] == 0
+    assert result.component == [0] * 6
+    assert result.component_sizes == [6]
+    # c sits between every pair of a, b, d, e and f except the linked b and f: 9 of the 10
+    # pairs not involving it. b sits between f and everyone else: 4 of 10.
+    assert result.betweenness == pytest.approx([0, 0.4, 0.9, 0, 0, 0], abs=1e-6)
+
+
+def test_graph_analytics_recomputes_only_after_growth():
+    state = build(["a", "b"], [("a", "b", EdgeType.citation)])
+    first = analytics.graph_analytics(state)
+    assert analytics.graph_analytics(state) is first
+    state.add(PaperMetadata(id="c", title="Paper c"))
+    state.link("c", "a", EdgeType.citation)
+    grown = analytics.graph_analytics(state)
+    assert grown is not first and grown.component_sizes == [3]
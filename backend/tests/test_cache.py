@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+from backend.app.cache import EMPTY, ERROR, OK, LRUCache, ResponseCache, SqliteCache
+
+
+def make_cache(settings, **overrides) -> ResponseCache:
+    return ResponseCache(settings.model_copy(update=overrides))
+
+
+def test_lru_expires_and_evicts():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", (OK, 1), ttl=60)
+    cache.set("b", (OK, 2), ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("b") is None
+    assert cache.expirations == 1
+    cache.set("c", (OK, 3), ttl=60)
+    # Reading "a" makes "c" the least recently used, so "c" makes room for "d".
+    cache.get("a")
+    cache.set("d", (OK, 4), ttl=60)
+    assert cache.get("c") is None and cache.get("a") == (OK, 1)
+    assert cache.evictions == 1
+
+
+def test_ttl_depends_on_source_and_kind(settings):
+    cache = make_cache(
+        settings,
+        cache_ttl_openalex=100,
+        cache_ttl_default=10,
+        cache_negative_ttl=5,
+        cache_failure_ttl=1,
+    )
+    assert cache.ttl_for("openalex", OK) == 100
+    assert cache.ttl_for("unknown", OK) == 10
+    assert cache.ttl_for("openalex", EMPTY) == 5
+    assert cache.ttl_for("openalex", ERROR) == 1
+
+
+def test_negative_and_failure_entries_expire_first(settings):
+    cache = make_cache(
+        settings, cache_ttl_default=60, cache_negative_ttl=0.05, cache_failure_ttl=0.05
+    )
+
+    async def scenario():
+        await cache.set("found", "other", OK, {"id": 1})
+        await cache.set("missing", "other", EMPTY, None)
+        await cache.set("failed", "other", ERROR, 503)
+        assert await cache.get("missing") == (EMPTY, None)
+        assert await cache.get("failed") == (ERROR, 503)
+        await asyncio.sleep(0.1)
+        return [await cache.get(key) for key in ("found", "missing", "failed")]
+
+    assert asyncio.run(scenario()) == [(OK, {"id": 1}), None, None]
+
+
+def test_zero_ttl_disables_caching(settings):
+    cache = make_cache(settings, cache_failure_ttl=0)
+
+    async def scenario():
+        await cache.set("failed", "other", ERROR, 503)
+        return await cache.get("failed")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_sqlite_entries_expire(tmp_path):
+    disk = SqliteCache(str(tmp_path / "cache.sqlite"))
+    disk.set("short", (OK, [1, 2]), ttl=0.05)
+    disk.set("long", (EMPTY, None), ttl=60)
+    entry, remaining = disk.get("short")
+    assert entry == (OK, [1, 2]) and 0 < remaining <= 0.05
+    time.sleep(0.1)
+    assert disk.get("short") is None
+    assert disk.get_many(["short", "long", "absent"]).keys() == {"long"}
+    disk.close()
+
+
+def test_disk_tier_survives_restart_but_failures_do_not(settings, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+
+    async def write():
+        cache = make_cache(settings, cache_sqlite_path=path)
+        await cache.set("found", "openalex", OK, {"id": 1})
+        await cache.set("failed", "openalex", ERROR, 503)
+        cache.close()
+
+    async def read():
+        cache = make_cache(settings, cache_sqlite_path=path)
+        try:
+            single = await cache.get("found")
+            many = await cache.get_many(["found", "failed"])
+            return single, many, cache.stats()["memory"]["entries"]
+        finally:
+            cache.close()
+
+    asyncio.run(write())
+    single, many, in_memory = asyncio.run(read())
+    assert single == (OK, {"id": 1})
+    assert many == {"found": (OK, {"id": 1})}
+    # A disk hit is copied into memory for the rest of its lifetime.
+    assert in_memory == 1
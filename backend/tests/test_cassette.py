@@ -0,0 +1,79 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend.app.cassette import Cassette, CassetteTransport, fingerprint
+from backend.app.config import get_settings
+from backend.app.main import app
+from backend.app.transport import HttpPool
+
+URL = "https://api.openalex.org/works"
+
+
+async def send(transport: httpx.AsyncBaseTransport, times: int) -> list:
+    async with httpx.AsyncClient(transport=transport) as client:
+        return [await client.get(URL) for _ in range(times)]
+
+
+def test_fingerprint_ignores_identity_and_param_order():
+    first = httpx.Request("GET", URL, params={"search": "graphs", "mailto": "a@b.c", "page": 1})
+    second = httpx.Request("GET", URL, params={"page": 1, "search": "graphs"})
+    assert fingerprint(first) == fingerprint(second)
+    assert fingerprint(first) == f"GET {URL}?page=1&search=graphs -"
+    posted = httpx.Request("POST", URL, json={"ids": ["a"]})
+    assert fingerprint(posted) != fingerprint(httpx.Request("POST", URL, json={"ids": ["b"]}))
+
+
+def test_repeats_replay_in_recorded_order(tmp_path):
+    path = str(tmp_path / "run.db")
+    statuses = iter([503, 200])
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(next(statuses), json={"ok": True}, headers={"x-trace": "1"})
+
+    recorder = CassetteTransport(Cassette(path), "record", inner=httpx.MockTransport(upstream))
+    recorded = asyncio.run(send(recorder, 2))
+    recorder.cassette.close()
+    player = CassetteTransport(Cassette(path, readonly=True), "replay")
+    replayed = asyncio.run(send(player, 3))
+    player.cassette.close()
+    assert [r.status_code for r in recorded] == [503, 200]
+    # Past the last recorded occurrence, the last one is served again.
+    assert [r.status_code for r in replayed] == [503, 200, 200]
+    assert replayed[1].json() == {"ok": True} and "x-trace" not in replayed[1].headers
+    assert player.stats() == {"mode": "replay", "recorded": 0, "replayed": 3, "misses": 0}
+
+
+def test_unrecorded_request_fails_like_a_connection_error(tmp_path):
+    path = str(tmp_path / "empty.db")
+    Cassette(path).close()
+    player = CassetteTransport(Cassette(path, readonly=True), "replay")
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(send(player, 1))
+    player.cassette.close()
+    assert player.misses == 1
+
+
+def test_expansion_replays_without_the_network(client_factory, simulator, root, tmp_path):
+    path = str(tmp_path / "expansion.db")
+    body = {"root_metadata": root, "max_nodes": 25, "max_depth": 1}
+
+    async def expand(transport: CassetteTransport) -> dict:
+        async with client_factory() as client:
+            app.state.upstream.pool = HttpPool(get_settings(), transport=transport)
+            return (await client.post("/expand-graph", json=body)).json()
+
+    recorded = asyncio.run(
+        expand(CassetteTransport(Cassette(path), "record", inner=simulator))
+    )
+    calls = sum(simulator.calls.values())
+    player = CassetteTransport(Cassette(path, readonly=True), "replay")
+    replayed = asyncio.run(expand(player))
+    assert sum(simulator.calls.values()) == calls
+    assert player.misses == 0 and player.replayed == calls
+    assert [n["id"] for n in replayed["nodes"]] == [n["id"] for n in recorded["nodes"]]
+    assert replayed["edges"] == recorded["edges"]
+    cassette = Cassette(path, readonly=True)
+    assert cassette.summary()["interactions"] == calls
+    cassette.close()
@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from backend.app import claude
+from backend.app.config import get_settings
+from backend.app.transport import HttpPool
+from backend.benchmarks.simulator import ANTHROPIC_HOST
+
+CHAT = {
+    "paper_metadata": {"title": "Graph neural networks for chemistry", "authors": ["Ada"]},
+    "message": "What is the main contribution?",
+}
+
+
+@pytest.fixture
+def api_key(monkeypatch):
+    monkeypatch.setattr(get_settings(), "anthropic_api_key", "test-key")
+
+
+@pytest.fixture
+def fast_simulator(simulator):
+    simulator.config.token_ms = 0.1
+    return simulator
+
+
+def parse_sse(text: str) -> list:
+    events = []
+    for frame in text.strip().split("\n\n"):
+        kind, data = frame.split("\n")
+        events.append((kind.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_stream_then_cache(api_key, client_factory, fast_simulator):
+    async def scenario():
+        async with client_factory() as client:
+            first = await client.post("/claude-chat/stream", json=CHAT)
+            again = await client.post("/claude-chat/stream", json=CHAT)
+            # Streaming and plain answers share the cache.
+            plain = await client.post("/claude-chat", json=CHAT)
+            stats = (await client.get("/claude-stats")).json()
+            return first, again, plain.json(), stats
+
+    first, again, plain, stats = asyncio.run(scenario())
+    assert first.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(first.text)
+    deltas = [data["text"] for kind, data in events if kind == "delta"]
+    assert len(deltas) > 1 and events[-1] == ("done", {"answer": "".join(deltas)})
+    # A cached answer arrives as one chunk.
+    assert parse_sse(again.text) == [
+        ("delta", {"text": "".join(deltas)}),
+        ("done", {"answer": "".join(deltas)}),
+    ]
+    assert plain["answer"] == "".join(deltas)
+    assert fast_simulator.calls[(ANTHROPIC_HOST, "messages")] == 1
+    assert stats["entries"] == 1 and stats["hits"] == 2
+
+
+def test_concurrent_streams_share_one_completion(api_key, client_factory, fast_simulator):
+    async def scenario():
+        async with client_factory() as client:
+            return await asyncio.gather(
+                *(client.post("/claude-chat/stream", json=CHAT) for _ in range(3))
+            )
+
+    responses = asyncio.run(scenario())
+    answers = {parse_sse(response.text)[-1][1]["answer"] for response in responses}
+    assert len(answers) == 1 and answers != {""}
+    assert fast_simulator.calls[(ANTHROPIC_HOST, "messages")] == 1
+
+
+def test_concurrent_plain_calls_share_one_completion(api_key, fast_simulator, settings):
+    pool = HttpPool(settings, transport=fast_simulator)
+    cache = claude.ClaudeCache(settings)
+
+    async def scenario():
+        return await asyncio.gather(
+            *(claude.call_claude("Summarize", pool=pool, cache=cache) for _ in range(3))
+        )
+
+    answers = asyncio.run(scenario())
+    assert len(set(answers)) == 1
+    assert fast_simulator.calls[(ANTHROPIC_HOST, "messages")] == 1
+    assert cache.stats()["coalesced"] == 2
+
+
+def test_empty_completion_is_not_cached(api_key, settings):
+    def empty(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"content": []})
+
+    pool = HttpPool(settings, transport=httpx.MockTransport(empty))
+    cache = claude.ClaudeCache(settings)
+    answer = asyncio.run(claude.call_claude("Summarize", pool=pool, cache=cache))
+    assert answer == claude.EMPTY_ANSWER
+    assert cache.stats()["entries"] == 0
+
+
+def test_missing_key_answers_with_a_stub(client_factory, fast_simulator, monkeypatch):
+    monkeypatch.setattr(get_settings(), "anthropic_api_key", None)
+
+    async def scenario():
+        async with client_factory() as client:
+            return (await client.post("/claude-chat", json=CHAT)).json()
+
+    assert asyncio.run(scenario()) == {"answer": claude.MISSING_KEY_ANSWER}
+    assert not fast_simulator.calls
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from backend.app.coalesce import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "payload"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.run("key", fetch) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["payload"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"started": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream broke")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flight.run("key", fetch) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_call_survives_while_a_waiter_remains():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "payload"
+
+    async def scenario():
+        leaving = asyncio.ensure_future(flight.run("key", fetch))
+        staying = asyncio.ensure_future(flight.run("key", fetch))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+        return await staying
+
+    assert asyncio.run(scenario()) == "payload"
+    assert flight.stats()["started"] == 1
+
+
+def test_call_is_cancelled_when_last_waiter_leaves():
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+    started = []
+
+    async def fetch():
+        started.append(1)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "stale"
+
+    async def fresh():
+        return "fresh"
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(flight.run("key", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        for waiter in waiters:
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert not flight.joining("key")
+        # The next caller starts a new call rather than joining the cancelled one.
+        return await flight.run("key", fresh)
+
+    assert asyncio.run(scenario()) == "fresh"
+    assert len(started) == 1
+    assert flight.stats()["started"] == 2
@@ -0,0 +1,51 @@
+from backend.app.claude import _related_line, estimate_tokens, paper_prompt, select_context
+from backend.app.models import PaperMetadata
+
+PAPER = PaperMetadata(id="p", title="Graph neural networks for molecular property prediction")
+QUESTION = "How do message passing networks handle molecular graphs?"
+
+
+def related(*titles: str, abstract: str = "") -> list:
+    return [
+        PaperMetadata(id=f"r{i}", title=title, abstract=abstract or None, authors=["Ada"])
+        for i, title in enumerate(titles)
+    ]
+
+
+def test_most_relevant_papers_come_first():
+    papers = related(
+        "Medieval trade routes",
+        "Message passing neural networks for molecular graphs",
+        "Molecular property prediction benchmarks",
+    )
+    chosen = [p.title for p, _ in select_context(PAPER, papers, QUESTION, 1000, 10)]
+    assert chosen[0] == "Message passing neural networks for molecular graphs"
+    assert chosen[-1] == "Medieval trade routes"
+
+
+def test_paper_itself_and_untitled_entries_are_skipped():
+    papers = [PAPER, PaperMetadata(id="x", title=""), *related("Molecular graphs")]
+    assert [p.id for p, _ in select_context(PAPER, papers, QUESTION, 1000, 10)] == ["r0"]
+
+
+def test_budget_limits_papers_then_abstracts():
+    papers = related(*(f"Molecular graph paper {i}" for i in range(10)), abstract="x " * 16)
+    line_cost = estimate_tokens(_related_line(papers[0]))
+    abstract_cost = estimate_tokens(papers[0].abstract)
+    assert abstract_cost < line_cost
+    # Room for three summary lines, and what is left over for one abstract.
+    budget = 3 * line_cost + abstract_cost
+    chosen = select_context(PAPER, papers, QUESTION, budget, 10)
+    assert len(chosen) == 3
+    assert [with_abstract for _, with_abstract in chosen] == [True, False, False]
+    assert len(select_context(PAPER, papers, QUESTION, 10_000, 2)) == 2
+    assert select_context(PAPER, papers, QUESTION, 10_000, 0) == []
+
+
+def test_prompt_lists_the_selected_context():
+    papers = related("Message passing neural networks", abstract="Neural message passing.")
+    prompt = paper_prompt(PAPER, papers, QUESTION)
+    assert "- Message passing neural networks (n/a) by Ada" in prompt
+    assert "  Abstract: Neural message passing." in prompt
+    assert prompt.rstrip().splitlines()[-2] == f"User question: {QUESTION}"
+    assert "Related papers:\nNone listed." in paper_prompt(PAPER, [], QUESTION)
@@ -0,0 +1,113 @@
+import asyncio
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from backend.app.clients.local_corpus import LocalCorpusClient
+from backend.app.corpus import LocalCorpus, ingest
+from backend.app.models import EdgeType, PaperMetadata
+
+
+def work(number: int, title: str, references=(), **fields) -> dict:
+    return {
+        "id": f"https://openalex.org/W{number}",
+        "display_name": title,
+        "publication_year": 2000 + number,
+        "ids": {"doi": f"https://doi.org/10.1000/w{number}"},
+        "authorships": [{"author": {"display_name": "Ada Lovelace"}}],
+        "referenced_works": [f"https://openalex.org/W{r}" for r in references],
+        **fields,
+    }
+
+
+@pytest.fixture
+def corpus_dir(tmp_path):
+    works = [
+        work(1, "Graph neural networks for chemistry", references=[2, 3]),
+        work(2, "Message passing on molecular graphs", references=[3]),
+        work(3, "Spectral graph theory", abstract_inverted_index={"Eigen": [0], "values": [1]}),
+        # A reference to a work outside the dump is dropped.
+        work(4, "Unrelated survey of trade routes", references=[99]),
+    ]
+    openalex = tmp_path / "works.jsonl.gz"
+    with gzip.open(openalex, "wt", encoding="utf-8") as handle:
+        handle.writelines(json.dumps(record) + "\n" for record in works)
+    # The same paper 1 from Semantic Scholar merges into the OpenAlex record.
+    s2 = tmp_path / "papers.jsonl"
+    s2.write_text(
+        json.dumps(
+            {
+                "paperId": "abc",
+                "title": "Graph neural networks for chemistry",
+                "externalIds": {"DOI": "10.1000/W1", "CorpusId": 7},
+            }
+        )
+        + "\n"
+    )
+    directory = tmp_path / "corpus"
+    counts = ingest(str(directory), [str(openalex), str(s2)])
+    assert counts["papers"] == 4 and counts["duplicates"] == 1 and counts["edges"] == 3
+    return directory
+
+
+def test_citation_arrays_are_memory_mapped_csr(corpus_dir):
+    corpus = LocalCorpus(str(corpus_dir))
+    try:
+        indptr, indices = corpus._adjacency["references"]
+        assert isinstance(indptr, np.memmap) and isinstance(indices, np.memmap)
+        # Row ids follow ingest order, from 1.
+        assert [indices[indptr[i] : indptr[i + 1]].tolist() for i in range(1, 5)] == [
+            [2, 3],
+            [3],
+            [],
+            [],
+        ]
+        citing = [p.title for p in corpus.neighbours(3, "citations", 10)]
+        assert citing == [
+            "Graph neural networks for chemistry",
+            "Message passing on molecular graphs",
+        ]
+        assert corpus.neighbours(99, "citations", 10) == []
+    finally:
+        corpus.close()
+
+
+def test_lookup_by_any_identifier(corpus_dir):
+    corpus = LocalCorpus(str(corpus_dir))
+    try:
+        by_doi = corpus.find("https://doi.org/10.1000/W1")
+        assert by_doi.title == "Graph neural networks for chemistry"
+        assert by_doi.external_ids["openalex"] == "https://openalex.org/W1"
+        assert corpus.resolve(PaperMetadata(title="x", external_ids={"semantic_scholar": "abc"}))
+        assert corpus.find("10.1000/unknown") is None
+        assert corpus.find("https://doi.org/10.1000/w3").abstract == "Eigen values"
+    finally:
+        corpus.close()
+
+
+def test_related_mirrors_the_upstream_lookups(corpus_dir):
+    client = LocalCorpusClient.open(str(corpus_dir))
+    try:
+        root = PaperMetadata(
+            title="Message passing on molecular graphs",
+            authors=["Ada Lovelace"],
+            external_ids={"doi": "10.1000/w2"},
+        )
+        related = asyncio.run(client.related(root, ["graph", "chemistry"], fanout=10))
+    finally:
+        client.close()
+    citations = {(p.title, incoming) for p, t, incoming in related if t == EdgeType.citation}
+    assert citations == {
+        ("Graph neural networks for chemistry", True),
+        ("Spectral graph theory", False),
+    }
+    searched = [p.title for p, t, _ in related if t == EdgeType.semantic]
+    assert "Graph neural networks for chemistry" in searched
+    assert "Message passing on molecular graphs" not in searched
+    assert {p.title for p, t, _ in related if t == EdgeType.author} == {
+        "Graph neural networks for chemistry",
+        "Spectral graph theory",
+        "Unrelated survey of trade routes",
+    }
@@ -0,0 +1,182 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend.app.coalesce import SingleFlight
+from backend.app.deadline import BudgetExhausted, CallBudget, DeadlineExceeded, deadline_context
+from backend.app.resilience import OPEN, CircuitOpenError, build_policies
+from backend.app.transport import HttpPool
+from backend.app.upstream import Upstream
+
+URL = "https://api.openalex.org/works"
+
+
+class Scripted:
+    # Answers requests with `statuses` in order (the last one repeats) and records the read
+    # timeout each request was sent with.
+    def __init__(self, *statuses: int, headers=None, delay: float = 0.0) -> None:
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.delay = delay
+        self.timeouts = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.timeouts.append(request.extensions["timeout"]["read"])
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return httpx.Response(status, json={"results": []}, headers=self.headers)
+
+    @property
+    def calls(self) -> int:
+        return len(self.timeouts)
+
+
+def make_upstream(settings, handler: Scripted, **overrides) -> Upstream:
+    defaults = {"retry_attempts": 3, "retry_backoff_base": 0.01, "retry_backoff_max": 0.01}
+    defaults.update(overrides)
+    settings = settings.model_copy(update=defaults)
+    return Upstream(
+        pool=HttpPool(settings, transport=httpx.MockTransport(handler)),
+        flight=SingleFlight(),
+        policies=build_policies(settings),
+    )
+
+
+async def call(upstream: Upstream, deadline_seconds=None, budget=None):
+    # One upstream GET made the way the engine makes them: in a task whose context carries
+    # the expansion's deadline and call budget.
+    deadline_at = time.monotonic() + deadline_seconds if deadline_seconds else None
+    context = deadline_context(deadline_at, budget)
+    task = asyncio.get_running_loop().create_task(
+        upstream.get("openalex", "works", URL), context=context
+    )
+    return await task
+
+
+def test_every_attempt_sent_is_charged(settings):
+    handler = Scripted(500, 502, 200)
+    upstream = make_upstream(settings, handler)
+    budget = CallBudget(10)
+    asyncio.run(call(upstream, budget=budget))
+    assert handler.calls == 3 and budget.used == 3
+
+
+def test_spent_budget_stops_retries(settings):
+    handler = Scripted(503)
+    upstream = make_upstream(settings, handler)
+    budget = CallBudget(2)
+    with pytest.raises(BudgetExhausted):
+        asyncio.run(call(upstream, budget=budget))
+    assert handler.calls == 2 and budget.used == 2
+    # Nothing is sent, and nothing charged, once the budget is spent.
+    with pytest.raises(BudgetExhausted):
+        asyncio.run(call(upstream, budget=budget))
+    assert handler.calls == 2
+
+
+def test_requests_refused_locally_are_free(settings):
+    handler = Scripted(200)
+    upstream = make_upstream(settings, handler)
+    breaker = upstream.policies["openalex"].breaker
+    breaker.state, breaker.opened_at = OPEN, time.monotonic()
+    budget = CallBudget(10)
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call(upstream, budget=budget))
+    assert handler.calls == 0 and budget.used == 0
+
+
+def test_coalesced_callers_share_one_charge(settings):
+    handler = Scripted(200, delay=0.05)
+    upstream = make_upstream(settings, handler)
+    first, second = CallBudget(10), CallBudget(10)
+
+    async def scenario():
+        await asyncio.gather(call(upstream, budget=first), call(upstream, budget=second))
+
+    asyncio.run(scenario())
+    assert handler.calls == 1 and first.used + second.used == 1
+
+
+def test_shared_call_clamps_timeouts_to_the_deadline(settings):
+    handler = Scripted(200, delay=1.0)
+    upstream = make_upstream(settings, handler)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(call(upstream, deadline_seconds=0.1))
+    assert time.monotonic() - started < 0.5
+    assert handler.timeouts[0] <= 0.1
+
+
+def test_shared_call_does_not_retry_past_the_deadline(settings):
+    # A Retry-After longer than the caller has left ends the call instead of sleeping on.
+    handler = Scripted(503, headers={"Retry-After": "0.3"})
+    upstream = make_upstream(settings, handler)
+    started = time.monotonic()
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(call(upstream, deadline_seconds=0.2))
+    assert handler.calls == 1
+    assert time.monotonic() - started < 0.2
+
+
+def test_shared_call_runs_to_the_latest_waiter_deadline(settings):
+    # The retry is sent once both callers wait on the call, with the later deadline.
+    handler = Scripted(503, 200)
+    upstream = make_upstream(settings, handler)
+
+    async def scenario():
+        await asyncio.gather(
+            call(upstream, deadline_seconds=0.5), call(upstream, deadline_seconds=2.0)
+        )
+
+    asyncio.run(scenario())
+    assert handler.calls == 2
+    assert 1.0 < handler.timeouts[1] <= 2.0
+
+
+def test_waiter_without_deadline_lifts_it(settings):
+    handler = Scripted(503, 200)
+    upstream = make_upstream(settings, handler)
+
+    async def scenario():
+        await asyncio.gather(call(upstream, deadline_seconds=0.5), call(upstream))
+
+    asyncio.run(scenario())
+    assert handler.timeouts[1] == 15
+
+
+def test_expansion_stops_at_the_call_budget(client_factory, simulator, root):
+    async def scenario():
+        async with client_factory() as client:
+            response = await client.post(
+                "/expand-graph",
+                json={"root_metadata": root, "max_nodes": 50, "max_upstream_calls": 5},
+            )
+            return response.json()
+
+    graph = asyncio.run(scenario())
+    assert graph["truncated"] and graph["truncated_reason"] == "upstream_budget"
+    assert sum(simulator.calls.values()) <= 5
+    assert graph["nodes"]
+
+
+def test_expansion_returns_partial_graph_at_the_deadline(client_factory, simulator, root):
+    for profile in simulator.config.hosts.values():
+        profile.median_ms = 300
+    started = time.monotonic()
+
+    async def scenario():
+        async with client_factory() as client:
+            response = await client.post(
+                "/expand-graph",
+                json={"root_metadata": root, "max_nodes": 50, "deadline_seconds": 0.2},
+            )
+            return response.json()
+
+    graph = asyncio.run(scenario())
+    assert graph["truncated"] and graph["truncated_reason"] == "deadline"
+    # Whatever arrived before the deadline is kept; the rest of the expansion is dropped.
+    assert graph["nodes"][0]["id"] == root["id"] and len(graph["nodes"]) < 50
+    assert time.monotonic() - started < 1.5
@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+
+from backend.app.clients import arxiv
+from backend.app.clients.openalex import SELECT_FIELDS, OpenAlexClient
+from backend.app.transport import HttpPool
+from backend.app.upstream import Upstream
+
+
+class Recording(httpx.AsyncBaseTransport):
+    def __init__(self, inner: httpx.AsyncBaseTransport) -> None:
+        self.inner = inner
+        self.requests: list = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return await self.inner.handle_async_request(request)
+
+
+def feed(simulator, numbers) -> bytes:
+    return (
+        '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:arxiv="http://arxiv.org/schemas/atom">'
+        + "".join(simulator.corpus.arxiv_entry(n) for n in numbers)
+        + "</feed>"
+    ).encode()
+
+
+def test_openalex_asks_only_for_the_fields_it_reads(settings, simulator):
+    transport = Recording(simulator)
+    upstream = Upstream(pool=HttpPool(settings, transport=transport))
+    client = OpenAlexClient(upstream=upstream)
+    corpus = simulator.corpus
+    works = asyncio.run(client.fetch_works([f"https://openalex.org/W{n}" for n in (3, 4)]))
+    assert [work.title for work in works] == [corpus.title(3), corpus.title(4)]
+    assert works[0].references and works[0].authors == corpus.authors(3)
+    (request,) = transport.requests
+    assert request.url.params["select"] == SELECT_FIELDS
+
+
+def test_large_bodies_are_decoded_off_the_loop(settings, simulator):
+    def search(offload_bytes):
+        upstream = Upstream(
+            pool=HttpPool(settings, transport=simulator), offload_bytes=offload_bytes
+        )
+        client = arxiv.ArxivClient(upstream=upstream)
+        return asyncio.run(client.search(["graph"], limit=5)), upstream
+
+    inline, small = search(None)
+    offloaded, large = search(1)
+    assert inline and offloaded == inline
+    assert (small.offloaded, large.offloaded) == (0, 1)
+    assert large.stats()["decode_offloaded"] == 1
+
+
+def test_feed_is_parsed_in_chunks(simulator, monkeypatch):
+    monkeypatch.setattr(arxiv, "FEED_CHUNK", 97)
+    corpus = simulator.corpus
+    entries = arxiv.parse_entries(feed(simulator, (3, 4, 5)))
+    assert [entry["title"] for entry in entries] == [corpus.title(n) for n in (3, 4, 5)]
+    assert entries[0]["external_ids"]["doi"] == corpus.doi(3)
+    assert entries[0]["pdf_link"].startswith("http://arxiv.org/pdf/")
+
+
+def test_malformed_feed_keeps_the_entries_before_the_error(simulator):
+    content = feed(simulator, (3, 4)).removesuffix(b"</feed>") + b"<entry><title>"
+    assert [entry["title"] for entry in arxiv.parse_entries(content)] == [
+        simulator.corpus.title(n) for n in (3, 4)
+    ]
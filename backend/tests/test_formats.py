@@ -0,0 +1,102 @@
+import asyncio
+import gzip
+import json
+
+import msgpack
+import pytest
+
+from backend.app import formats
+from backend.app.graph_store import GraphState
+from backend.app.models import EdgeType, PaperMetadata, TruncationReason
+
+
+def small_state() -> GraphState:
+    state = GraphState(PaperMetadata(id="a", title="Root", authors=["Ada", "Bo"], year=2020))
+    state.add(PaperMetadata(id="b", title="Other", authors=["Bo"], abstract="Text"))
+    state.link("b", "a", EdgeType.citation)
+    state.link("a", "b", EdgeType.author)
+    return state
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        ("application/msgpack", formats.MSGPACK),
+        ("application/x-msgpack, application/json;q=0.5", formats.MSGPACK),
+        (formats.COLUMNAR_JSON, formats.COLUMNAR_JSON),
+        ("application/json", None),
+        ("", None),
+    ],
+)
+def test_negotiate(accept, expected):
+    assert formats.negotiate(accept) == expected
+
+
+def test_columnar_layout():
+    payload = formats.columnar(small_state(), TruncationReason.deadline)
+    strings, nodes, edges = payload["strings"], payload["nodes"], payload["edges"]
+    assert nodes["id"] == ["a", "b"]
+    # Repeated strings are sent once and referenced by index.
+    assert [[strings[i] for i in refs] for refs in nodes["authors"]] == [["Ada", "Bo"], ["Bo"]]
+    assert strings.count("Bo") == 1
+    assert nodes["abstract"][0] is None and strings[nodes["abstract"][1]] == "Text"
+    assert (edges["source"], edges["target"]) == ([1, 0], [0, 1])
+    assert [payload["edge_types"][code] for code in edges["type"]] == ["citation", "author"]
+    assert payload["truncated"] and payload["truncated_reason"] == "deadline"
+
+
+def test_compress_respects_threshold_and_accept_encoding():
+    body = b"x" * 2000
+    assert formats.compress(body, "gzip", 4096) == (body, None)
+    assert formats.compress(body, "br", 100) == (body, None)
+    compressed, encoding = formats.compress(body, "gzip, deflate", 100)
+    assert encoding == "gzip" and gzip.decompress(compressed) == body
+
+
+def test_compress_prefers_zstd():
+    zstandard = pytest.importorskip("zstandard")
+    compressed, encoding = formats.compress(b"x" * 2000, "gzip, zstd", 100)
+    assert encoding == "zstd"
+    assert zstandard.ZstdDecompressor().decompress(compressed) == b"x" * 2000
+
+
+def test_graph_response_headers():
+    response = formats.graph_response(small_state(), formats.MSGPACK, "gzip", 0)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    payload = msgpack.unpackb(gzip.decompress(response.body), raw=False)
+    assert payload["nodes"]["id"] == ["a", "b"]
+
+
+def test_expansion_formats_describe_the_same_graph(client_factory, root):
+    body = {"root_metadata": root, "max_nodes": 20, "max_depth": 1}
+
+    async def scenario():
+        async with client_factory() as client:
+            # The later expansions are answered from the response cache, so all three build
+            # the same graph.
+            plain = (await client.post("/expand-graph", json=body)).json()
+            columnar = await client.post(
+                "/expand-graph",
+                json=body,
+                headers={"accept": formats.COLUMNAR_JSON, "accept-encoding": "gzip"},
+            )
+            packed = await client.post(
+                "/expand-graph", json=body, headers={"accept": formats.MSGPACK}
+            )
+            return plain, columnar, packed
+
+    plain, columnar, packed = asyncio.run(scenario())
+    assert columnar.headers["content-type"] == formats.COLUMNAR_JSON
+    assert columnar.headers["content-encoding"] == "gzip"
+    assert packed.headers["content-type"] == formats.MSGPACK
+    # httpx undoes the gzip encoding.
+    for payload in (json.loads(columnar.content), msgpack.unpackb(packed.content)):
+        assert payload["nodes"]["id"] == [node["id"] for node in plain["nodes"]]
+        assert payload["nodes"]["title"] == [node["title"] for node in plain["nodes"]]
+        ids = payload["nodes"]["id"]
+        edges = payload["edges"]
+        assert [
+            (ids[s], ids[t], payload["edge_types"][c])
+            for s, t, c in zip(edges["source"], edges["target"], edges["type"])
+        ] == [(e["source"], e["target"], e["type"]) for e in plain["edges"]]
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from backend.app.graph_store import GraphState
+from backend.app.models import EdgeType, PaperMetadata
+
+
+def paper(node_id: str, **fields) -> PaperMetadata:
+    return PaperMetadata(id=node_id, title=f"Paper {node_id}", **fields)
+
+
+def test_links_are_deduplicated_per_type():
+    state = GraphState(paper("a"))
+    state.add(paper("b"))
+    assert state.link("a", "b", EdgeType.citation)
+    assert not state.link("a", "b", EdgeType.citation)
+    assert not state.link("a", "a", EdgeType.citation)
+    # The same pair under another type, or the other way round, is a different edge.
+    assert state.link("a", "b", EdgeType.author)
+    assert state.link("b", "a", EdgeType.citation)
+    assert state.edge_count == 3
+
+
+def test_merge_takes_the_union_of_fields():
+    state = GraphState(paper("a", authors=["Ada"], source="semantic_scholar"))
+    assert state.merge(
+        "a",
+        paper("a", abstract="Longer text", authors=["Ada", "Bo"], year=2020, source="openalex"),
+    )
+    node = state.node("a")
+    assert (node.abstract, node.authors, node.year) == ("Longer text", ["Ada", "Bo"], 2020)
+    assert node.source == "semantic_scholar,openalex"
+    assert not state.merge("a", paper("a", source="openalex"))
+
+
+def test_csr_groups_out_edges_by_source():
+    state = GraphState(paper("a"))
+    for node_id in "bcd":
+        state.add(paper(node_id))
+    for source, target in [("c", "a"), ("a", "b"), ("c", "d"), ("a", "d")]:
+        state.link(source, target, EdgeType.citation)
+    indptr, targets, types = state.csr()
+    neighbours = [targets[indptr[i] : indptr[i + 1]].tolist() for i in range(4)]
+    assert neighbours == [[1, 3], [], [0, 3], []]
+    assert types.tolist() == [0] * 4
+
+
+def test_graph_response_and_stats():
+    state = GraphState(paper("a"))
+    state.add(paper("b"))
+    state.link("b", "a", EdgeType.citation)
+    graph = state.graph(build_seconds=0.123456)
+    assert [node.id for node in graph.nodes] == ["a", "b"]
+    assert [(e.source, e.target, e.type) for e in graph.edges] == [("b", "a", EdgeType.citation)]
+    assert graph.stats.node_count == 2 and graph.stats.edge_count == 1
+    assert graph.stats.build_seconds == 0.1235
+    assert graph.stats.approx_bytes > 0
+    # Byte accounting follows records as they grow.
+    before = state.approx_bytes()
+    state.merge("b", paper("b", abstract="x" * 1000))
+    assert state.approx_bytes() - before >= 1000
+
+
+def test_max_nodes_above_the_cap_needs_large_mode(client_factory, root):
+    async def scenario():
+        async with client_factory() as client:
+            capped = await client.post(
+                "/expand-graph", json={"root_metadata": root, "max_nodes": 101}
+            )
+            large = await client.post(
+                "/expand-graph",
+                json={"root_metadata": root, "max_nodes": 101, "max_depth": 1, "large": True},
+            )
+            return capped.status_code, large.json()
+
+    status, graph = asyncio.run(scenario())
+    assert status == 422
+    assert graph["stats"]["node_count"] == len(graph["nodes"])
+    assert graph["stats"]["bytes_per_node"] == pytest.approx(
+        graph["stats"]["approx_bytes"] / len(graph["nodes"]), abs=0.1
+    )
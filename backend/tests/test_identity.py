@@ -0,0 +1,121 @@
+import pytest
+
+from backend.app.graph_store import GraphState
+from backend.app.identity import IdentityIndex, identity_keys, normalize_arxiv, normalize_doi
+from backend.app.models import PaperMetadata
+
+TITLE = "Attention Is All You Need: Transformers for Sequence Transduction"
+
+
+def paper(title: str = TITLE, **fields) -> PaperMetadata:
+    return PaperMetadata(title=title, **fields)
+
+
+def indexed(node_id: str, meta: PaperMetadata) -> IdentityIndex:
+    index = IdentityIndex()
+    index.add(node_id, meta)
+    return index
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "10.1000/ABC.123",
+        "https://doi.org/10.1000/abc.123",
+        "doi:10.1000/abc.123",
+        "http://dx.doi.org/10.1000/Abc.123",
+    ],
+)
+def test_normalize_doi(value):
+    assert normalize_doi(value) == "10.1000/abc.123"
+
+
+def test_normalize_doi_rejects_non_dois():
+    assert normalize_doi("W12345") is None
+    assert normalize_doi("") is None
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["1706.03762", "1706.03762v5", "arXiv:1706.03762", "https://arxiv.org/abs/1706.03762v2"],
+)
+def test_normalize_arxiv(value):
+    assert normalize_arxiv(value) == "1706.03762"
+
+
+@pytest.mark.parametrize(
+    "variant",
+    [
+        {"external_ids": {"DOI": "https://doi.org/10.1000/ABC"}},
+        {"id": "doi:10.1000/abc"},
+        {"id": "https://doi.org/10.1000/abc"},
+    ],
+)
+def test_resolves_doi_forms(variant):
+    index = indexed("s2-1", paper(external_ids={"doi": "10.1000/abc"}))
+    assert index.resolve(paper("Another title entirely", **variant)) == "s2-1"
+    assert index.key_merges == 1
+
+
+@pytest.mark.parametrize(
+    "variant",
+    [
+        {"external_ids": {"ArXiv": "1706.03762v3"}},
+        {"id": "arXiv:1706.03762"},
+        {"external_ids": {"doi": "10.48550/arXiv.1706.03762"}},
+    ],
+)
+def test_resolves_arxiv_forms(variant):
+    index = indexed("s2-1", paper(external_ids={"arxiv": "1706.03762"}))
+    assert index.resolve(paper("Another title entirely", **variant)) == "s2-1"
+
+
+def test_resolves_ids_reported_as_urls():
+    index = indexed("s2-1", paper(external_ids={"openalex": "W2963403868"}))
+    variant = paper(external_ids={"OpenAlex": "https://openalex.org/W2963403868"})
+    assert index.resolve(variant) == "s2-1"
+
+
+@pytest.mark.parametrize(
+    "title",
+    [
+        TITLE.upper(),
+        "Attention is all you need - transformers for sequence transduction.",
+        "Attention Is All You Need: Transformer for Sequence Transduction",
+    ],
+)
+def test_resolves_title_variants(title):
+    index = indexed("s2-1", paper(year=2017))
+    assert index.resolve(paper(title, year=2017)) == "s2-1"
+    assert index.fuzzy_merges == 1
+
+
+def test_title_numbers_keep_papers_apart():
+    index = indexed("gpt-3", paper("Language Models are Few-Shot Learners: GPT-3 Report"))
+    assert index.resolve(paper("Language Models are Few-Shot Learners: GPT-4 Report")) is None
+
+
+def test_title_match_respects_year():
+    index = indexed("s2-1", paper(year=2017))
+    assert index.resolve(paper(year=2023)) is None
+
+
+def test_short_and_different_titles_do_not_match():
+    index = indexed("s2-1", paper("Untitled"))
+    assert index.resolve(paper("Untitled")) is None
+    assert indexed("s2-1", paper()).resolve(paper("A Survey of Graph Neural Networks")) is None
+
+
+def test_papers_without_ids_stay_distinct():
+    assert not any(key.startswith("id:") for key in identity_keys(paper("Untitled")))
+    state = GraphState(paper("Root paper about citation graphs", id="root"))
+    first = state.add(paper("Untitled"))
+    second = state.add(paper("Untitled"))
+    assert first != second and len(state) == 3
+
+
+def test_merged_identifiers_resolve_to_the_node():
+    state = GraphState(paper(id="s2-1", external_ids={"doi": "10.1000/abc"}))
+    state.merge("s2-1", paper(id="W1", external_ids={"arxiv": "1706.03762"}))
+    assert state.identity.resolve(paper("Other", external_ids={"arxiv": "1706.03762"})) == "s2-1"
+    assert state.identity.resolve(paper("Other", id="W1")) == "s2-1"
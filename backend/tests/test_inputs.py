@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from backend.app.inputs import detect_input_type, semantic_identifier
+from backend.app.models import InputType
+from backend.benchmarks.simulator import S2_HOST
+
+PAPER_ID = "0123456789abcdef0123456789abcdef01234567"
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("https://doi.org/10.1000/ABC.123.", "DOI:10.1000/abc.123"),
+        ("https://arxiv.org/pdf/1706.03762v5.pdf", "ARXIV:1706.03762"),
+        (f"https://www.semanticscholar.org/paper/Some-Title/{PAPER_ID}", PAPER_ID),
+        ("https://example.org/paper", "URL:https://example.org/paper"),
+    ],
+)
+def test_semantic_identifier(text, expected):
+    assert detect_input_type(text) == InputType.paper_link
+    assert semantic_identifier(text) == expected
+
+
+def test_plain_text_is_a_research_plan():
+    assert detect_input_type("Study how graph networks predict solubility") == (
+        InputType.research_plan
+    )
+
+
+def test_links_are_resolved_in_one_batch(client_factory, simulator):
+    corpus = simulator.corpus
+    inputs = [f"https://doi.org/{corpus.doi(n)}" for n in (3, 4, 5)] + ["  ", corpus.doi(3)]
+
+    async def scenario():
+        async with client_factory() as client:
+            response = await client.post("/analyze-inputs", json={"inputs": inputs})
+            return response.json()["results"]
+
+    results = asyncio.run(scenario())
+    assert [r["metadata"]["title"] for r in results[:3]] == [corpus.title(n) for n in (3, 4, 5)]
+    assert results[3]["error"] == "Input text is required." and results[3]["metadata"] is None
+    assert results[4]["metadata"] == results[0]["metadata"]
+    assert simulator.calls[(S2_HOST, "paper_batch")] == 1
+    assert simulator.calls[(S2_HOST, "paper")] == 0
+
+
+def test_roots_grow_one_merged_graph(client_factory, simulator, root):
+    corpus = simulator.corpus
+    other = {"id": corpus.s2_id(7), "title": corpus.title(7), "source": "semantic_scholar"}
+    # The first root again, known only by its DOI, merges into the same node.
+    again = {"title": root["title"], "external_ids": {"doi": root["external_ids"]["doi"]}}
+
+    async def scenario():
+        async with client_factory() as client:
+            response = await client.post(
+                "/expand-graph/roots",
+                json={"roots": [root, other, again], "max_nodes": 100, "max_depth": 1},
+            )
+            return response.json()
+
+    graph = asyncio.run(scenario())
+    ids = [node["id"] for node in graph["nodes"]]
+    assert ids[:2] == [root["id"], other["id"]]
+    assert len(ids) == len(set(ids)) <= 100 and root["title"] not in ids
+    # Both roots were expanded into the shared graph.
+    linked = {edge["source"] for edge in graph["edges"]} | {e["target"] for e in graph["edges"]}
+    assert {root["id"], other["id"]} <= linked
@@ -0,0 +1,91 @@
+import asyncio
+
+from backend.app.main import app
+
+
+async def settle(prefetcher) -> None:
+    await asyncio.gather(*prefetcher._tasks, return_exceptions=True)
+
+
+def enable_prefetch() -> None:
+    prefetcher = app.state.prefetcher
+    prefetcher.enabled = True
+    prefetcher.warmup_path = None
+
+
+def test_expanding_a_warmed_node_is_a_hit(client_factory, root):
+    async def scenario():
+        async with client_factory() as client:
+            enable_prefetch()
+            prefetcher = app.state.prefetcher
+            created = await client.post(
+                "/sessions", json={"root_metadata": root, "max_nodes": 20, "max_depth": 1}
+            )
+            await settle(prefetcher)
+            warmed = next(iter(prefetcher._warmed))
+            await client.post(
+                f"/sessions/{created.json()['session_id']}/expand",
+                json={"node_ids": [warmed], "max_new_nodes": 5, "max_depth": 1},
+            )
+            await settle(prefetcher)
+            return (await client.get("/prefetch-stats")).json()
+
+    stats = asyncio.run(scenario())
+    assert stats["jobs"] == 2 and stats["warmed_nodes"] > 0
+    # The root was not warmed when the session was created; the expanded leaf was.
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_unwarmed_expansion_is_a_miss(client_factory, root):
+    async def scenario():
+        async with client_factory() as client:
+            enable_prefetch()
+            app.state.prefetcher.max_nodes = 0
+            created = await client.post(
+                "/sessions", json={"root_metadata": root, "max_nodes": 20, "max_depth": 1}
+            )
+            leaf = next(
+                node["id"] for node in created.json()["nodes"] if node["id"] != root["id"]
+            )
+            await client.post(
+                f"/sessions/{created.json()['session_id']}/expand",
+                json={"node_ids": [leaf], "max_new_nodes": 5, "max_depth": 1},
+            )
+            return (await client.get("/prefetch-stats")).json()
+
+    stats = asyncio.run(scenario())
+    assert stats["jobs"] == 0
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (0, 2, 0.0)
+
+
+def test_foreground_expansion_cancels_only_without_headroom(client_factory):
+    async def scenario():
+        async with client_factory():
+            enable_prefetch()
+            prefetcher = app.state.prefetcher
+            task = asyncio.create_task(asyncio.sleep(10))
+            prefetcher._tasks.add(task)
+            prefetcher.begin(node_ids=["a"])
+            await asyncio.sleep(0)
+            kept = not task.cancelled()
+            # A source paused by the server leaves nothing for background requests.
+            prefetcher.policies[0].bucket.pause(10)
+            prefetcher.begin(node_ids=["b"])
+            await asyncio.gather(task, return_exceptions=True)
+            return kept, task.cancelled()
+
+    assert asyncio.run(scenario()) == (True, True)
+
+
+def test_no_prefetch_without_headroom(client_factory, root):
+    async def scenario():
+        async with client_factory() as client:
+            enable_prefetch()
+            app.state.prefetcher.policies[0].bucket.pause(10)
+            await client.post(
+                "/sessions", json={"root_metadata": root, "max_nodes": 20, "max_depth": 1}
+            )
+            return (await client.get("/prefetch-stats")).json()
+
+    stats = asyncio.run(scenario())
+    assert stats["jobs"] == 0 and stats["skipped_no_headroom"] == 1
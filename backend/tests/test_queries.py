@@ -0,0 +1,93 @@
+import asyncio
+
+from backend.app import queries
+from backend.app.cache import ResponseCache
+from backend.app.clients import arxiv
+from backend.app.clients.semantic_scholar import SemanticScholarClient
+from backend.app.coalesce import SingleFlight
+from backend.app.models import PaperMetadata
+from backend.app.queries import EmptyQueries, canonical_terms, query_terms, ranked_terms
+from backend.app.transport import HttpPool
+from backend.app.upstream import Upstream
+from backend.benchmarks.simulator import ARXIV_HOST, S2_HOST
+
+PAPER = PaperMetadata(
+    id="p",
+    title="Message passing networks for molecular property prediction",
+    abstract="We study message passing on molecular graphs. The networks predict solubility.",
+    keywords=["graph neural networks"],
+)
+
+
+def upstream(settings, simulator) -> Upstream:
+    return Upstream(
+        pool=HttpPool(settings, transport=simulator),
+        cache=ResponseCache(settings),
+        flight=SingleFlight(),
+    )
+
+
+def test_terms_are_ranked_by_field_and_phrase():
+    terms = ranked_terms(PAPER)
+    assert terms == ranked_terms(PAPER.model_copy())
+    # Words from the keywords and the title come before abstract-only words.
+    assert terms.index("networks") < terms.index("molecular") < terms.index("solubility")
+    assert not {"for", "the", "we", "on"} & set(terms)
+    assert ranked_terms(PaperMetadata(id="u", title="Untitled")) == []
+
+
+def test_query_terms_are_canonical():
+    search, arxiv_terms = query_terms(PAPER)
+    assert search == sorted(ranked_terms(PAPER)[: queries.SEARCH_TERMS])
+    assert arxiv_terms == sorted(ranked_terms(PAPER)[: queries.ARXIV_TERMS])
+    assert canonical_terms(["Graph Networks", "networks", " graph "]) == ["graph", "networks"]
+    assert queries.title_query("Graphs, for the Win!") == "graphs win"
+    assert queries.title_query("Untitled") == ""
+
+
+def test_remembered_empty_queries_predict_their_supersets():
+    empty = EmptyQueries(max_entries=2, ttl=60)
+    empty.record(["graph", "solubility"])
+    assert empty.predicts_empty(["solubility", "graph", "neural"])
+    # Past SUBSET_TERMS, the remembered entries are scanned instead.
+    assert empty.predicts_empty(["a", "b", "c", "graph", "solubility"])
+    assert not empty.predicts_empty(["graph", "neural"])
+    empty.record(["x"])
+    empty.record(["y"])
+    assert not empty.predicts_empty(["graph", "solubility"])
+    assert empty.stats() == {"entries": 2, "recorded": 3, "skipped": 2}
+
+
+def test_remembered_empty_queries_expire():
+    empty = EmptyQueries(ttl=0)
+    empty.record(["graph"])
+    assert not empty.predicts_empty(["graph"])
+    assert empty.stats()["entries"] == 0
+
+
+def test_reordered_keywords_share_one_search(settings, simulator):
+    client = SemanticScholarClient(upstream=upstream(settings, simulator))
+
+    async def scenario():
+        return await asyncio.gather(
+            client.search_by_keywords(["Neural Graph"]),
+            client.search_by_keywords(["graph", "neural"]),
+        )
+
+    first, second = asyncio.run(scenario())
+    assert first == second
+    assert simulator.calls[(S2_HOST, "search")] == 1
+
+
+def test_arxiv_skips_queries_predicted_empty(settings, simulator, monkeypatch):
+    monkeypatch.setattr(arxiv, "EMPTY_ARXIV", EmptyQueries(ttl=60))
+    client = arxiv.ArxivClient(upstream=upstream(settings, simulator))
+    # The simulator, like arXiv, finds nothing when many terms are ANDed.
+    terms = ["zzz", "yyy", "xxx", "www", "vvv", "uuu"]
+
+    async def scenario():
+        return await client.search(terms), await client.search(["qqq", *terms])
+
+    assert asyncio.run(scenario()) == ([], [])
+    assert simulator.calls[(ARXIV_HOST, "query")] == 1
+    assert arxiv.EMPTY_ARXIV.stats()["skipped"] == 1
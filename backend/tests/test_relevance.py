@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from backend.app.models import EdgeType, PaperMetadata
+from backend.app.relevance import RelevanceScorer, tokenize
+
+ROOT = PaperMetadata(
+    title="Graph neural networks for molecular property prediction",
+    abstract="We train message passing graph neural networks on molecular graphs.",
+)
+ON_TOPIC = PaperMetadata(title="Message passing neural networks for molecular graphs")
+OFF_TOPIC = PaperMetadata(title="Medieval trade routes of the Baltic herring fleet")
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("The Graph of an Approach to GNN-based Models") == [
+        "graph",
+        "gnn-based",
+        "models",
+    ]
+
+
+def test_similarity_ranks_on_topic_papers_first():
+    scorer = RelevanceScorer(ROOT)
+    on, off, same = scorer.similarity([ON_TOPIC, OFF_TOPIC, ROOT])
+    assert on > off and off == 0
+    assert same == pytest.approx(1.0, abs=1e-5)
+    assert scorer.similarity([]).shape == (0,)
+
+
+def test_score_weighs_edges_mentions_and_depth():
+    scorer = RelevanceScorer(ROOT)
+
+    def score(edge_type=EdgeType.citation, mentions=1, depth=1, meta=ON_TOPIC) -> float:
+        return float(scorer.score([meta], [edge_type], [mentions], [depth])[0])
+
+    assert score() > score(edge_type=EdgeType.author)
+    assert score(mentions=3) > score()
+    assert score(depth=1) > score(depth=2)
+    # An off-topic citation still scores above zero.
+    assert score(meta=OFF_TOPIC) > 0
+
+
+def test_question_steers_the_ranking():
+    question = "medieval herring trade in the Baltic"
+    plain = RelevanceScorer(ROOT).similarity([ON_TOPIC, OFF_TOPIC])
+    asked = RelevanceScorer(ROOT, question=question).similarity([ON_TOPIC, OFF_TOPIC])
+    assert np.argmax(plain) == 0 and np.argmax(asked) == 1
+
+
+def test_several_roots_count_equally():
+    other = PaperMetadata(title="Baltic herring fleet trade routes")
+    scorer = RelevanceScorer(ROOT, more_roots=[other])
+    on, off = scorer.similarity([ON_TOPIC, OFF_TOPIC])
+    assert on > 0 and off > 0
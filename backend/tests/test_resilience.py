@@ -0,0 +1,160 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+from backend.app.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitOpenError,
+    SourcePolicy,
+    ThrottledError,
+    parse_retry_after,
+)
+
+
+def make_policy(settings, rate=1000.0, burst=100, **overrides) -> SourcePolicy:
+    defaults = {
+        "retry_attempts": 2,
+        "retry_backoff_base": 0.001,
+        "retry_backoff_max": 0.001,
+        "rate_limit_max_wait": 0.05,
+        "retry_after_max": 1.0,
+        "breaker_failure_threshold": 3,
+        "breaker_cooldown": 0.05,
+    }
+    defaults.update(overrides)
+    return SourcePolicy("test", rate, burst, settings.model_copy(update=defaults))
+
+
+def responder(*responses: httpx.Response):
+    # A send() that answers with `responses` in order, and records how many calls it got.
+    pending = list(responses)
+
+    async def send() -> httpx.Response:
+        send.calls += 1
+        return pending.pop(0)
+
+    send.calls = 0
+    return send
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(httpx.Response(429, headers={"Retry-After": "3"})) == 3.0
+    assert parse_retry_after(httpx.Response(429)) is None
+    assert parse_retry_after(httpx.Response(429, headers={"Retry-After": "soon"})) is None
+    future = formatdate(time.time() + 30, usegmt=True)
+    delay = parse_retry_after(httpx.Response(429, headers={"Retry-After": future}))
+    assert 25 < delay <= 30
+
+
+def test_retries_server_errors(settings):
+    policy = make_policy(settings)
+    send = responder(httpx.Response(500), httpx.Response(502), httpx.Response(200))
+    response = asyncio.run(policy.execute(send))
+    assert response.status_code == 200
+    assert send.calls == 3 and policy.retries == 2
+    assert policy.breaker.state == CLOSED
+
+
+def test_gives_up_after_the_last_attempt(settings):
+    policy = make_policy(settings, retry_attempts=1)
+    send = responder(httpx.Response(503), httpx.Response(503))
+    assert asyncio.run(policy.execute(send)).status_code == 503
+    assert send.calls == 2
+    assert policy.breaker.failures == 1
+
+
+def test_client_errors_are_not_retried(settings):
+    policy = make_policy(settings)
+    send = responder(httpx.Response(404))
+    assert asyncio.run(policy.execute(send)).status_code == 404
+    assert send.calls == 1
+
+
+def test_transport_errors_are_retried(settings):
+    policy = make_policy(settings)
+    attempts = []
+
+    async def send() -> httpx.Response:
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200)
+
+    assert asyncio.run(policy.execute(send)).status_code == 200
+    assert len(attempts) == 2
+
+
+def test_retry_waits_out_retry_after_beyond_max_wait(settings):
+    # The pause the server asked for is longer than rate_limit_max_wait; the retry sleeps
+    # through it instead of failing as locally throttled.
+    policy = make_policy(settings, rate_limit_max_wait=0.01)
+    send = responder(httpx.Response(429, headers={"Retry-After": "0.2"}), httpx.Response(200))
+    started = time.monotonic()
+    assert asyncio.run(policy.execute(send)).status_code == 200
+    assert time.monotonic() - started >= 0.2
+    assert policy.throttled == 1 and policy.local_throttled == 0
+
+
+def test_retry_after_pauses_other_callers(settings):
+    policy = make_policy(settings, retry_attempts=0, rate_limit_max_wait=0.01)
+    first = responder(httpx.Response(429, headers={"Retry-After": "0.5"}))
+    assert asyncio.run(policy.execute(first)).status_code == 429
+    # A fresh request may not wait that long, so it is refused without being sent.
+    second = responder(httpx.Response(200))
+    with pytest.raises(ThrottledError):
+        asyncio.run(policy.execute(second))
+    assert second.calls == 0 and policy.local_throttled == 1
+
+
+def test_retry_after_beyond_the_cap_is_returned(settings):
+    policy = make_policy(settings, retry_after_max=0.1)
+    send = responder(httpx.Response(429, headers={"Retry-After": "60"}))
+    started = time.monotonic()
+    assert asyncio.run(policy.execute(send)).status_code == 429
+    assert send.calls == 1
+    assert time.monotonic() - started < 0.5
+
+
+def test_breaker_opens_then_lets_one_probe_through(settings):
+    policy = make_policy(settings, retry_attempts=0, breaker_failure_threshold=2)
+    failing = responder(httpx.Response(500), httpx.Response(500))
+    for _ in range(2):
+        asyncio.run(policy.execute(failing))
+    assert policy.breaker.state == OPEN and policy.breaker.trips == 1
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(policy.execute(responder(httpx.Response(200))))
+
+    time.sleep(0.06)
+    release = asyncio.Event()
+
+    async def slow_send() -> httpx.Response:
+        await release.wait()
+        return httpx.Response(200)
+
+    async def scenario():
+        probe = asyncio.ensure_future(policy.execute(slow_send))
+        await asyncio.sleep(0.01)
+        assert policy.breaker.state == HALF_OPEN
+        # Everyone else fails fast while the probe is out.
+        with pytest.raises(CircuitOpenError):
+            await policy.execute(responder(httpx.Response(200)))
+        release.set()
+        return await probe
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert policy.breaker.state == CLOSED and policy.rejected == 2
+
+
+def test_failed_probe_reopens_the_breaker(settings):
+    policy = make_policy(settings, retry_attempts=0, breaker_failure_threshold=1)
+    asyncio.run(policy.execute(responder(httpx.Response(500))))
+    time.sleep(0.06)
+    asyncio.run(policy.execute(responder(httpx.Response(503))))
+    assert policy.breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(policy.execute(responder(httpx.Response(200))))
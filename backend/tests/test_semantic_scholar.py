@@ -0,0 +1,133 @@
+import asyncio
+
+from backend.app.cache import ResponseCache
+from backend.app.clients.semantic_scholar import SemanticScholarClient, split_fanout
+from backend.app.coalesce import SingleFlight
+from backend.app.graph_engine import GraphBuilder
+from backend.app.main import app
+from backend.app.models import GraphNode
+from backend.app.resilience import build_policies
+from backend.app.transport import HttpPool
+from backend.app.upstream import Upstream
+from backend.benchmarks.simulator import S2_HOST
+
+
+def make_client(settings, simulator) -> SemanticScholarClient:
+    upstream = Upstream(
+        pool=HttpPool(settings, transport=simulator),
+        cache=ResponseCache(settings),
+        flight=SingleFlight(),
+        policies=build_policies(settings),
+    )
+    return SemanticScholarClient(upstream=upstream)
+
+
+def s2_calls(simulator, endpoint: str) -> int:
+    return simulator.calls[(S2_HOST, endpoint)]
+
+
+def test_papers_are_hydrated_in_one_batch(settings, simulator):
+    client = make_client(settings, simulator)
+    corpus = simulator.corpus
+    identifiers = [corpus.s2_id(n) for n in range(30)]
+
+    async def scenario():
+        first = await client.fetch_papers(identifiers)
+        # Each paper is cached as fetch_paper caches it, so neither path goes upstream again.
+        again = await client.fetch_papers(identifiers[:10])
+        single = await client.fetch_paper(identifiers[5])
+        return first, again, single
+
+    first, again, single = asyncio.run(scenario())
+    assert [first[i].title for i in identifiers] == [corpus.title(n) for n in range(30)]
+    assert again == {i: first[i] for i in identifiers[:10]}
+    assert single == first[identifiers[5]]
+    assert s2_calls(simulator, "paper_batch") == 1 and s2_calls(simulator, "paper") == 0
+
+
+def test_edges_of_many_papers_take_two_batches(settings, simulator):
+    client = make_client(settings, simulator)
+    corpus = simulator.corpus
+    # Papers listing no more links than the batch response holds need no paging.
+    numbers = [n for n in range(200) if len(corpus.citations(n)) <= 20][:10]
+    identifiers = [corpus.s2_id(n) for n in numbers]
+
+    edges = asyncio.run(client.fetch_edges_batch(identifiers, fanout=60))
+    assert s2_calls(simulator, "paper_batch") == 2
+    assert s2_calls(simulator, "citations") == 0
+    for n, identifier in zip(numbers, identifiers):
+        cited = [meta.external_ids["semantic_scholar"] for meta in edges[identifier]["citations"]]
+        assert cited == list(dict.fromkeys(corpus.s2_id(m) for m in corpus.citations(n)))
+
+
+def test_long_link_lists_are_paged_by_id(settings, simulator):
+    client = make_client(settings, simulator)
+    corpus = simulator.corpus
+    # More citations than the batch response lists, and a fan-out that wants them all.
+    n = next(n for n in range(200) if len(set(corpus.citations(n))) > 35)
+    identifier = corpus.s2_id(n)
+    totals = {"citations": len(corpus.citations(n)), "references": len(corpus.references(n))}
+    quotas = split_fanout(100, totals)
+
+    edges = asyncio.run(client.fetch_edges_batch([identifier], fanout=100))[identifier]
+    assert s2_calls(simulator, "citations") >= 1
+    for direction, numbers in (
+        ("citations", corpus.citations(n)),
+        ("references", corpus.references(n)),
+    ):
+        linked = [meta.external_ids["semantic_scholar"] for meta in edges[direction]]
+        expected = list(dict.fromkeys(corpus.s2_id(m) for m in numbers))
+        assert linked == expected[: quotas[direction]]
+
+
+def test_fanout_is_split_between_directions():
+    assert split_fanout(10, {"citations": 50, "references": 50}) == {
+        "citations": 5,
+        "references": 5,
+    }
+    # What one direction cannot use goes to the other.
+    assert split_fanout(10, {"citations": 50, "references": 2}) == {
+        "citations": 8,
+        "references": 2,
+    }
+    assert split_fanout(10, {"citations": 1, "references": 50}) == {
+        "citations": 1,
+        "references": 9,
+    }
+
+
+def test_node_without_a_batch_looks_up_its_own_edges(client_factory, simulator, root):
+    # The per-node fallback used when the local corpus answers first.
+    async def scenario():
+        async with client_factory():
+            builder = GraphBuilder(upstream=app.state.upstream)
+            return await builder._edges(GraphNode(**root), None)
+
+    edges = asyncio.run(scenario())
+    corpus = simulator.corpus
+    assert edges["citations"] and edges["references"]
+    assert s2_calls(simulator, "paper_batch") == 2
+    citing = {corpus.s2_id(m) for m in corpus.citations(corpus.number(root["id"]))}
+    assert {meta.id for meta in edges["citations"]} <= citing
+
+
+def test_citation_edges_point_from_citing_to_cited(client_factory, simulator, root):
+    async def scenario():
+        async with client_factory() as client:
+            response = await client.post(
+                "/expand-graph", json={"root_metadata": root, "max_nodes": 80, "max_depth": 1}
+            )
+            return response.json()
+
+    graph = asyncio.run(scenario())
+    corpus = simulator.corpus
+    n = corpus.number(root["id"])
+    citing = {corpus.s2_id(m) for m in corpus.citations(n)}
+    cited = {corpus.s2_id(m) for m in corpus.references(n)}
+    edges = [edge for edge in graph["edges"] if edge["type"] == "citation"]
+    incoming = [edge["source"] for edge in edges if edge["target"] == root["id"]]
+    outgoing = [edge["target"] for edge in edges if edge["source"] == root["id"]]
+    assert incoming and set(incoming) <= citing
+    assert outgoing and set(outgoing) <= cited
+    node = next(node for node in graph["nodes"] if node["id"] == root["id"])
+    assert set(node["references"]) == set(outgoing)
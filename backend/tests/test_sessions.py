@@ -0,0 +1,88 @@
+import asyncio
+
+
+def node_ids(graph: dict) -> set:
+    return {node["id"] for node in graph["nodes"]}
+
+
+def edge_keys(graph: dict) -> set:
+    return {(edge["source"], edge["target"], edge["type"]) for edge in graph["edges"]}
+
+
+def test_expand_returns_only_the_delta(client_factory, root):
+    async def scenario():
+        async with client_factory() as client:
+            created = await client.post(
+                "/sessions", json={"root_metadata": root, "max_nodes": 20, "max_depth": 1}
+            )
+            first = created.json()
+            session_id = first["session_id"]
+            leaf = next(node_id for node_id in node_ids(first) if node_id != root["id"])
+            expanded = await client.post(
+                f"/sessions/{session_id}/expand",
+                json={"node_ids": [leaf], "max_new_nodes": 15, "max_depth": 1},
+            )
+            whole = await client.get(f"/sessions/{session_id}")
+            return first, expanded.json(), whole.json()
+
+    first, delta, whole = asyncio.run(scenario())
+    assert delta["session_id"] == first["session_id"]
+    new_nodes = node_ids(delta) - node_ids(first)
+    assert new_nodes and len(new_nodes) <= 15
+    assert not edge_keys(delta) & edge_keys(first)
+    # The session holds exactly what the two responses delivered between them.
+    assert node_ids(whole) == node_ids(first) | node_ids(delta)
+    assert edge_keys(whole) == edge_keys(first) | edge_keys(delta)
+
+
+def test_expanded_node_is_not_expanded_again(client_factory, root, simulator):
+    async def scenario():
+        async with client_factory() as client:
+            created = await client.post(
+                "/sessions", json={"root_metadata": root, "max_nodes": 100, "max_depth": 1}
+            )
+            calls = sum(simulator.calls.values())
+            again = await client.post(
+                f"/sessions/{created.json()['session_id']}/expand",
+                json={"node_ids": [root["id"]], "max_depth": 1},
+            )
+            return again.json(), sum(simulator.calls.values()) - calls
+
+    delta, upstream_calls = asyncio.run(scenario())
+    assert delta["nodes"] == [] and delta["edges"] == []
+    assert upstream_calls == 0
+
+
+def test_node_cut_short_by_max_nodes_can_be_expanded_later(client_factory, root):
+    # The first request stops adding the root's neighbours once the graph is full, so the
+    # root must stay unexpanded and a later expansion must still deliver the rest.
+    async def scenario():
+        async with client_factory() as client:
+            created = await client.post(
+                "/sessions", json={"root_metadata": root, "max_nodes": 5, "max_depth": 1}
+            )
+            again = await client.post(
+                f"/sessions/{created.json()['session_id']}/expand",
+                json={"node_ids": [root["id"]], "max_new_nodes": 30, "max_depth": 1},
+            )
+            return created.json(), again.json()
+
+    first, delta = asyncio.run(scenario())
+    assert len(first["nodes"]) == 5
+    assert node_ids(delta) - node_ids(first)
+    assert any(root["id"] in (edge["source"], edge["target"]) for edge in delta["edges"])
+
+
+def test_expand_unknown_node_is_404(client_factory, root):
+    async def scenario():
+        async with client_factory() as client:
+            created = await client.post(
+                "/sessions", json={"root_metadata": root, "max_nodes": 5, "max_depth": 1}
+            )
+            response = await client.post(
+                f"/sessions/{created.json()['session_id']}/expand", json={"node_ids": ["nope"]}
+            )
+            missing = await client.post("/sessions/unknown/expand", json={"node_ids": ["nope"]})
+            return response.status_code, missing.status_code
+
+    assert asyncio.run(scenario()) == (404, 404)
@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+
+def stream(client_factory, body: dict, accept: str = ""):
+    async def scenario():
+        async with client_factory() as client:
+            headers = {"accept": accept} if accept else {}
+            response = await client.post("/expand-graph/stream", json=body, headers=headers)
+            session = None
+            if body.get("create_session"):
+                last = response.text.strip().splitlines()[-1]
+                session_id = json.loads(last.removeprefix("data: "))["session_id"]
+                session = (await client.get(f"/sessions/{session_id}")).json()
+            return response, session
+
+    return asyncio.run(scenario())
+
+
+def test_ndjson_events_add_up_to_the_summary(client_factory, root):
+    response, _ = stream(client_factory, {"root_metadata": root, "max_nodes": 30})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    batches = [event for event in events if event["type"] == "batch"]
+    summary = events[-1]
+    assert summary["type"] == "summary" and not summary["truncated"]
+    assert batches[0]["nodes"][0]["id"] == root["id"]
+    # Each edge is sent once; a node again only when it changes, as the root does once its
+    # references are known.
+    nodes = {node["id"]: node for event in batches for node in event["nodes"]}
+    node_ids = set(nodes)
+    edges = [edge for event in batches for edge in event["edges"]]
+    assert len(nodes) == summary["node_count"] == 30
+    assert len(edges) == summary["edge_count"]
+    assert nodes[root["id"]]["references"]
+    assert all(edge["source"] in node_ids and edge["target"] in node_ids for edge in edges)
+
+
+def test_sse_framing(client_factory, root):
+    response, _ = stream(
+        client_factory, {"root_metadata": root, "max_nodes": 10}, accept="text/event-stream"
+    )
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = response.text.strip().split("\n\n")
+    for frame in frames:
+        kind, data = frame.split("\n")
+        assert kind.startswith("event: ") and data.startswith("data: ")
+        assert json.loads(data.removeprefix("data: "))["type"] == kind.removeprefix("event: ")
+    assert frames[-1].startswith("event: summary")
+
+
+def test_streamed_session_holds_what_was_sent(client_factory, root):
+    response, session = stream(
+        client_factory, {"root_metadata": root, "max_nodes": 15, "create_session": True}
+    )
+    events = [json.loads(line) for line in response.text.splitlines()]
+    sent = {node["id"] for event in events for node in event["nodes"]}
+    assert events[-1]["session_id"] == session["session_id"]
+    assert {node["id"] for node in session["nodes"]} == sent
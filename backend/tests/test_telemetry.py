@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from backend.app.telemetry import Counter, Histogram, Trace, _trace, span
+
+
+def test_counter_renders_prometheus_text():
+    counter = Counter("demo_total", "Demo counter", labels=("source",))
+    counter.inc(source="openalex")
+    counter.inc(2, source='s2 "keyed"')
+    assert counter.render().splitlines() == [
+        "# HELP demo_total Demo counter",
+        "# TYPE demo_total counter",
+        'demo_total{source="openalex"} 1',
+        'demo_total{source="s2 \\"keyed\\""} 2',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("demo_seconds", "Demo", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+    assert list(histogram.samples()) == [
+        'demo_seconds_bucket{le="0.1"} 1',
+        'demo_seconds_bucket{le="1"} 3',
+        'demo_seconds_bucket{le="+Inf"} 4',
+        "demo_seconds_sum 4.25",
+        "demo_seconds_count 4",
+    ]
+
+
+def test_spans_nest_and_record_errors():
+    trace = Trace("test", max_spans=2)
+    token = _trace.set(trace)
+    try:
+        with span("outer", nodes=3):
+            with span("inner") as inner:
+                inner.set(results=5)
+        with pytest.raises(ValueError):
+            with span("failing"):
+                raise ValueError("boom")
+    finally:
+        _trace.reset(token)
+    # Spans are recorded as they close; past max_spans they are only counted.
+    inner, outer = trace.spans
+    assert (inner.name, inner.parent, inner.attrs) == ("inner", outer.id, {"results": 5})
+    assert (outer.name, outer.parent, outer.attrs) == ("outer", None, {"nodes": 3})
+    assert trace.dropped == 1
+    assert trace.totals().keys() == {"outer", "inner"}
+
+
+def test_requests_are_traced_and_counted(client_factory, root):
+    async def scenario():
+        async with client_factory() as client:
+            response = await client.post(
+                "/expand-graph", json={"root_metadata": root, "max_nodes": 10, "max_depth": 1}
+            )
+            trace_id = response.headers["x-trace-id"]
+            detail = (await client.get(f"/traces/{trace_id}")).json()
+            recent = (await client.get("/traces")).json()
+            metrics = (await client.get("/metrics")).text
+            missing = await client.get("/traces/unknown")
+            return response, detail, recent, metrics, missing.status_code
+
+    response, detail, recent, metrics, missing = asyncio.run(scenario())
+    assert "gather_related;dur=" in response.headers["server-timing"]
+    assert detail["name"] == "POST /expand-graph" and detail["status"] == 200
+    assert {"gather_related", "dedup", "serialize"} <= detail["stages"].keys()
+    spans = {span["id"]: span for span in detail["span_list"]}
+    assert all(span["parent"] in spans for span in spans.values() if span["parent"])
+    assert detail["id"] in [trace["id"] for trace in recent]
+    assert 'route="/expand-graph",status="200"' in metrics
+    assert "spider_upstream_requests_total{" in metrics
+    assert missing == 404
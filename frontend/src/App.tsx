@@ -1,10 +1,10 @@
-import { useMemo, useState } from "react";
-import { analyzeInput, expandGraph } from "./api";
+import { useMemo, useRef, useState } from "react";
+import { analyzeInput, expandGraphStream, expandSession, sessionAnalytics } from "./api";
 import InputForm from "./components/InputForm";
 import GraphCanvas from "./components/GraphCanvas";
 import Sidebar from "./components/Sidebar";
 import ChatPanel from "./components/ChatPanel";
-import { GraphNode, GraphResponse, PaperMetadata } from "./types";
+import { GraphAnalytics, GraphEvent, GraphNode, GraphResponse, PaperMetadata } from "./types";
 
 function Hero() {
   return (
@@ -24,10 +24,13 @@ function Hero() {
 
 export default function App() {
   const [graph, setGraph] = useState<GraphResponse | null>(null);
+  const [analytics, setAnalytics] = useState<GraphAnalytics | null>(null);
   const [selectedId, setSelectedId] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [limits] = useState({ maxNodes: 30, maxDepth: 2 });
+  const abortRef = useRef<AbortController | null>(null);
+  const sessionRef = useRef<string | null>(null);
   const selectedNode = useMemo<GraphNode | null>(() => {
     if (!graph || !selectedId) return null;
     return graph.nodes.find((n) => n.id === selectedId) || null;
@@ -38,19 +41,60 @@ export default function App() {
     return graph.nodes.filter((n) => n.id !== selectedNode.id).slice(0, 10);
   }, [graph, selectedNode]);
 
+  // A batch or session delta may repeat an existing node after the server merged a duplicate
+  // into it, so nodes are upserted by id.
+  const mergeIntoGraph = (delta: GraphResponse) => {
+    setGraph((prev) => {
+      const byId = new Map((prev?.nodes ?? []).map((n) => [n.id, n]));
+      delta.nodes.forEach((n) => byId.set(n.id, n));
+      return {
+        nodes: Array.from(byId.values()),
+        edges: [...(prev?.edges ?? []), ...delta.edges],
+      };
+    });
+  };
+
+  // Scores only describe the graph they were computed for; a stale set is simply replaced.
+  const refreshAnalytics = async (sessionId: string | null) => {
+    if (!sessionId) return;
+    try {
+      setAnalytics(await sessionAnalytics(sessionId));
+    } catch {
+      setAnalytics(null);
+    }
+  };
+
+  // Renders each batch as it arrives instead of waiting for the whole expansion.
+  const streamGraph = async (root: PaperMetadata) => {
+    abortRef.current?.abort();
+    const controller = new AbortController();
+    abortRef.current = controller;
+    sessionRef.current = null;
+    setGraph({ nodes: [], edges: [] });
+    setAnalytics(null);
+    await expandGraphStream(
+      root,
+      limits.maxNodes,
+      limits.maxDepth,
+      (event: GraphEvent) => {
+        if (event.type === "summary") sessionRef.current = event.session_id ?? null;
+        if (event.type === "batch") mergeIntoGraph(event);
+      },
+      controller.signal,
+      true
+    );
+    await refreshAnalytics(sessionRef.current);
+  };
+
   const handleGenerate = async (input: string) => {
     setIsLoading(true);
     setError(null);
     try {
       const analyzed = await analyzeInput(input);
-      const expanded = await expandGraph(
-        analyzed.metadata,
-        limits.maxNodes,
-        limits.maxDepth
-      );
-      setGraph(expanded);
-      setSelectedId(analyzed.metadata.id || expanded.nodes[0]?.id || null);
+      setSelectedId(analyzed.metadata.id || analyzed.metadata.title);
+      await streamGraph(analyzed.metadata);
     } catch (err) {
+      if (err instanceof DOMException && err.name === "AbortError") return;
       const message = err instanceof Error ? err.message : "Failed to generate graph";
       setError(message);
     } finally {
@@ -62,10 +106,21 @@ export default function App() {
     setIsLoading(true);
     setError(null);
     try {
-      const expanded = await expandGraph(node, limits.maxNodes, limits.maxDepth);
-      setGraph(expanded);
       setSelectedId(node.id);
+      // Grow the server-side session in place; start over only if it has expired.
+      const sessionId = sessionRef.current;
+      if (sessionId) {
+        try {
+          mergeIntoGraph(await expandSession(sessionId, [node.id], limits.maxNodes, 1));
+          await refreshAnalytics(sessionId);
+          return;
+        } catch {
+          sessionRef.current = null;
+        }
+      }
+      await streamGraph(node);
     } catch (err) {
+      if (err instanceof DOMException && err.name === "AbortError") return;
       const message = err instanceof Error ? err.message : "Failed to expand graph";
       setError(message);
     } finally {
@@ -89,6 +144,7 @@ export default function App() {
               <GraphCanvas
                 nodes={graph.nodes}
                 edges={graph.edges}
+                analytics={analytics}
                 onSelect={setSelectedId}
               />
             </div>
@@ -1,4 +1,12 @@
-import { AnalyzeInputResponse, GraphResponse, PaperMetadata } from "./types";
+import {
+  AnalyzeInputResponse,
+  BulkAnalyzeResponse,
+  GraphAnalytics,
+  GraphEvent,
+  GraphResponse,
+  PaperMetadata,
+  SessionGraphResponse,
+} from "./types";
 
 const API_BASE =
   import.meta.env.VITE_API_BASE_URL?.replace(/\/$/, "") || "http://localhost:8000";
@@ -22,6 +30,14 @@ export async function analyzeInput(input_text: string): Promise<AnalyzeInputResp
   });
 }
 
+// Resolves a reading list in one request; each result carries either metadata or an error.
+export async function analyzeInputs(inputs: string[]): Promise<BulkAnalyzeResponse> {
+  return request<BulkAnalyzeResponse>("/analyze-inputs", {
+    method: "POST",
+    body: JSON.stringify({ inputs }),
+  });
+}
+
 export async function expandGraph(
   root_metadata: PaperMetadata,
   max_nodes: number,
@@ -33,6 +49,68 @@ export async function expandGraph(
   });
 }
 
+// Grows one merged graph session from several roots with a shared node budget.
+export async function createRootsSession(
+  roots: PaperMetadata[],
+  max_nodes: number,
+  max_depth: number
+): Promise<SessionGraphResponse> {
+  return request<SessionGraphResponse>("/sessions/roots", {
+    method: "POST",
+    body: JSON.stringify({ roots, max_nodes, max_depth, large: max_nodes > 100 }),
+  });
+}
+
+export async function expandGraphStream(
+  root_metadata: PaperMetadata,
+  max_nodes: number,
+  max_depth: number,
+  onEvent: (event: GraphEvent) => void,
+  signal?: AbortSignal,
+  create_session = false
+): Promise<void> {
+  const response = await fetch(`${API_BASE}/expand-graph/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "application/x-ndjson" },
+    body: JSON.stringify({ root_metadata, max_nodes, max_depth, create_session }),
+    signal,
+  });
+  if (!response.ok || !response.body) {
+    const detail = await response.text();
+    throw new Error(detail || "Request failed");
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop() ?? "";
+    lines.filter((line) => line.trim()).forEach((line) => onEvent(JSON.parse(line)));
+  }
+  if (buffer.trim()) onEvent(JSON.parse(buffer));
+}
+
+// Expands nodes of a server-side graph session; the response holds only the new nodes/edges.
+export async function expandSession(
+  sessionId: string,
+  node_ids: string[],
+  max_new_nodes: number,
+  max_depth: number
+): Promise<SessionGraphResponse> {
+  return request<SessionGraphResponse>(`/sessions/${sessionId}/expand`, {
+    method: "POST",
+    body: JSON.stringify({ node_ids, max_new_nodes, max_depth }),
+  });
+}
+
+// Centrality scores and cluster labels of a session's graph, computed and cached server-side.
+export async function sessionAnalytics(sessionId: string): Promise<GraphAnalytics> {
+  return request<GraphAnalytics>(`/sessions/${sessionId}/analytics`, { method: "GET" });
+}
+
 export async function claudeChat(
   paper_metadata: PaperMetadata,
   related_papers: PaperMetadata[],
@@ -43,3 +121,46 @@ export async function claudeChat(
     body: JSON.stringify({ paper_metadata, related_papers, message }),
   });
 }
+
+// Streams the answer as server-sent events: `delta` events carry text as it is generated and
+// the final `done` event carries the whole answer.
+export async function claudeChatStream(
+  paper_metadata: PaperMetadata,
+  related_papers: PaperMetadata[],
+  message: string,
+  onDelta: (text: string) => void,
+  signal?: AbortSignal
+): Promise<string> {
+  const response = await fetch(`${API_BASE}/claude-chat/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+    body: JSON.stringify({ paper_metadata, related_papers, message }),
+    signal,
+  });
+  if (!response.ok || !response.body) {
+    const detail = await response.text();
+    throw new Error(detail || "Request failed");
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let answer = "";
+  const handle = (block: string) => {
+    const event = block.match(/^event: (.*)$/m)?.[1];
+    const data = block.match(/^data: (.*)$/m)?.[1];
+    if (!data) return;
+    const payload = JSON.parse(data);
+    if (event === "delta") onDelta(payload.text);
+    if (event === "done") answer = payload.answer;
+  };
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const blocks = buffer.split("\n\n");
+    buffer = blocks.pop() ?? "";
+    blocks.forEach(handle);
+  }
+  if (buffer.trim()) handle(buffer);
+  return answer;
+}
@@ -1,5 +1,5 @@
 import { useState } from "react";
-import { claudeChat } from "../api";
+import { claudeChatStream } from "../api";
 import { PaperMetadata } from "../types";
 
 interface Props {
@@ -23,14 +23,20 @@ export default function ChatPanel({ selected, related }: Props) {
     setMessages((prev) => [...prev, userMessage]);
     setInput("");
     setIsTyping(true);
+    // The assistant message is appended empty and grows as tokens arrive.
+    const setAnswer = (update: (content: string) => string) =>
+      setMessages((prev) => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, content: update(last.content) }];
+      });
+    setMessages((prev) => [...prev, { role: "assistant", content: "" }]);
     try {
-      const response = await claudeChat(selected, related, userMessage.content);
-      setMessages((prev) => [...prev, { role: "assistant", content: response.answer }]);
+      const answer = await claudeChatStream(selected, related, userMessage.content, (text) =>
+        setAnswer((content) => content + text)
+      );
+      setAnswer(() => answer);
     } catch (err) {
-      setMessages((prev) => [
-        ...prev,
-        { role: "assistant", content: "Chat failed. Please try again." },
-      ]);
+      setAnswer(() => "Chat failed. Please try again.");
     } finally {
       setIsTyping(false);
     }
@@ -54,7 +60,9 @@ export default function ChatPanel({ selected, related }: Props) {
             <p className="text-sm whitespace-pre-wrap">{m.content}</p>
           </div>
         ))}
-        {isTyping && <p className="text-slate-400 text-sm">Claude is thinking...</p>}
+        {isTyping && !messages[messages.length - 1]?.content && (
+          <p className="text-slate-400 text-sm">Claude is thinking...</p>
+        )}
       </div>
       <div className="flex gap-2">
         <input
@@ -1,10 +1,11 @@
 import { useEffect, useRef } from "react";
 import { DataSet, Network, NodeOptions, EdgeOptions } from "vis-network/standalone";
-import { GraphEdge, GraphNode } from "../types";
+import { GraphAnalytics, GraphEdge, GraphNode } from "../types";
 
 interface Props {
   nodes: GraphNode[];
   edges: GraphEdge[];
+  analytics?: GraphAnalytics | null;
   onSelect: (nodeId: string | null) => void;
 }
 
@@ -15,25 +16,38 @@ const edgeColors: Record<GraphEdge["type"], string> = {
   author: "#facc15",
 };
 
-export default function GraphCanvas({ nodes, edges, onSelect }: Props) {
+// The largest communities get their own colour; the rest keep the default.
+const communityColors = ["#0ea5e9", "#22c55e", "#f43f5e", "#eab308", "#8b5cf6", "#14b8a6"];
+
+export default function GraphCanvas({ nodes, edges, analytics, onSelect }: Props) {
   const containerRef = useRef<HTMLDivElement | null>(null);
   const networkRef = useRef<Network | null>(null);
 
   useEffect(() => {
     if (!containerRef.current) return;
+    // Server-side scores, when present, size nodes by PageRank and colour them by community.
+    const index = new Map((analytics?.node_ids ?? []).map((id, i) => [id, i]));
+    const maxRank = (analytics?.pagerank ?? []).reduce((a, b) => Math.max(a, b), Number.MIN_VALUE);
     const dataNodes = new DataSet<NodeOptions>(
-      nodes.map((n) => ({
-        id: n.id,
-        label: n.title,
-        color: {
-          background: "#0ea5e9",
-          border: "#22d3ee",
-          highlight: { background: "#f97316", border: "#f97316" },
-        },
-        font: { color: "#e2e8f0", size: 14 },
-        shape: "dot",
-        size: Math.min(30, 10 + (n.keywords?.length || 0) * 2),
-      }))
+      nodes.map((n) => {
+        const i = index.get(n.id);
+        const community = i === undefined ? undefined : analytics!.community[i];
+        return {
+          id: n.id,
+          label: n.title,
+          color: {
+            background: communityColors[community ?? 0] ?? "#64748b",
+            border: "#22d3ee",
+            highlight: { background: "#f97316", border: "#f97316" },
+          },
+          font: { color: "#e2e8f0", size: 14 },
+          shape: "dot",
+          size:
+            i === undefined
+              ? Math.min(30, 10 + (n.keywords?.length || 0) * 2)
+              : 8 + 24 * Math.sqrt(analytics!.pagerank[i] / maxRank),
+        };
+      })
     );
 
     const dataEdges = new DataSet<EdgeOptions>(
@@ -72,7 +86,7 @@ export default function GraphCanvas({ nodes, edges, onSelect }: Props) {
       });
       networkRef.current.on("deselectNode", () => onSelect(null));
     }
-  }, [nodes, edges, onSelect]);
+  }, [nodes, edges, analytics, onSelect]);
 
   return <div ref={containerRef} className="w-full h-[500px] rounded-xl glass" />;
 }
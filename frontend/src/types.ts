@@ -10,6 +10,7 @@ export interface PaperMetadata {
   pdf_link?: string;
   source?: string;
   references?: string[];
+  external_ids?: Record<string, string>;
 }
 
 export interface GraphNode extends PaperMetadata {
@@ -22,12 +23,68 @@ export interface GraphEdge {
   type: "citation" | "semantic" | "keyword" | "author";
 }
 
+export interface GraphStats {
+  node_count: number;
+  edge_count: number;
+  approx_bytes: number;
+  bytes_per_node: number;
+  build_seconds?: number | null;
+}
+
+// Per-node lists are aligned with node_ids; communities are numbered largest first.
+export interface GraphAnalytics {
+  node_ids: string[];
+  pagerank: number[];
+  rank: number[];
+  in_degree: number[];
+  out_degree: number[];
+  betweenness: number[];
+  component: number[];
+  community: number[];
+  component_sizes: number[];
+  community_sizes: number[];
+  key_papers: string[];
+  compute_seconds: number;
+}
+
 export interface GraphResponse {
   nodes: GraphNode[];
   edges: GraphEdge[];
+  truncated?: boolean;
+  truncated_reason?: "deadline" | "upstream_budget" | null;
+  stats?: GraphStats | null;
+  analytics?: GraphAnalytics | null;
+}
+
+export interface GraphEvent {
+  type: "batch" | "progress" | "summary";
+  nodes: GraphNode[];
+  edges: GraphEdge[];
+  depth: number;
+  node_count: number;
+  edge_count: number;
+  frontier_size: number;
+  truncated: boolean;
+  truncated_reason: "deadline" | "upstream_budget" | null;
+  session_id?: string | null;
+}
+
+export interface SessionGraphResponse extends GraphResponse {
+  session_id: string;
 }
 
 export interface AnalyzeInputResponse {
   input_type: InputType;
   metadata: PaperMetadata;
 }
+
+export interface BulkAnalyzeResult {
+  input: string;
+  input_type: InputType;
+  metadata: PaperMetadata | null;
+  error: string | null;
+}
+
+export interface BulkAnalyzeResponse {
+  results: BulkAnalyzeResult[];
+}